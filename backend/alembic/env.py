@@ -17,9 +17,10 @@ from app.models.product import Product
 from app.models.translation import Translation
 from app.models.order import Order, OrderItem, OrderStatus
 from app.models.bot import BotApiKey
+from app.models.daily_sales import DailySales, DailyCategorySales
 
 # Import models with all their dependencies to ensure proper registration
-from app.models import user, product, translation, order, bot
+from app.models import user, product, translation, order, bot, daily_sales
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
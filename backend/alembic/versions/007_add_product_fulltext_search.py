@@ -0,0 +1,73 @@
+"""add product full-text search index
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_COLUMNS = ("title", "description", "category", "tags")
+
+# Keep in sync with PostgresFullTextBackend.DOCUMENT_SQL in app/utils/search_index.py
+PG_DOCUMENT = "to_tsvector('simple'::regconfig, {})".format(
+    " || ' ' || ".join(f"coalesce({column}, '')" for column in SEARCH_COLUMNS)
+)
+
+COLUMNS = ", ".join(SEARCH_COLUMNS)
+NEW_VALUES = ", ".join("new." + column for column in SEARCH_COLUMNS)
+OLD_VALUES = ", ".join("old." + column for column in SEARCH_COLUMNS)
+
+SQLITE_UPGRADE = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        {COLUMNS},
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF {COLUMNS} ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES});
+        INSERT INTO products_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES});
+    END
+    """,
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_products_search_document ON products USING gin ({PG_DOCUMENT})")
+    elif dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_products_search_document")
+    elif dialect == 'sqlite':
+        for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS products_fts")
@@ -0,0 +1,118 @@
+"""add normalized product search_text and re-point search indexes
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.text_normalization import build_search_document
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+SEARCHABLE_FIELDS = (
+    "title", "title_en", "title_fa", "title_ar",
+    "description", "description_en", "description_fa", "description_ar",
+    "category", "tags",
+)
+
+# Keep in sync with PostgresFullTextBackend.DOCUMENT_SQL in app/utils/search_index.py
+PG_DOCUMENT = "to_tsvector('simple'::regconfig, coalesce(search_text, ''))"
+
+SQLITE_FTS_TRIGGERS = ("products_fts_ai", "products_fts_ad", "products_fts_au")
+
+SQLITE_UPGRADE = [
+    """
+    CREATE VIRTUAL TABLE products_fts USING fts5(
+        search_text,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER products_fts_au AFTER UPDATE OF search_text ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO products_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END
+    """,
+    "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+]
+
+
+def _drop_sqlite_fts():
+    for trigger in SQLITE_FTS_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS products_fts")
+
+
+def _backfill_search_text(bind, batch_size=1000):
+    products = sa.table("products", sa.column("id"), sa.column("search_text"),
+                        *(sa.column(field) for field in SEARCHABLE_FIELDS))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(products).where(products.c.id > last_id).order_by(products.c.id).limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            break
+        bind.execute(
+            products.update().where(products.c.id == sa.bindparam("row_id")),
+            [
+                {"row_id": row["id"], "search_text": build_search_document(row[f] for f in SEARCHABLE_FIELDS)}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1]["id"]
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    if dialect == 'sqlite':
+        # The 007 triggers reference columns this table rebuild touches
+        _drop_sqlite_fts()
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_products_search_document")
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('search_text', sa.Text(), nullable=True))
+
+    _backfill_search_text(bind)
+
+    if dialect == 'postgresql':
+        op.execute(f"CREATE INDEX ix_products_search_text ON products USING gin ({PG_DOCUMENT})")
+    elif dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_products_search_text")
+    elif dialect == 'sqlite':
+        _drop_sqlite_fts()
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('search_text')
+    # Search indexes from revision 007 are recreated lazily on SQLite and by
+    # re-running 007 on PostgreSQL.
@@ -0,0 +1,48 @@
+"""add composite and partial indexes for hot order and product queries
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+# Keep in sync with ACTIVE_PRODUCTS in app/models/product.py
+ACTIVE_PRODUCTS = {"sqlite_where": sa.text("is_active = 1"), "postgresql_where": sa.text("is_active")}
+
+# (name, table, columns, dialect options); keep in sync with the models' __table_args__
+INDEXES = [
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], {}),
+    ('ix_orders_created_at', 'orders', ['created_at'], {}),
+    ('ix_order_items_order_id_product_id', 'order_items', ['order_id', 'product_id'], {}),
+    ('ix_order_items_product_id', 'order_items', ['product_id'], {}),
+    ('ix_products_active_listing', 'products', ['is_featured', 'category', 'price', 'id'], ACTIVE_PRODUCTS),
+    ('ix_products_active_price', 'products', ['is_featured', 'price', 'id'], ACTIVE_PRODUCTS),
+    ('ix_products_active_id', 'products', ['is_featured', 'id'], ACTIVE_PRODUCTS),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without blocking writes to live tables
+        with op.get_context().autocommit_block():
+            for name, table, columns, options in INDEXES:
+                op.create_index(name, table, columns, unique=False, postgresql_concurrently=True,
+                                if_not_exists=True, **options)
+    else:
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, unique=False, **options)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
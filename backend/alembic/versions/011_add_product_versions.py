@@ -0,0 +1,39 @@
+"""add product version column and catalog version counters
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    catalog_versions = op.create_table(
+        'catalog_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # Existing products all start at version 1
+    op.bulk_insert(catalog_versions, [
+        {'name': 'products', 'version': 1, 'updated_at': datetime.now(timezone.utc)},
+    ])
+
+
+def downgrade():
+    op.drop_table('catalog_versions')
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('version')
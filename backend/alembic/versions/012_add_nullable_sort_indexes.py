@@ -0,0 +1,39 @@
+"""add indexes for keyset pages sorted by rating and created_at
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+# (name, columns); keep in sync with Product.__table_args__
+INDEXES = [
+    ('ix_products_is_active_rating', ['is_active', 'rating', 'id']),
+    ('ix_products_is_active_created_at', ['is_active', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without blocking writes to the live table
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'products', columns, unique=False, postgresql_concurrently=True,
+                                if_not_exists=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, 'products', columns, unique=False)
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='products')
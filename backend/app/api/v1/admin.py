@@ -7,6 +7,10 @@ from datetime import datetime, timedelta
 from ...database import get_db
 from ...models import user as user_models, product as product_models, order as order_models
 from ...core.auth import get_current_admin_user
+from ...services import dashboard_stats, sales_rollup
+from ...services.order_events import orders_changed
+from ...services.product_cache import product_changed
+from ...utils.fast_json import ORJSONResponse, all_columns, rows_as_dicts
 from ...schemas.admin import (
     DashboardStatsResponse,
     RevenueChartData,
@@ -74,7 +78,7 @@ def safe_str(value, default: str = "") -> str:
 
 
 @router.get("/dashboard/stats", response_model=DashboardStatsResponse)
-async def get_dashboard_stats(
+def get_dashboard_stats(
     db: Session = Depends(get_db),
     current_user: user_models.User = Depends(get_current_admin_user)
 ):
@@ -93,147 +97,11 @@ async def get_dashboard_stats(
         - Recent orders list
     """
     try:
-        # ========================================
-        # 1. TOTAL REVENUE - All time
-        # ========================================
-        total_revenue_query = db.query(
-            func.sum(order_models.Order.total)
-        ).scalar()
-
-        # Safe conversion - prevents TypeError when no orders exist
-        total_revenue = safe_float(total_revenue_query)
-
-        # ========================================
-        # 2. RECENT REVENUE - Last 30 days
-        # ========================================
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-
-        recent_revenue_query = db.query(
-            func.sum(order_models.Order.total)
-        ).filter(
-            order_models.Order.created_at >= thirty_days_ago
-        ).scalar()
-
-        recent_revenue = safe_float(recent_revenue_query)
-
-        # ========================================
-        # 3. COUNTS - Orders, Users, Products
-        # ========================================
-        total_orders = safe_int(db.query(func.count(order_models.Order.id)).scalar())
-        total_users = safe_int(db.query(func.count(user_models.User.id)).scalar())
-        total_products = safe_int(db.query(func.count(product_models.Product.id)).count())
-
-        # ========================================
-        # 4. REVENUE CHART - Last 7 days
-        # ========================================
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-
-        daily_revenue_query = db.query(
-            func.date(order_models.Order.created_at).label('date'),
-            func.sum(order_models.Order.total).label('revenue'),
-            func.count(order_models.Order.id).label('orders')
-        ).filter(
-            order_models.Order.created_at >= seven_days_ago
-        ).group_by(
-            func.date(order_models.Order.created_at)
-        ).order_by(
-            func.date(order_models.Order.created_at)
-        ).all()
-
-        # Build revenue chart with safe conversions
-        revenue_chart = []
-        for row in daily_revenue_query:
-            chart_item = {
-                "date": str(row.date) if row.date else datetime.utcnow().date().isoformat(),
-                "revenue": safe_float(row.revenue),
-                "orders": safe_int(row.orders)
-            }
-            revenue_chart.append(chart_item)
-
-        # ========================================
-        # 5. ORDERS BY STATUS
-        # ========================================
-        orders_by_status_query = db.query(
-            order_models.Order.status,
-            func.count(order_models.Order.id).label('count')
-        ).group_by(
-            order_models.Order.status
-        ).all()
-
-        # Safe conversion - status might be string or enum
-        status_counts = {}
-        for status_val, count in orders_by_status_query:
-            status_key = safe_str(status_val, "unknown")
-            status_counts[status_key] = safe_int(count)
-
-        # ========================================
-        # 6. TOP SELLING PRODUCTS - Top 5
-        # ========================================
-        # Note: This assumes OrderItem model exists with product relationship
-        top_products = []
-        try:
-            # Join orders, order_items, and products to get top selling products
-            top_products_query = db.query(
-                product_models.Product.id,
-                product_models.Product.title.label('name'),  # Using title as name
-                product_models.Product.price,
-                func.sum(order_models.OrderItem.quantity).label('total_sold')
-            ).join(
-                order_models.OrderItem, order_models.OrderItem.product_id == product_models.Product.id
-            ).join(
-                order_models.Order, order_models.Order.id == order_models.OrderItem.order_id
-            ).group_by(
-                product_models.Product.id, product_models.Product.title, product_models.Product.price
-            ).order_by(
-                desc('total_sold')
-            ).limit(5).all()
-
-            for product in top_products_query:
-                top_products.append({
-                    "id": product.id,
-                    "name": safe_str(product.name, "Unknown Product"),
-                    "price": safe_float(product.price),
-                    "total_sold": safe_int(product.total_sold)
-                })
-        except Exception as e:
-            # If OrderItem doesn't exist or query fails, return empty list
-            # This prevents the entire endpoint from failing
-            print(f"Warning: Could not fetch top products: {e}")
-            top_products = []
-
-        # ========================================
-        # 7. RECENT ORDERS - Last 10
-        # ========================================
-        recent_orders_query = db.query(order_models.Order).order_by(
-            desc(order_models.Order.created_at)
-        ).limit(10).all()
-
-        recent_orders = []
-        for order in recent_orders_query:
-            recent_orders.append({
-                "id": order.id,
-                "customer_name": safe_str(getattr(order, 'full_name', None), "Guest"),
-                "total_amount": safe_float(order.total),
-                "status": safe_str(order.status, "pending"),
-                "created_at": order.created_at.isoformat() if order.created_at else datetime.utcnow().isoformat()
-            })
-
-        # ========================================
-        # 8. BUILD RESPONSE
-        # ========================================
+        # One conditional-aggregation pass over orders plus the two short
+        # lists, cached briefly and invalidated on order changes
         return {
             "success": True,
-            "data": {
-                "total_revenue": total_revenue,
-                "recent_revenue": recent_revenue,
-                "total_orders": total_orders,
-                "total_users": total_users,
-                "total_products": total_products,
-                "revenue_chart": revenue_chart,
-                "orders_by_status": status_counts,
-                "top_products": top_products,
-                "recent_orders": recent_orders
-            }
+            "data": dashboard_stats.get_dashboard_stats(db)
         }
 
     except Exception as e:
@@ -288,30 +156,10 @@ def get_revenue_chart(
     """Get revenue data for chart (last N days)"""
 
     try:
-        start_date = datetime.utcnow() - timedelta(days=days)
-
-        # Get orders grouped by date
-        daily_revenue = db.query(
-            func.date(order_models.Order.created_at).label('date'),
-            func.sum(order_models.Order.total).label('revenue'),
-            func.count(order_models.Order.id).label('orders')
-        ).filter(
-            order_models.Order.created_at >= start_date
-        ).group_by(
-            func.date(order_models.Order.created_at)
-        ).order_by(
-            func.date(order_models.Order.created_at)
-        ).all()
-
-        # Format for chart with safe conversions
-        chart_data = [
-            {
-                "date": str(date) if date else datetime.utcnow().date().isoformat(),
-                "revenue": safe_float(revenue),
-                "orders": safe_int(orders)
-            }
-            for date, revenue, orders in daily_revenue
-        ]
+        start_date = (datetime.utcnow() - timedelta(days=days)).date()
+
+        # One pre-aggregated row per day instead of grouping all orders by date
+        chart_data = sales_rollup.revenue_chart(db, start_date)
 
         return chart_data
     except Exception as e:
@@ -335,22 +183,23 @@ def get_all_products_admin(
 ):
     """Get all products for admin (with search)"""
 
-    query = db.query(product_models.Product)
+    # Column tuples encoded with orjson: no ORM instances for large pages
+    query = db.query(*all_columns(product_models.Product))
 
     if search:
         query = query.filter(
             product_models.Product.title.ilike(f"%{search}%")
         )
 
-    products = query.offset(skip).limit(limit).all()
+    products = rows_as_dicts(query.offset(skip).limit(limit).all())
     total = query.count()
 
-    return {
+    return ORJSONResponse({
         "products": products,
         "total": total,
         "skip": skip,
         "limit": limit
-    }
+    })
 
 @router.post("/products")
 def create_product_admin(
@@ -436,6 +285,7 @@ def update_product_admin(
 
     db.commit()
     db.refresh(product)
+    product_changed(product_id)
 
     return product
 
@@ -454,6 +304,7 @@ def delete_product_admin(
 
     db.delete(product)
     db.commit()
+    product_changed(product_id)
 
     return {"message": "Product deleted successfully", "id": product_id}
 
@@ -461,6 +312,15 @@ def delete_product_admin(
 # Order Management Endpoints
 # ============================================
 
+# Fields of each order in the admin order list (plus items_count)
+ADMIN_ORDER_COLUMNS = [
+    getattr(order_models.Order, name) for name in (
+        "id", "user_id", "full_name", "email", "phone", "address", "city", "state",
+        "zip_code", "country", "shipping_method", "payment_method", "subtotal",
+        "shipping_cost", "tax", "discount", "total", "status", "created_at", "updated_at",
+    )
+]
+
 @router.get("/orders")
 def get_all_orders_admin(
     skip: int = 0,
@@ -477,42 +337,29 @@ def get_all_orders_admin(
         query = query.filter(order_models.Order.status == status)
 
     total = query.count()
-    orders = query.order_by(order_models.Order.created_at.desc()).offset(skip).limit(limit).all()
 
-    # Add items count to each order
-    result = []
-    for order in orders:
-        order_dict = {
-            "id": order.id,
-            "user_id": order.user_id,
-            "full_name": order.full_name,
-            "email": order.email,
-            "phone": order.phone,
-            "address": order.address,
-            "city": order.city,
-            "state": order.state,
-            "zip_code": order.zip_code,
-            "country": order.country,
-            "shipping_method": order.shipping_method,
-            "payment_method": order.payment_method,
-            "subtotal": order.subtotal,
-            "shipping_cost": order.shipping_cost,
-            "tax": order.tax,
-            "discount": order.discount,
-            "total": order.total,
-            "status": order.status,
-            "created_at": order.created_at,
-            "updated_at": order.updated_at,
-            "items_count": len(order.items)
-        }
-        result.append(order_dict)
+    # Items are counted in the same query instead of loading each order's items
+    items_count = (
+        db.query(func.count(order_models.OrderItem.id))
+        .filter(order_models.OrderItem.order_id == order_models.Order.id)
+        .correlate(order_models.Order)
+        .scalar_subquery()
+        .label("items_count")
+    )
+    rows = (
+        query.with_entities(*ADMIN_ORDER_COLUMNS, items_count)
+        .order_by(order_models.Order.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
 
-    return {
-        "orders": result,
+    return ORJSONResponse({
+        "orders": rows_as_dicts(rows),
         "total": total,
         "skip": skip,
         "limit": limit
-    }
+    })
 
 @router.get("/orders/{order_id}")
 def get_order_admin(
@@ -551,9 +398,12 @@ def update_order_status_admin(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    old_status = order.status
     order.status = status
+    sales_rollup.record_status_change(db, order, old_status)
     db.commit()
     db.refresh(order)
+    orders_changed(order.user_id)
 
     return order
 
@@ -570,8 +420,10 @@ def delete_order_admin(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    sales_rollup.record_order_deleted(db, order)
     db.delete(order)
     db.commit()
+    orders_changed(order.user_id)
 
     return {"message": "Order deleted successfully", "id": order_id}
 
@@ -673,3 +525,35 @@ async def get_ai_insights(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while generating AI insights"
         )
+
+
+# ============================================
+# AI Response Cache Stats Endpoint
+# ============================================
+
+@router.get("/ai-cache/stats",
+            summary="Get LLM response cache statistics",
+            description="Hit/miss counters and size of this worker's LLM response cache, for sizing it")
+def get_ai_cache_stats(
+    current_user: user_models.User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """
+    Get hit/miss counters for the LLM response cache of the serving worker.
+    """
+    from ...services.llm_cache import get_llm_cache
+
+    return get_llm_cache().stats()
+
+
+@router.get("/product-cache/stats",
+            summary="Get product cache statistics",
+            description="L1/L2 hit ratios and invalidation counters of this worker's product cache")
+def get_product_cache_stats(
+    current_user: user_models.User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """
+    Get hit/miss counters for the product cache of the serving worker.
+    """
+    from ...services.product_cache import get_product_cache
+
+    return get_product_cache().stats()
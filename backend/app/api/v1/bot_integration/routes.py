@@ -11,6 +11,7 @@ from .service import (
     create_bot_api_key, get_api_key_usage_statistics
 )
 from ....models.bot import BotApiKey as BotApiKeyModel
+from ....utils.fast_json import ORJSONResponse
 
 router = APIRouter(prefix="/bot", tags=["bot_integration"])
 
@@ -60,13 +61,13 @@ def get_products(
     """
     try:
         products = get_product_data(db, product_id, category, limit, offset)
-        return {
+        return ORJSONResponse({
             "data": products,
             "total": len(products),
             "limit": limit,
             "offset": offset,
             "bot_name": bot_key.name
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
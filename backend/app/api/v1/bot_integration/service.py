@@ -9,6 +9,7 @@ from ....models.bot import BotApiKey
 from ....models.user import User
 from ....models.product import Product as ProductModel
 from ....models.order import Order as OrderModel
+from ....utils.fast_json import rows_as_dicts
 
 
 def generate_api_key() -> str:
@@ -82,6 +83,15 @@ def get_customer_data(
     ]
 
 
+# Product fields exposed to bots
+BOT_PRODUCT_COLUMNS = [
+    getattr(ProductModel, name) for name in (
+        "id", "title", "description", "price", "discount_price", "is_active",
+        "is_featured", "category", "image_url", "created_at", "updated_at",
+    )
+]
+
+
 def get_product_data(
     db: Session,
     product_id: int = None,
@@ -92,7 +102,7 @@ def get_product_data(
     """
     Get product data based on permissions
     """
-    query = db.query(ProductModel)
+    query = db.query(*BOT_PRODUCT_COLUMNS)
     
     if product_id:
         query = query.filter(ProductModel.id == product_id)
@@ -100,25 +110,8 @@ def get_product_data(
     if category:
         query = query.filter(ProductModel.category == category)
     
-    products = query.offset(offset).limit(limit).all()
-    
-    # Convert to dictionaries for JSON serialization
-    return [
-        {
-            "id": product.id,
-            "title": product.title,
-            "description": product.description,
-            "price": product.price,
-            "discount_price": product.discount_price,
-            "is_active": product.is_active,
-            "is_featured": product.is_featured,
-            "category": product.category,
-            "image_url": product.image_url,
-            "created_at": product.created_at,
-            "updated_at": product.updated_at
-        }
-        for product in products
-    ]
+    # Column tuples straight to dictionaries, no ORM instances
+    return rows_as_dicts(query.offset(offset).limit(limit).all())
 
 
 def get_order_data(
@@ -72,7 +72,7 @@ async def send_chat_message(
 
         return {
             "response": ai_response,
-            "context": context,
+            "context": {**context, "recent_orders": [order.as_dict() for order in recent_orders]},
             "user_id": current_user.id,
             "success": True
         }
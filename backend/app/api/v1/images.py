@@ -3,24 +3,105 @@ Image processing endpoints for iShop E-commerce Platform
 Provides image proxy, resizing, and optimization services
 """
 
-import io
 import asyncio
+import os
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
-import aiohttp
-from fastapi import APIRouter, HTTPException, Query, Response, Depends
-from PIL import Image
+from fastapi import APIRouter, HTTPException, Query, Request, Response, Depends
+from fastapi.responses import FileResponse, StreamingResponse
+from PIL import UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
 
+from ...config import settings
 from ...core.auth import get_current_user
 from ...models.user import User
+from ...services.image_cache import CachedImage, ImageCache, get_image_cache
+from ...services.image_fetch import RequestCoalescer, get_image_session
+from ...services.image_pool import ImageQueueFull, get_image_pool
+from ...services.image_variants import DIGEST, FILE_NAME, create_variants, get_variant_store
+from ...utils.image_processing import process_image
 from fastapi import UploadFile, File
 
 router = APIRouter()
 
-# Cache for processed images (in a real app, use Redis or similar)
-image_cache = {}
+# In-flight source downloads (by URL) and processed variants (by cache key)
+_fetches = RequestCoalescer()
+_renders = RequestCoalescer()
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Image processing is busy, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+
+async def _process(image_bytes: bytes, width: Optional[int], height: Optional[int],
+                   quality: int, format: Optional[str]):
+    """Run process_image in the image worker pool, shedding load when it is full."""
+    try:
+        return await get_image_pool().run(process_image, image_bytes, width, height, quality, format)
+    except ImageQueueFull:
+        raise _busy()
+
+
+async def _fetch_source(url: str) -> Tuple[bytes, str]:
+    """Download a source image over the shared, pooled session."""
+    async with get_image_session().get(url) as resp:
+        if resp.status != 200:
+            raise HTTPException(status_code=404, detail="Image not found at source URL")
+        
+        # Check content type to ensure it's an image
+        content_type = resp.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            raise HTTPException(status_code=400, detail="URL does not point to an image")
+        
+        return await resp.read(), content_type
+
+
+async def _render(url: str, width: Optional[int], height: Optional[int], quality: int,
+                  format: Optional[str], cache_key: str) -> CachedImage:
+    """Fetch, process and cache one proxy variant."""
+    image_bytes, content_type = await _fetches.run(url, lambda: _fetch_source(url))
+    
+    # Process the image (resize, convert format, adjust quality)
+    processed_image_bytes, output_format = await _process(image_bytes, width, height, quality, format)
+    
+    # Determine content type based on format
+    content_type_map = {
+        "jpeg": "image/jpeg",
+        "png": "image/png", 
+        "webp": "image/webp"
+    }
+    output_content_type = content_type_map.get(output_format, content_type)
+    
+    # Cache the processed image
+    return await run_in_threadpool(
+        get_image_cache().put, cache_key, processed_image_bytes, output_content_type
+    )
+
+
+def _iter_file(f, chunk_size: int = 64 * 1024):
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def _cached_image_response(image: CachedImage) -> Response:
+    headers = {
+        "Cache-Control": "public, max-age=86400",  # Cache for 1 day
+        "ETag": f'"{image.digest}"',
+        "X-From-Cache": "true"
+    }
+    if image.data is None:
+        # Large entries are streamed from the disk tier through the handle
+        # load() opened, so a prune by another worker cannot pull the file away
+        headers["Content-Length"] = str(os.fstat(image.file.fileno()).st_size)
+        return StreamingResponse(_iter_file(image.file), media_type=image.content_type, headers=headers)
+    return Response(content=image.data, media_type=image.content_type, headers=headers)
 
 @router.get("/image")
 async def proxy_image(
@@ -41,153 +122,103 @@ async def proxy_image(
         raise HTTPException(status_code=400, detail="Invalid URL provided")
     
     # Validate URL is for an image domain (for security)
-    allowed_domains = ["images.unsplash.com", "images.pexels.com", "picsum.photos"]
-    if parsed.netloc not in allowed_domains:
+    allowed_domains = [domain.strip() for domain in settings.IMAGE_PROXY_ALLOWED_DOMAINS.split(",")]
+    if parsed.hostname not in allowed_domains:
         raise HTTPException(status_code=400, detail="Domain not allowed for proxying")
     
-    # Check cache first
-    cache_key = f"{url}_{width}_{height}_{quality}_{format}"
-    if cache_key in image_cache:
-        cached_data, cached_content_type = image_cache[cache_key]
+    try:
+        # If no processing needed, just return the original image
+        if not width and not height and not format:
+            image_bytes, content_type = await _fetches.run(url, lambda: _fetch_source(url))
+            return Response(
+                content=image_bytes,
+                media_type=content_type,
+                headers={"Cache-Control": "public, max-age=86400"}
+            )
+        
+        # Check cache first (memory, then the disk tier shared by all workers)
+        image_cache = get_image_cache()
+        cache_key = ImageCache.make_key(url, width, height, quality, format)
+        cached = image_cache.get(cache_key) or await run_in_threadpool(image_cache.load, cache_key)
+        if cached is not None:
+            return _cached_image_response(cached)
+        
+        # Concurrent misses for the same URL and size share one fetch and resize
+        processed = await _renders.run(
+            cache_key, lambda: _render(url, width, height, quality, format, cache_key)
+        )
         return Response(
-            content=cached_data,
-            media_type=cached_content_type,
+            content=processed.data,
+            media_type=processed.content_type,
             headers={
-                "Cache-Control": "public, max-age=86400",  # Cache for 1 day
-                "X-From-Cache": "true"
+                "Cache-Control": "public, max-age=86400, stale-while-revalidate=86400",  # Cache for 1 day, allow stale revalidation for 1 day
+                "ETag": f'"{processed.digest}"',  # Content hash, same in every worker
+                "Expires": (datetime.utcnow() + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT'),  # Expires header
+                "X-Processed": "true",
+                "X-Content-Type-Options": "nosniff"  # Security header
             }
         )
     
-    try:
-        # Download the original image
-        timeout = aiohttp.ClientTimeout(total=10)  # 10 second timeout
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, headers={"User-Agent": "iShop Image Proxy 1.0"}) as resp:
-                if resp.status != 200:
-                    raise HTTPException(status_code=404, detail="Image not found at source URL")
-                
-                # Check content type to ensure it's an image
-                content_type = resp.headers.get("Content-Type", "")
-                if not content_type.startswith("image/"):
-                    raise HTTPException(status_code=400, detail="URL does not point to an image")
-                
-                image_bytes = await resp.read()
-                
-                # If no processing needed, just return the original image
-                if not width and not height and not format:
-                    return Response(
-                        content=image_bytes,
-                        media_type=content_type,
-                        headers={"Cache-Control": "public, max-age=86400"}
-                    )
-                
-                # Process the image (resize, convert format, adjust quality)
-                processed_image_bytes, output_format = await asyncio.get_event_loop().run_in_executor(
-                    None, process_image, image_bytes, width, height, quality, format
-                )
-                
-                # Determine content type based on format
-                content_type_map = {
-                    "jpeg": "image/jpeg",
-                    "png": "image/png", 
-                    "webp": "image/webp"
-                }
-                output_content_type = content_type_map.get(output_format, content_type)
-                
-                # Cache the processed image
-                image_cache[cache_key] = (processed_image_bytes, output_content_type)
-                
-                return Response(
-                    content=processed_image_bytes,
-                    media_type=output_content_type,
-                    headers={
-                        "Cache-Control": "public, max-age=86400, stale-while-revalidate=86400",  # Cache for 1 day, allow stale revalidation for 1 day
-                        "ETag": f'"{hash(processed_image_bytes)}"',  # Add ETag for client-side caching
-                        "Expires": (datetime.utcnow() + timedelta(days=1)).strftime('%a, %d %b %Y %H:%M:%S GMT'),  # Expires header
-                        "X-Processed": "true",
-                        "X-Content-Type-Options": "nosniff"  # Security header
-                    }
-                )
-    
+    except HTTPException:
+        # Re-raise HTTP exceptions (404/400 from the source, 503 when busy) as-is
+        raise
     except asyncio.TimeoutError:
         raise HTTPException(status_code=408, detail="Request timeout while fetching image")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
-def process_image(image_bytes: bytes, width: Optional[int], height: Optional[int], 
-                  quality: int, target_format: Optional[str]):
-    """
-    Process an image: resize, change format, adjust quality
-    This runs in a separate thread to avoid blocking the event loop
-    """
-    try:
-        # Open the image
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert RGBA to RGB if needed for JPEG
-        if image.mode in ("RGBA", "LA") and target_format in ("jpeg", "jpg"):
-            background = Image.new("RGB", image.size, (255, 255, 255))
-            background.paste(image, mask=image.split()[-1] if image.mode == "RGBA" else None)
-            image = background
-        
-        # Resize if dimensions provided
-        if width or height:
-            # Calculate dimensions maintaining aspect ratio if only one dimension provided
-            original_width, original_height = image.size
-            if width and height:
-                # Resize to exact dimensions (may change aspect ratio)
-                image = image.resize((width, height), Image.LANCZOS)
-            elif width:
-                # Resize based on width maintaining aspect ratio
-                new_height = int((width / original_width) * original_height)
-                image = image.resize((width, new_height), Image.LANCZOS)
-            elif height:
-                # Resize based on height maintaining aspect ratio
-                new_width = int((height / original_height) * original_width)
-                image = image.resize((new_width, height), Image.LANCZOS)
-        
-        # Determine output format
-        output_format = target_format or image.format or "JPEG"
-        if output_format.upper() not in ["JPEG", "PNG", "WEBP"]:
-            output_format = "JPEG"  # Default to JPEG if format is not supported
-        
-        # Save to bytes with specified format and quality
-        output_bytes = io.BytesIO()
-        
-        if output_format.upper() == "JPEG":
-            image.save(output_bytes, format="JPEG", quality=quality, optimize=True)
-        elif output_format.upper() == "PNG":
-            image.save(output_bytes, format="PNG", optimize=True)
-        elif output_format.upper() == "WEBP":
-            image.save(output_bytes, format="WEBP", quality=quality, method=4, optimize=True)
-        
-        return output_bytes.getvalue(), output_format.lower()
-    
-    except Exception as e:
-        raise e
-
-
 @router.get("/health")
 async def image_service_health():
     """Health check for the image service"""
+    cache_stats = get_image_cache().stats()
     return {
         "status": "healthy",
-        "cache_size": len(image_cache)
+        "cache_size": cache_stats["entries"],
+        "cache": cache_stats,
+        "workers": get_image_pool().stats(),
+        "upstream": {"fetches": _fetches.stats(), "renders": _renders.stats()}
+    }
+
+
+UPLOAD_CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+
+
+def _manifest_response(request: Request, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Manifest with URLs and a ready-made ``srcset`` per format."""
+    def url(name: str) -> str:
+        return request.url_for("get_uploaded_file", name=name).path
+
+    variants = [{**variant, "url": url(variant["file"])} for variant in manifest["variants"]]
+    srcset: Dict[str, List[str]] = {}
+    for variant in variants:
+        srcset.setdefault(variant["format"], []).append(f'{variant["url"]} {variant["width"]}w')
+    fallback = [v for v in variants if v["format"] == "jpeg"] or variants
+    return {
+        "id": manifest["id"],
+        "width": manifest["width"],
+        "height": manifest["height"],
+        "original": url(manifest["original"]),
+        "placeholder": manifest["placeholder"],
+        "src": fallback[-1]["url"],
+        "srcset": {fmt: ", ".join(entries) for fmt, entries in srcset.items()},
+        "variants": variants,
     }
 
 
-@router.post("/upload")
+@router.post("/upload", status_code=201)
 async def upload_image(
+    request: Request,
     file: UploadFile = File(...),
-    width: Optional[int] = Query(None, ge=1, le=5000),
-    height: Optional[int] = Query(None, ge=1, le=5000),
     quality: int = Query(80, ge=1, le=100),
-    format: Optional[str] = Query(None, regex="^(jpeg|png|webp)$"),
     user: User = Depends(get_current_user)
 ):
     """
-    Upload an image file with optional processing
+    Upload an image and generate its responsive variants
+
+    Every configured width in every configured format, plus an LQIP
+    placeholder, is encoded up front in the image worker pool and stored
+    content-addressed; the response is the srcset manifest.
     """
     
     # Validate file type
@@ -202,31 +233,39 @@ async def upload_image(
         raise HTTPException(status_code=400, detail="File too large, maximum size is 10MB")
     
     try:
-        # Process the image
-        processed_image_bytes, output_format = await asyncio.get_event_loop().run_in_executor(
-            None, process_image, contents, width, height, quality, format
-        )
-        
-        # Determine content type based on format
-        content_type_map = {
-            "jpeg": "image/jpeg",
-            "png": "image/png", 
-            "webp": "image/webp"
-        }
-        output_content_type = content_type_map.get(output_format, file.content_type)
-        
-        # In a real implementation, you would save the processed image to storage
-        # and return metadata about the saved file
-        # For now, returning the processed image directly
-        
-        return Response(
-            content=processed_image_bytes,
-            media_type=output_content_type,
-            headers={
-                "Cache-Control": "public, max-age=86400",
-                "X-Processed": "true"
-            }
-        )
-        
+        manifest = await create_variants(contents, quality)
+    except ImageQueueFull:
+        raise _busy()
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="Uploaded file is not a readable image")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing uploaded image: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing uploaded image: {str(e)}")
+    
+    return {"success": True, "data": _manifest_response(request, manifest)}
+
+
+@router.get("/uploads/{name}", name="get_uploaded_file")
+async def get_uploaded_file(name: str):
+    """Serve an original or variant; names are content hashes, so never stale."""
+    if not FILE_NAME.match(name):
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = get_variant_store().file_path(name)
+    if not await run_in_threadpool(os.path.exists, path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(
+        path,
+        media_type=UPLOAD_CONTENT_TYPES.get(name.rsplit(".", 1)[1], "application/octet-stream"),
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{name.split(".")[0]}"'
+        }
+    )
+
+
+@router.get("/manifests/{image_id}")
+async def get_upload_manifest(request: Request, image_id: str):
+    """srcset manifest of an earlier upload"""
+    manifest = DIGEST.match(image_id) and await run_in_threadpool(get_variant_store().get_manifest, image_id)
+    if not manifest:
+        raise HTTPException(status_code=404, detail="Manifest not found")
+    return {"success": True, "data": _manifest_response(request, manifest)}
@@ -8,6 +8,9 @@ from ...database import get_db
 from ...models.user import User
 from ...models import order as order_models
 from ...schemas import order as order_schemas
+from ...services.copurchase_matrix import record_order
+from ...services.order_events import orders_changed
+from ...services.sales_rollup import record_order_created, record_status_change
 
 router = APIRouter()
 
@@ -37,26 +40,27 @@ def create_order(
         tax=order.tax,
         discount=order.discount,
         total=order.total,
-        status=order_models.OrderStatus.PENDING
+        status=order_models.OrderStatus.PENDING.value
     )
-
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-
-    # Create order items
-    for item in order.items:
-        db_item = order_models.OrderItem(
-            order_id=db_order.id,
+    db_order.items = [
+        order_models.OrderItem(
             product_id=item.product_id,
             quantity=item.quantity,
             price_at_time=item.price_at_time
         )
-        db.add(db_item)
+        for item in order.items
+    ]
 
+    # Order, items and the daily sales rollup are committed together
+    db.add(db_order)
+    record_order_created(db, db_order)
     db.commit()
     db.refresh(db_order)
 
+    # Feed the new basket to the co-purchase matrix used by recommendations
+    record_order(db_order.id, [item.product_id for item in order.items])
+    orders_changed(current_user.id)
+
     return db_order
 
 @router.get("/", response_model=List[order_schemas.OrderListResponse])
@@ -124,14 +128,17 @@ def cancel_order(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    if order.status not in [order_models.OrderStatus.PENDING, order_models.OrderStatus.PROCESSING]:
+    if order.status not in [order_models.OrderStatus.PENDING.value, order_models.OrderStatus.PROCESSING.value]:
         raise HTTPException(
             status_code=400,
             detail="Can only cancel pending or processing orders"
         )
 
-    order.status = order_models.OrderStatus.CANCELLED
+    old_status = order.status
+    order.status = order_models.OrderStatus.CANCELLED.value
+    record_status_change(db, order, old_status)
     db.commit()
     db.refresh(order)
+    orders_changed(order.user_id)
 
     return order
\ No newline at end of file
@@ -5,19 +5,34 @@ This module provides REST API endpoints for product management including:
 - List all products with filtering and pagination
 - Get single product by ID
 - Create, update, and delete products (admin only)
+- Search products by image (visual similarity index)
 """
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import base64
+import binascii
+import json
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
 import logging
 
 from app.database import get_db
+from app.models.catalog_version import PRODUCTS_CATALOG, read_catalog_version
 from app.models.product import Product
 from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
 from app.core.auth import get_current_user, get_current_admin_user
 from app.models.user import User
+from app.services.image_search_service import ImageSearchService
+from app.services.product_cache import get_product_cache, product_changed
+from app.services.visual_index import index_product_image
+from app.utils.cache_utils import is_conditional, is_not_modified, validator_headers, version_etag
+from app.utils.fast_json import ORJSONResponse, columns_for, missing_fields, rows_as_dicts, validate_sample
+from app.utils.search_index import get_search_backend
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -27,16 +42,139 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Sortable columns for the product listing. ``id`` is always appended as the
+# tie-breaker so that keyset pagination has a total order.
+SORT_COLUMNS = {
+    "id": Product.id,
+    "price": Product.price,
+    "rating": Product.rating,
+    "created_at": Product.created_at,
+}
+
+# Nullable sort columns: NULL sorts as the smallest value (NULLS FIRST
+# ascending, NULLS LAST descending, as SQLite orders them) and a cursor on a
+# NULL row holds a null sort value
+NULLABLE_SORT_COLUMNS = {"rating", "created_at"}
+
+# JSON types a cursor's sort value may have (bool is rejected separately)
+CURSOR_VALUE_TYPES = {
+    "id": (int,),
+    "price": (int, float),
+    "rating": (int, float, type(None)),
+    "created_at": (str, type(None)),
+}
+
+# The listing loads ProductResponse's columns as tuples and encodes them
+# directly; the model is only used for (sampled) validation and the docs
+PRODUCT_LIST_COLUMNS = columns_for(Product, ProductResponse)
+PRODUCT_LIST_DEFAULTS = missing_fields(Product, ProductResponse)
+_product_list_adapter = TypeAdapter(List[ProductResponse])
+
+
+def _encode_cursor(sort_by: str, sort_order: str, product: Any) -> str:
+    """Build an opaque cursor pointing just after ``product`` (a Product or a row)."""
+    value = getattr(product, sort_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = {"s": sort_by, "o": sort_order, "v": value, "id": product.id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, int]:
+    """Decode a cursor and return ``(sort_value, id)``.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed, its sort value is of
+            the wrong type (null is only valid for nullable sort columns), or
+            it was issued for a different sort than the current request.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        cursor_sort, cursor_order = payload["s"], payload["o"]
+        value, last_id = payload["v"], int(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+    if cursor_sort != sort_by or cursor_order != sort_order:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pagination cursor does not match the requested sort order"
+        )
+
+    if isinstance(value, bool) or not isinstance(value, CURSOR_VALUE_TYPES[sort_by]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+    if sort_by == "created_at" and value is not None:
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+    return value, last_id
+
+
+def _apply_sort(query, sort_by: str, sort_order: str, cursor: Optional[str] = None):
+    """Order ``query`` by ``(sort_by, id)`` and, if given, seek past ``cursor``.
+
+    The seek predicate ``(col > v) OR (col = v AND id > last_id)`` (mirrored for
+    descending order) lets the database start from an index position instead
+    of walking and discarding ``skip`` rows, so every page costs the same.
+    Nullable columns get an explicit NULL branch rather than a COALESCE, so
+    the comparisons stay on the raw, indexed column.
+    """
+    column = SORT_COLUMNS[sort_by]
+    descending = sort_order == "desc"
+    nullable = sort_by in NULLABLE_SORT_COLUMNS
+
+    if cursor:
+        value, last_id = _decode_cursor(cursor, sort_by, sort_order)
+        after_id = Product.id < last_id if descending else Product.id > last_id
+        if sort_by == "id":
+            query = query.filter(after_id)
+        elif value is None:
+            # NULLs are the first rows ascending and the last descending
+            if descending:
+                query = query.filter(column.is_(None), after_id)
+            else:
+                query = query.filter(or_(and_(column.is_(None), after_id), column.isnot(None)))
+        else:
+            seek = or_(column < value if descending else column > value, and_(column == value, after_id))
+            if nullable and descending:
+                seek = or_(seek, column.is_(None))
+            query = query.filter(seek)
+
+    if sort_by == "id":
+        return query.order_by(Product.id.desc() if descending else Product.id.asc())
+    if descending:
+        order = column.desc().nulls_last() if nullable else column.desc()
+        return query.order_by(order, Product.id.desc())
+    order = column.asc().nulls_first() if nullable else column.asc()
+    return query.order_by(order, Product.id.asc())
+
 
 @router.get("/", response_model=List[ProductResponse])
 def read_products(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of records to return"),
     category: Optional[str] = Query(None, description="Filter by category"),
     featured: Optional[bool] = Query(None, description="Filter by featured status"),
     min_price: Optional[float] = Query(None, ge=0, description="Minimum price filter"),
     max_price: Optional[float] = Query(None, ge=0, description="Maximum price filter"),
-    search: Optional[str] = Query(None, description="Search in title and description"),
+    search: Optional[str] = Query(None, description="Full-text search in title, description, category and tags"),
+    sort_by: str = Query("id", pattern="^(id|price|rating|created_at)$", description="Sort field"),
+    sort_order: str = Query("asc", pattern="^(asc|desc)$", description="Sort order (asc/desc)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor for keyset pagination"),
     db: Session = Depends(get_db)
 ):
     """
@@ -48,11 +186,36 @@ def read_products(
     - **featured**: Filter by featured status (true/false)
     - **min_price**: Minimum price filter
     - **max_price**: Maximum price filter
-    - **search**: Search term for title/description
+    - **search**: Full-text search over title, description, category and tags
+    - **sort_by**: Sort by id, price, rating or created_at (ties broken by id)
+    - **sort_order**: Sort direction (asc/desc)
+    - **cursor**: Continue after the last page instead of using ``skip``
+
+    When a full page is returned, the ``X-Next-Cursor`` response header holds
+    the cursor for the following page. Cursor pages seek directly to their
+    start, so deep pages cost the same as the first one.
+
+    The ETag is the catalog version, so a conditional request is answered
+    with 304 after one primary-key lookup, before any product is loaded.
+
+    Rows are loaded as column tuples and encoded with orjson; validation
+    against ``ProductResponse`` is sampled (see ``app.utils.fast_json``).
     """
+    if cursor and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either skip or cursor for pagination, not both"
+        )
+
     try:
+        # Read before the rows: a change in between only makes the ETag older
+        catalog_version, catalog_modified = read_catalog_version(db.connection(), PRODUCTS_CATALOG)
+        headers = validator_headers(version_etag("products", catalog_version), catalog_modified)
+        if is_not_modified(request.headers, headers["ETag"], catalog_modified):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
         # Start with base query
-        query = db.query(Product)
+        query = db.query(*PRODUCT_LIST_COLUMNS)
         
         # Try to filter by is_active, but handle case where column doesn't exist
         try:
@@ -61,7 +224,7 @@ def read_products(
             # Column might not exist in database, log and continue without filter
             logger.warning(f"Could not filter by is_active: {e}")
             # Continue without is_active filter
-            query = db.query(Product)
+            query = db.query(*PRODUCT_LIST_COLUMNS)
         
         # Apply optional filters
         if category:
@@ -87,16 +250,21 @@ def read_products(
             query = query.filter(Product.price <= max_price)
         
         if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Product.title.ilike(search_term)) |
-                (Product.description.ilike(search_term))
-            )
+            query = get_search_backend(db).filter(query, search)
         
+        query = _apply_sort(query, sort_by, sort_order, cursor)
+
         # Execute query with pagination
-        products = query.offset(skip).limit(limit).all()
-        return products
-        
+        if not cursor:
+            query = query.offset(skip)
+        rows = query.limit(limit).all()
+
+        if len(rows) == limit:
+            headers["X-Next-Cursor"] = _encode_cursor(sort_by, sort_order, rows[-1])
+        products = rows_as_dicts(rows, **PRODUCT_LIST_DEFAULTS)
+        validate_sample(_product_list_adapter, products, "read_products")
+        return ORJSONResponse(products, headers=headers)
+
     except SQLAlchemyError as e:
         logger.error(f"Database error in read_products: {e}")
         raise HTTPException(
@@ -105,39 +273,48 @@ def read_products(
         )
 
 
+def _product_validators(product_id: int, version: int, updated_at, created_at):
+    return validator_headers(version_etag("product", product_id, version), updated_at or created_at)
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
-def read_product(
+async def read_product(
     product_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     """
     Retrieve a single product by ID.
     
     - **product_id**: The unique identifier of the product
+    
+    Served from the product cache; admin edits invalidate it in every worker.
+    Conditional requests (If-None-Match / If-Modified-Since) are checked
+    against the product's version with one primary-key lookup and answered
+    with 304 before the product is loaded or serialized.
     """
-    try:
+    def load_validators():
+        return db.query(
+            Product.version, Product.updated_at, Product.created_at, Product.is_active
+        ).filter(Product.id == product_id).first()
+
+    def load() -> Optional[Dict[str, Any]]:
         product = db.query(Product).filter(Product.id == product_id).first()
-        
-        if product is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product with id {product_id} not found"
-            )
-        
-        # Check if product is active (if column exists)
-        try:
-            if hasattr(product, 'is_active') and not product.is_active:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail=f"Product with id {product_id} not found"
-                )
-        except AttributeError:
-            pass  # Column doesn't exist, skip check
-        
-        return product
-        
-    except HTTPException:
-        raise
+        # Inactive products are hidden from the storefront
+        if product is None or not product.is_active:
+            return None
+        return ProductResponse.model_validate(product).model_dump()
+
+    try:
+        if is_conditional(request.headers):
+            row = await run_in_threadpool(load_validators)
+            if row is not None and row.is_active:
+                headers = _product_validators(product_id, row.version, row.updated_at, row.created_at)
+                if is_not_modified(request.headers, headers["ETag"], row.updated_at or row.created_at):
+                    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = await get_product_cache().get_or_compute(str(product_id), lambda: run_in_threadpool(load))
     except SQLAlchemyError as e:
         logger.error(f"Database error in read_product: {e}")
         raise HTTPException(
@@ -145,10 +322,21 @@ def read_product(
             detail="Database error occurred while fetching product"
         )
 
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with id {product_id} not found"
+        )
+    response.headers.update(
+        _product_validators(product_id, data["version"], data["updated_at"], data["created_at"])
+    )
+    return data
+
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
 def create_product(
     product: ProductCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
@@ -166,6 +354,8 @@ def create_product(
         db.refresh(db_product)
         
         logger.info(f"Product created: {db_product.id} by user {current_user.id}")
+        if db_product.image_url:
+            background_tasks.add_task(index_product_image, db_product.id, db_product.image_url)
         return db_product
         
     except SQLAlchemyError as e:
@@ -177,10 +367,41 @@ def create_product(
         )
 
 
+@router.post("/search-by-image",
+             summary="Search products by image",
+             description="Upload an image to find similar products in the store")
+async def search_products_by_image(
+    image_data: Dict[str, str],
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Search for products using an image.
+    
+    - **image**: base64 encoded image (a data URL is accepted too)
+    
+    The image is fingerprinted locally and matched against the visual
+    index of product images; results carry a ``similarity_score``.
+    """
+    if "image" not in image_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing image data"
+        )
+    
+    results = await ImageSearchService(db).search_by_image(image_data["image"])
+    if results.get("error") == "Invalid image format":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid image format"
+        )
+    return results
+
+
 @router.put("/{product_id}", response_model=ProductResponse)
 def update_product(
     product_id: int,
     product: ProductUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
@@ -201,6 +422,7 @@ def update_product(
         
         # Update only provided fields
         update_data = product.model_dump(exclude_unset=True)
+        image_changed = "image_url" in update_data and update_data["image_url"] != db_product.image_url
         for field, value in update_data.items():
             setattr(db_product, field, value)
         
@@ -208,6 +430,9 @@ def update_product(
         db.refresh(db_product)
         
         logger.info(f"Product updated: {product_id} by user {current_user.id}")
+        product_changed(product_id)
+        if image_changed and db_product.image_url:
+            background_tasks.add_task(index_product_image, db_product.id, db_product.image_url)
         return db_product
         
     except HTTPException:
@@ -245,6 +470,7 @@ def delete_product(
         db.commit()
         
         logger.info(f"Product deleted: {product_id} by user {current_user.id}")
+        product_changed(product_id)
         return None
         
     except HTTPException:
@@ -113,6 +113,83 @@ class Settings(BaseSettings):
         os.getenv("DEEPSEEK_DAILY_LIMIT", "1000")
     )
 
+    # Redis (optional, shared caches across workers)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+
+    # Outbound AI rate limiting ("redis" shares budgets across workers)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "redis" if os.getenv("REDIS_URL") else "local")
+    RATE_LIMIT_MAX_WAIT: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))
+
+    # LLM response cache
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_BACKEND: str = os.getenv("LLM_CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "sqlite")
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+    LLM_CACHE_TTL: int = int(os.getenv("LLM_CACHE_TTL", "86400"))
+
+    # Shared outbound HTTP client (LLM APIs)
+    HTTP_CLIENT_HTTP2: bool = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() == "true"
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "100"))
+    HTTP_CLIENT_MAX_KEEPALIVE: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "20"))
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "30"))
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "5"))
+    HTTP_CLIENT_READ_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_READ_TIMEOUT", "60"))
+    HTTP_CLIENT_WRITE_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_WRITE_TIMEOUT", "10"))
+    HTTP_CLIENT_POOL_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_POOL_TIMEOUT", "5"))
+
+    # Co-purchase matrix for recommendations (memory-mapped .npy files)
+    COPURCHASE_MATRIX_DIR: str = os.getenv("COPURCHASE_MATRIX_DIR", "data/copurchase")
+    COPURCHASE_MAX_BASKET_SIZE: int = int(os.getenv("COPURCHASE_MAX_BASKET_SIZE", "50"))
+
+    # Per-user purchase history cache (chat context, recommendations)
+    PURCHASE_HISTORY_CACHE_SIZE: int = int(os.getenv("PURCHASE_HISTORY_CACHE_SIZE", "4096"))
+    PURCHASE_HISTORY_CACHE_TTL: float = float(os.getenv("PURCHASE_HISTORY_CACHE_TTL", "60"))
+
+    # Image proxy cache (memory LRU + content-addressed files shared by workers)
+    IMAGE_CACHE_MAX_BYTES: int = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    IMAGE_CACHE_MAX_ENTRIES: int = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "2048"))
+    IMAGE_CACHE_TTL: int = int(os.getenv("IMAGE_CACHE_TTL", "86400"))
+    IMAGE_CACHE_DIR: str = os.getenv("IMAGE_CACHE_DIR", "data/image-cache")  # empty: memory only
+    IMAGE_CACHE_DISK_MAX_BYTES: int = int(os.getenv("IMAGE_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+    # Image proxy upstream (pooled aiohttp session, hosts it may fetch from)
+    IMAGE_PROXY_ALLOWED_DOMAINS: str = os.getenv(
+        "IMAGE_PROXY_ALLOWED_DOMAINS", "images.unsplash.com,images.pexels.com,picsum.photos"
+    )  # comma-separated
+    IMAGE_FETCH_MAX_CONNECTIONS: int = int(os.getenv("IMAGE_FETCH_MAX_CONNECTIONS", "100"))
+    IMAGE_FETCH_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("IMAGE_FETCH_MAX_CONNECTIONS_PER_HOST", "10"))
+    IMAGE_FETCH_DNS_TTL: int = int(os.getenv("IMAGE_FETCH_DNS_TTL", "300"))
+    IMAGE_FETCH_KEEPALIVE_EXPIRY: float = float(os.getenv("IMAGE_FETCH_KEEPALIVE_EXPIRY", "30"))
+    IMAGE_FETCH_CONNECT_TIMEOUT: float = float(os.getenv("IMAGE_FETCH_CONNECT_TIMEOUT", "5"))
+    IMAGE_FETCH_TIMEOUT: float = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+
+    # Image processing workers per API worker (0: threads) and job queue bound
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    IMAGE_QUEUE_SIZE: int = int(os.getenv("IMAGE_QUEUE_SIZE", "32"))
+
+    # Uploaded images: responsive variants generated eagerly, stored content-addressed
+    IMAGE_UPLOAD_DIR: str = os.getenv("IMAGE_UPLOAD_DIR", "data/uploads")
+    IMAGE_VARIANT_WIDTHS: str = os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,960,1280,1920")  # comma-separated
+    IMAGE_VARIANT_FORMATS: str = os.getenv("IMAGE_VARIANT_FORMATS", "webp,jpeg")  # comma-separated, preferred first
+    IMAGE_PLACEHOLDER_WIDTH: int = int(os.getenv("IMAGE_PLACEHOLDER_WIDTH", "24"))
+
+    # Visual image search (perceptual hash index, memory-mapped .npy files)
+    VISUAL_INDEX_DIR: str = os.getenv("VISUAL_INDEX_DIR", "data/visual-index")
+    VISUAL_INDEX_FETCH_REMOTE: bool = os.getenv("VISUAL_INDEX_FETCH_REMOTE", "true").lower() == "true"  # when indexing only
+    VISUAL_SEARCH_MIN_SCORE: float = float(os.getenv("VISUAL_SEARCH_MIN_SCORE", "0.6"))
+
+    # Product detail cache (per-worker L1 in front of Redis, invalidated by broadcast)
+    PRODUCT_CACHE_TTL: int = int(os.getenv("PRODUCT_CACHE_TTL", "3600"))
+    PRODUCT_CACHE_L1_TTL: int = int(os.getenv("PRODUCT_CACHE_L1_TTL", "300"))
+    PRODUCT_CACHE_MAX_ENTRIES: int = int(os.getenv("PRODUCT_CACHE_MAX_ENTRIES", "10000"))
+
+    # Fraction of fast-path list responses validated against their response model
+    # outside development (development validates every response)
+    RESPONSE_VALIDATION_SAMPLE_RATE: float = float(os.getenv("RESPONSE_VALIDATION_SAMPLE_RATE", "0.01"))
+
+    # Admin dashboard stats cache (seconds; dropped on any order change)
+    ADMIN_STATS_CACHE_TTL: float = float(os.getenv("ADMIN_STATS_CACHE_TTL", "30"))
+
     # Helper properties
     @property
     def IS_DEVELOPMENT(self) -> bool:
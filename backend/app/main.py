@@ -1,20 +1,74 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from app.api.v1 import api_router
 from app.core.config import settings
+from app.middleware.compression_middleware import CompressionMiddleware
+from app.middleware.etag_middleware import ETAGMiddleware
+from app.services.http_client import close_http_client, init_http_client
+from app.services.image_fetch import close_image_session, init_image_session
+from app.services.image_pool import shutdown_image_pool
+from app.services.llm_cache import close_llm_cache
+from app.services.product_cache import close_product_cache, init_product_cache
+from app.services.rate_limiter import close_rate_limiters
+from app.utils.cache_utils import close_redis_cache, init_redis_cache
+from app.utils.fast_json import ORJSONResponse
+
+
+# ═══════════════════════════════════════════════════════════
+# LIFESPAN (startup / shutdown)
+# ═══════════════════════════════════════════════════════════
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("=" * 60)
+    print("Multilingual E-Commerce API v2.0.0")
+    print(f"Environment: {settings.ENVIRONMENT}")
+    print(f"API Docs: http://127.0.0.1:8000/api/v1/docs")
+    print(f"CORS Origins: {len(settings.ALL_CORS_ORIGINS)} configured")
+    print("=" * 60)
+
+    # One pooled HTTP client per worker for all outbound LLM calls
+    await init_http_client()
+    # ...and one pooled aiohttp session for the image proxy's source fetches
+    await init_image_session()
+    # Pooled Redis connection for @cached(cache_type="redis") when REDIS_URL is set
+    await init_redis_cache()
+    # Product cache: L1 per worker, Redis L2 and invalidation broadcasts when configured
+    await init_product_cache()
+    try:
+        yield
+    finally:
+        await close_http_client()
+        await close_image_session()
+        shutdown_image_pool()
+        await close_product_cache()
+        await close_llm_cache()
+        await close_rate_limiters()
+        await close_redis_cache()
+
 
 app = FastAPI(
     title="Multilingual E-Commerce API",
     version="2.0.0",
     docs_url="/api/v1/docs",
     redoc_url="/api/v1/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # ═══════════════════════════════════════════════════════════
 # MIDDLEWARE STACK
 # ═══════════════════════════════════════════════════════════
 
+# 0. ETag (registered first = innermost, so it hashes the route's own body)
+app.add_middleware(ETAGMiddleware)
+
+# 0b. Brotli/gzip, outside ETag so validators describe the uncompressed body
+app.add_middleware(CompressionMiddleware)
+
 # 1. SessionMiddleware (اول از همه!)
 app.add_middleware(
     SessionMiddleware,
@@ -32,7 +86,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["X-Total-Count", "X-Page-Count"],  # برای pagination
+    expose_headers=["X-Total-Count", "X-Page-Count", "X-Next-Cursor"],  # برای pagination
 )
 
 # ═══════════════════════════════════════════════════════════
@@ -60,16 +114,3 @@ def root():
         "docs": "/api/v1/docs",
         "version": "2.0.0",
     }
-
-# ═══════════════════════════════════════════════════════════
-# STARTUP EVENT
-# ═══════════════════════════════════════════════════════════
-
-@app.on_event("startup")
-async def startup_event():
-    print("=" * 60)
-    print("Multilingual E-Commerce API v2.0.0")
-    print(f"Environment: {settings.ENVIRONMENT}")
-    print(f"API Docs: http://127.0.0.1:8000/api/v1/docs")
-    print(f"CORS Origins: {len(settings.ALL_CORS_ORIGINS)} configured")
-    print("=" * 60)
@@ -0,0 +1,228 @@
+"""
+Response compression middleware (Brotli / gzip)
+
+Pure ASGI, sitting outside the ETag middleware so ETags and 304s are worked
+out on the uncompressed body:
+
+- The coding is negotiated from ``Accept-Encoding`` (q-values, ``*``);
+  Brotli is preferred when the optional ``brotlicffi`` package is installed
+- Only text-like content types of at least ``minimum_size`` bytes are
+  compressed; ``text/event-stream`` and already-encoded responses pass through
+- Complete bodies are compressed once: the compressed variant is kept in a
+  byte-bounded LRU keyed by the body's digest and the coding, so a hot
+  payload (the same catalog page for every client) is served from memory
+- Streamed bodies are compressed chunk by chunk with a flush after each, so
+  the client receives data as soon as the app produces it
+- A strong ETag becomes weak on compressed responses (the bytes differ from
+  the identity representation); the ETag middleware compares weakly, so
+  conditional requests keep matching
+"""
+import gzip
+import hashlib
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.cache_utils import InMemoryCache
+
+try:
+    import brotlicffi as brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/problem+json", "application/javascript",
+    "application/xml", "application/x-ndjson", "image/svg+xml",
+)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Tuple[str, ...]) -> Optional[str]:
+    """Best of ``available`` (in preference order) for an Accept-Encoding value; None for identity."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Compressor:
+    """Incremental compressor with a per-chunk flush"""
+
+    def __init__(self, encoding: str, brotli_quality: int, gzip_level: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    Brotli/gzip response compression with a cache of compressed variants
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        brotli_quality: int = 5,
+        gzip_level: int = 6,
+        cache_max_bytes: int = 32 * 1024 * 1024,
+        cache_max_item_size: int = 4 * 1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_quality = brotli_quality
+        self.gzip_level = gzip_level
+        self.encodings: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+        self.cache_max_item_size = cache_max_item_size
+        self.cache = InMemoryCache(default_ttl=3600, max_entries=4096, max_bytes=cache_max_bytes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """Compressed ``body``, from the variant cache when this payload was seen before."""
+        if len(body) > self.cache_max_item_size:
+            return self._compress(body, encoding)
+        key = f"{hashlib.blake2b(body, digest_size=16).hexdigest()}:{encoding}"
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = self._compress(body, encoding)
+            self.cache.set(key, compressed)
+        return compressed
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+
+class _CompressionResponder:
+    """Per-request state: hold back the start message until the size is known"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.mode = "pending"  # -> "buffer", "stream" or "passthrough"
+        self.start: Optional[Message] = None
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.compressor: Optional[_Compressor] = None
+
+    def _eligible(self, message: Message) -> bool:
+        headers = Headers(raw=message["headers"])
+        content_type = headers.get("content-type", "")
+        return (
+            message["status"] != 204
+            and "content-encoding" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith("text/event-stream")
+        )
+
+    async def send(self, message: Message) -> None:
+        if self.mode == "pending":
+            if message["status"] == 304:
+                # Same Vary as the 200 it stands for
+                message = {**message, "headers": list(message["headers"])}
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                self.mode = "passthrough"
+                await self._send(message)
+                return
+            if not self._eligible(message):
+                self.mode = "passthrough"
+                await self._send(message)
+                return
+            self.start = {**message, "headers": list(message["headers"])}
+            MutableHeaders(raw=self.start["headers"]).add_vary_header("Accept-Encoding")
+            if self.encoding is None:
+                # Identity for this client, but caches must know it depends on the header
+                self.mode = "passthrough"
+                await self._send(self.start)
+                return
+            self.mode = "buffer"
+        elif self.mode == "buffer":
+            await self._on_body(message)
+        elif self.mode == "stream":
+            await self._on_stream_body(message)
+        else:
+            await self._send(message)
+
+    def _encode_headers(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+
+    async def _on_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        self.chunks.append(body)
+        self.size += len(body)
+
+        if more_body and self.size < self.middleware.minimum_size:
+            return  # keep buffering until we know whether it is worth compressing
+
+        body = b"".join(self.chunks)
+        self.chunks = []
+        if not more_body:
+            self.mode = "passthrough"
+            if self.size >= self.middleware.minimum_size:
+                body = self.middleware.compress(body, self.encoding)
+                self._encode_headers(len(body))
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        # A long stream: compress as it goes
+        self.mode = "stream"
+        self.compressor = _Compressor(self.encoding, self.middleware.brotli_quality, self.middleware.gzip_level)
+        self._encode_headers(None)
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": self.compressor.compress(body), "more_body": True})
+
+    async def _on_stream_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        data = self.compressor.compress(body) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
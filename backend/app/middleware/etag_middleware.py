@@ -1,100 +1,170 @@
 """
 ETag middleware for FastAPI
 Provides ETag support for HTTP caching
+
+Pure ASGI (no ``BaseHTTPMiddleware``), so responses are not copied through
+an extra task and queue and streaming keeps working:
+
+- GET responses with status 200 are hashed chunk by chunk (BLAKE2b) while
+  they are buffered; once the body is complete and under ``max_buffer_size``
+  the ETag is added, or a bodiless 304 is sent if the client already has it
+- Larger bodies are flushed as soon as they cross the threshold and stream
+  through without an ETag (headers cannot be changed once sent)
+- ETags set by the endpoint itself (e.g. from a version column) are kept and
+  honoured for conditional requests without buffering anything
+- ``text/event-stream`` responses are never touched
+- ``If-None-Match`` lists, ``*`` and weak validators (``W/"..."``) are
+  compared with the weak comparison function (RFC 9110, 13.1.2)
 """
 import hashlib
-import json
-from typing import Union
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response, StreamingResponse
+from typing import Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.cache_utils import etag_matches
+
+# Headers a 304 keeps from the 200 it replaces (RFC 9110, 15.4.5)
+NOT_MODIFIED_HEADERS = (b"cache-control", b"content-location", b"date", b"etag", b"expires", b"vary")
+
+
+def calculate_etag(content: bytes) -> str:
+    """Strong ETag for a complete body (same value in every worker)."""
+    return f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
 
 
-class ETAGMiddleware(BaseHTTPMiddleware):
+def not_modified(start: Message, etag: str) -> Message:
+    headers: List[Tuple[bytes, bytes]] = [
+        (name, value) for name, value in start["headers"] if name.lower() in NOT_MODIFIED_HEADERS
+    ]
+    if not any(name.lower() == b"etag" for name, _ in headers):
+        headers.append((b"etag", etag.encode("latin-1")))
+    return {"type": "http.response.start", "status": 304, "headers": headers}
+
+
+class ETAGMiddleware:
     """
     ETag Middleware for FastAPI
     Adds ETag headers to responses and handles conditional requests
     """
-    
-    async def dispatch(self, request: Request, call_next):
-        # Check for conditional requests before processing
-        if_none_match = request.headers.get("if-none-match")
-        
-        # Process the request
-        response = await call_next(request)
-        
-        # Only add ETag for successful GET/HEAD requests with body content
-        if (
-            response.status_code == 200
-            and request.method in ["GET", "HEAD"]
-            and hasattr(response, "body")
-            and response.body
-        ):
-            # Calculate ETag based on response content
-            etag = self._calculate_etag(response.body)
-            
-            # If client has same version (304 Not Modified)
-            if if_none_match and if_none_match == etag:
-                response = Response(status_code=304)
-            
-            # Add ETag header to response
-            response.headers["ETag"] = etag
-
-        # For JSON responses, handle appropriately
-        elif (
-            response.status_code == 200
-            and request.method in ["GET", "HEAD"]
-            and hasattr(response, "body_iterator")
-        ):
-            # Streaming responses (like JSON responses) need special handling
-            etag = self._calculate_etag(str(response).__hash__().to_bytes(8, 'little'))
-            if if_none_match and if_none_match == etag:
-                response = Response(status_code=304)
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_buffer_size: int = 1024 * 1024,
+        content_types: Optional[Iterable[str]] = None,
+    ):
+        self.app = app
+        self.max_buffer_size = max_buffer_size
+        self.content_types = tuple(content_types) if content_types else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        responder = _ETagResponder(self, scope, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _ETagResponder:
+    """Per-request state: what to do with each message the app sends"""
+
+    def __init__(self, middleware: ETAGMiddleware, scope: Scope, send: Send):
+        self.middleware = middleware
+        self.is_get = scope["method"] == "GET"
+        self.if_none_match = Headers(scope=scope).get("if-none-match")
+        self._send = send
+        self.mode = "pending"  # -> "buffer", "passthrough", "discard" or "done"
+        self.start: Optional[Message] = None
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.hasher = None
+
+    def _wants_etag(self, headers: Headers) -> bool:
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("text/event-stream"):
+            return False
+        if self.middleware.content_types and not content_type.startswith(self.middleware.content_types):
+            return False
+        return "no-store" not in headers.get("cache-control", "")
+
+    async def send(self, message: Message) -> None:
+        if self.mode == "pending":
+            await self._on_start(message)
+        elif self.mode == "buffer":
+            await self._on_body(message)
+        elif self.mode == "passthrough":
+            await self._send(message)
+        elif self.mode == "discard" and not message.get("more_body", False):
+            # The 304 went out already: drop the body, but end the response
+            self.mode = "done"
+            await self._send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _on_start(self, message: Message) -> None:
+        headers = Headers(raw=message["headers"])
+        if message["status"] != 200 or not self._wants_etag(headers):
+            self.mode = "passthrough"
+            await self._send(message)
+            return
+
+        etag = headers.get("etag")
+        if etag is not None:
+            # The endpoint chose its own validator: answer from it, body unseen
+            if etag_matches(self.if_none_match, etag):
+                self.mode = "discard"
+                await self._send(not_modified(message, etag))
             else:
-                response.headers["ETag"] = etag
+                self.mode = "passthrough"
+                await self._send(message)
+            return
+
+        if not self.is_get:
+            # HEAD bodies are empty, so there is nothing to hash
+            self.mode = "passthrough"
+            await self._send(message)
+            return
 
-        return response
+        self.mode = "buffer"
+        self.start = message
+        self.hasher = hashlib.blake2b(digest_size=16)
 
-    def _calculate_etag(self, content: Union[bytes, str]) -> str:
-        """
-        Calculate ETag for content
-        """
-        if isinstance(content, str):
-            content = content.encode('utf-8')
-        
-        # Use SHA1 for ETag calculation (strong ETag)
-        return hashlib.sha1(content).hexdigest()
+    async def _on_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        self.hasher.update(body)
+        self.size += len(body)
 
+        if self.size > self.middleware.max_buffer_size:
+            # Too big to hold back: send what we have and stream the rest
+            self.mode = "passthrough"
+            await self._send(self.start)
+            await self._send({
+                "type": "http.response.body", "body": b"".join(self.chunks) + body, "more_body": more_body,
+            })
+            self.chunks = []
+            return
 
-# Alternative implementation for JSON responses specifically
-class JSONETagMiddleware(BaseHTTPMiddleware):
+        if more_body:
+            self.chunks.append(body)
+            return
+
+        body = b"".join(self.chunks) + body if self.chunks else body
+        self.chunks = []
+        etag = f'"{self.hasher.hexdigest()}"'
+        self.mode = "done"
+        if etag_matches(self.if_none_match, etag):
+            await self._send(not_modified(self.start, etag))
+            await self._send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        await self._send({**self.start, "headers": [*self.start["headers"], (b"etag", etag.encode("latin-1"))]})
+        await self._send({"type": "http.response.body", "body": body, "more_body": False})
+
+
+class JSONETagMiddleware(ETAGMiddleware):
     """
     ETag Middleware specifically for JSON responses
     """
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        if (
-            request.method in ["GET", "HEAD"]
-            and response.status_code == 200
-            and "application/json" in response.headers.get("content-type", "")
-        ):
-            # For JSON responses, we need to get the content before sending
-            if hasattr(response, "body"):
-                etag = self._calculate_etag(response.body)
-                response.headers["ETag"] = etag
-                
-                # Check if ETag matches
-                if_none_match = request.headers.get("if-none-match")
-                if if_none_match and if_none_match == etag:
-                    return Response(status_code=304)
-            else:
-                # Calculate based on some other factor if body isn't accessible
-                content_hash = hash(str(response.headers))
-                etag = self._calculate_etag(str(content_hash).encode('utf-8'))
-                response.headers["ETag"] = etag
-
-        return response
 
-    def _calculate_etag(self, content: bytes) -> str:
-        return hashlib.sha1(content).hexdigest()
\ No newline at end of file
+    def __init__(self, app: ASGIApp, max_buffer_size: int = 1024 * 1024):
+        super().__init__(app, max_buffer_size=max_buffer_size, content_types=("application/json",))
@@ -3,5 +3,7 @@ from .product import Product
 # from .category import Category  # Commenting out for demo simplification
 from .translation import Translation
 from .order import Order, OrderItem, OrderStatus
+from .daily_sales import DailySales, DailyCategorySales
 from .bot import BotApiKey
+from .catalog_version import CatalogVersion
 from ..database import Base
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Catalog version counters
+
+One row per catalog (currently only ``products``), bumped in the same
+transaction as every insert, update and delete of a row in it. Each product
+is stamped with the counter value of its last change, so ``Product.version``
+orders all product changes and the counter itself is the catalog's "max
+version": listing ETags come from one primary-key lookup instead of a query.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import BigInteger, Column, DateTime, String, insert, select, update
+from sqlalchemy.engine import Connection
+from ..database import Base
+
+PRODUCTS_CATALOG = "products"
+
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+
+def bump_catalog_version(connection: Connection, name: str) -> int:
+    """Increment ``name``'s counter and return the new value (call inside the writing transaction)."""
+    table = CatalogVersion.__table__
+    now = datetime.now(timezone.utc)
+    row = connection.execute(
+        update(table)
+        .where(table.c.name == name)
+        .values(version=table.c.version + 1, updated_at=now)
+        .returning(table.c.version)
+    ).first()
+    if row is not None:
+        return row[0]
+    # Databases created without the migration's seed row
+    connection.execute(insert(table).values(name=name, version=1, updated_at=now))
+    return 1
+
+
+def read_catalog_version(connection: Connection, name: str) -> Tuple[int, Optional[datetime]]:
+    """``(version, updated_at)`` of a catalog; ``(0, None)`` before its first change."""
+    table = CatalogVersion.__table__
+    row = connection.execute(
+        select(table.c.version, table.c.updated_at).where(table.c.name == name)
+    ).first()
+    return (row[0], row[1]) if row is not None else (0, None)
@@ -0,0 +1,42 @@
+"""
+Daily sales rollup tables
+
+Maintained incrementally by ``app.services.sales_rollup`` in the same
+transaction as every order insert, status change and delete, so reporting
+reads one row per day instead of aggregating raw orders.
+"""
+from sqlalchemy import Column, Date, DateTime, Float, Integer, String
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class DailySales(Base):
+    """
+    Orders placed on one (UTC) day: count, revenue and current status mix
+    """
+    __tablename__ = "daily_sales"
+
+    date = Column(Date, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)  # Sum of order totals, any status
+
+    # How many of the day's orders are currently in each status
+    pending_count = Column(Integer, nullable=False, default=0)
+    processing_count = Column(Integer, nullable=False, default=0)
+    shipped_count = Column(Integer, nullable=False, default=0)
+    delivered_count = Column(Integer, nullable=False, default=0)
+    cancelled_count = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DailyCategorySales(Base):
+    """
+    Item revenue (quantity x price at order time) per product category and day
+    """
+    __tablename__ = "daily_category_sales"
+
+    date = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)  # "" for uncategorized or deleted products
+    revenue = Column(Float, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
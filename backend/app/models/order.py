@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -14,6 +14,12 @@ class OrderStatus(enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # A user's orders newest first (order history, chat context, recommendations)
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        # Latest orders and date-range reports across all users
+        Index("ix_orders_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -53,6 +59,12 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_items"
+    __table_args__ = (
+        # Items of an order (also covers the co-purchase basket scan)
+        Index("ix_order_items_order_id_product_id", "order_id", "product_id"),
+        # Sales per product
+        Index("ix_order_items_product_id", "product_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("orders.id"))
@@ -1,10 +1,34 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Text, ForeignKey, Index, event, text
+from sqlalchemy.orm import object_session, relationship
 from sqlalchemy.sql import func
 from ..database import Base
+from .catalog_version import PRODUCTS_CATALOG, bump_catalog_version
+from ..utils.text_normalization import build_search_document
+
+# Text fields folded into Product.search_text, the single indexed search document
+SEARCHABLE_FIELDS = (
+    "title", "title_en", "title_fa", "title_ar",
+    "description", "description_en", "description_fa", "description_ar",
+    "category", "tags",
+)
+
+# Storefront listings only ever read active products, so their indexes are
+# partial (the predicate must match how each dialect renders is_active == True)
+ACTIVE_PRODUCTS = {"sqlite_where": text("is_active = 1"), "postgresql_where": text("is_active")}
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # read_products: is_featured is always filtered, then category and/or
+        # price, ordered by (sort column, id) for keyset pages
+        Index("ix_products_active_listing", "is_featured", "category", "price", "id", **ACTIVE_PRODUCTS),
+        Index("ix_products_active_price", "is_featured", "price", "id", **ACTIVE_PRODUCTS),
+        Index("ix_products_active_id", "is_featured", "id", **ACTIVE_PRODUCTS),
+        # sort_by=rating / created_at: the keyset seek compares the raw
+        # column (NULLs get their own branch), so it can range-scan these
+        Index("ix_products_is_active_rating", "is_active", "rating", "id"),
+        Index("ix_products_is_active_created_at", "is_active", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
@@ -27,11 +51,42 @@ class Product(Base):
     description_en = Column(Text, nullable=True)
     description_ar = Column(Text, nullable=True)
     description_fa = Column(Text, nullable=True)
+
+    # Normalized concatenation of SEARCHABLE_FIELDS, maintained on flush
+    search_text = Column(Text, nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Catalog counter value at the product's last change (see catalog_version)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     owner_id = Column(Integer, ForeignKey("users.id"))
     
     owner = relationship("User", back_populates="products")
     # category_rel = relationship("Category", back_populates="products")  # Relationship to Category model - commented for demo
-    translations = relationship("Translation", back_populates="product")  # Relationship to Translation model
\ No newline at end of file
+    translations = relationship("Translation", back_populates="product")  # Relationship to Translation model
+
+    def refresh_search_text(self) -> None:
+        self.search_text = build_search_document(getattr(self, field) for field in SEARCHABLE_FIELDS)
+
+
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _update_search_text(mapper, connection, target):
+    target.refresh_search_text()
+
+
+@event.listens_for(Product, "before_insert")
+def _stamp_new_version(mapper, connection, target):
+    target.version = bump_catalog_version(connection, PRODUCTS_CATALOG)
+
+
+@event.listens_for(Product, "before_update")
+def _stamp_version(mapper, connection, target):
+    # before_update also fires for rows without net column changes
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = bump_catalog_version(connection, PRODUCTS_CATALOG)
+
+
+@event.listens_for(Product, "after_delete")
+def _bump_on_delete(mapper, connection, target):
+    bump_catalog_version(connection, PRODUCTS_CATALOG)
@@ -80,6 +80,7 @@ class ProductResponse(ProductBase):
     owner_id: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     
     model_config = ConfigDict(
         from_attributes=True,
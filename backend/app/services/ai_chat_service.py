@@ -7,6 +7,8 @@ import traceback
 from sqlalchemy.orm import Session
 from openai import APIError
 from ..config import settings
+from .http_client import get_http_client
+from .purchase_history import OrderSummary
 
 
 class AIChatService:
@@ -116,18 +118,12 @@ class AIChatService:
             serialized_payload = json.dumps(payload, ensure_ascii=False)
 
             try:
-                # Make a direct HTTP POST request to the API
-                response = requests.post(
+                # POST through the shared pooled client (keep-alive, per-phase timeouts)
+                response = await get_http_client().post(
                     f"{self.base_url}/v1/chat/completions",
                     # Ensure all header values are ASCII-safe to prevent encoding errors
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}".encode('ascii', errors='ignore').decode('ascii'),
-                        "Content-Type": "application/json; charset=utf-8",
-                        "User-Agent": "MyApp/1.0"  # Use a simple ASCII user agent
-                    },
-                    data=serialized_payload.encode('utf-8'),
-                    stream=False,
-                    timeout=60
+                    headers=AIChatService._request_headers(self.api_key),
+                    content=serialized_payload.encode('utf-8'),
                 )
 
                 response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
@@ -147,7 +143,7 @@ class AIChatService:
 
                 return response_content
 
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 # Handle network errors
                 print(f"ERROR: API request failed: {e}")
                 return self._get_fallback_response(user_message)
@@ -274,104 +270,48 @@ class AIChatService:
             serialized_payload = json.dumps(payload, ensure_ascii=False)
 
             try:
-                import asyncio
-                import requests
-                from concurrent.futures import ThreadPoolExecutor
-                import queue
-                import threading
-
-                # Create a queue to communicate between threads
-                result_queue = queue.Queue()
-
-                def streaming_worker():
-                    try:
-                        with requests.post(
-                            f"{base_url}/v1/chat/completions",
-                            # Ensure all header values are ASCII-safe to prevent encoding errors
-                            headers={
-                                "Authorization": f"Bearer {api_key}".encode('ascii', errors='ignore').decode('ascii'),
-                                "Content-Type": "application/json; charset=utf-8",
-                                "User-Agent": "MyApp/1.0"  # Use a simple ASCII user agent
-                            },
-                            data=serialized_payload.encode('utf-8'),
-                            stream=True,
-                            timeout=60
-                        ) as response:
-                            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-
-                            # === ADD DEBUG LOGGING FOR SUCCESSFUL RESPONSE ===
-                            print("AI service responded successfully, starting to stream chunks...")
-                            # ================================================
-
-                            # Process the streaming response line by line
-                            for line in response.iter_lines():
-                                if line:
-                                    # Decode the line from bytes to a string
-                                    decoded_line = line.decode('utf-8')
-
-                                    # SSE format starts with "data: "
-                                    if decoded_line.startswith("data: "):
-                                        data_str = decoded_line[6:]  # Remove the "data: " prefix
-
-                                        if data_str == "[DONE]":
-                                            result_queue.put(StopIteration)
-                                            break
-
-                                        try:
-                                            import json
-                                            # Parse the JSON data from the string
-                                            json_data = json.loads(data_str)
-
-                                            # Extract the content from the delta
-                                            if "choices" in json_data and len(json_data["choices"]) > 0:
-                                                content = json_data["choices"][0]["delta"].get("content", "")
-                                                if content:
-                                                    # Put the content in the queue
-                                                    result_queue.put(content)
-                                        except json.JSONDecodeError:
-                                            # Ignore lines that are not valid JSON
-                                            continue
-                    except Exception as e:
-                        # Put the exception in the queue if there's an error
-                        result_queue.put(e)
-                    finally:
-                        # Signal that the stream is finished
-                        result_queue.put(StopIteration)
-
-                # Start the streaming worker in a separate thread
-                executor = ThreadPoolExecutor(max_workers=1)
-                try:
-                    future = executor.submit(streaming_worker)
-
-                    # Yield results as they come from the streaming worker
-                    while True:
+                # Stream through the shared pooled client; chunks are read on the
+                # event loop as they arrive, no worker thread per request
+                async with get_http_client().stream(
+                    "POST",
+                    f"{base_url}/v1/chat/completions",
+                    # Ensure all header values are ASCII-safe to prevent encoding errors
+                    headers=AIChatService._request_headers(api_key),
+                    content=serialized_payload.encode('utf-8'),
+                ) as response:
+                    response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+
+                    # === ADD DEBUG LOGGING FOR SUCCESSFUL RESPONSE ===
+                    print("AI service responded successfully, starting to stream chunks...")
+                    # ================================================
+
+                    # Process the streaming response line by line
+                    async for line in response.aiter_lines():
+                        # SSE format starts with "data: "
+                        if not line.startswith("data: "):
+                            continue
+                        data_str = line[6:]  # Remove the "data: " prefix
+
+                        if data_str == "[DONE]":
+                            break
+
                         try:
-                            # Get an item from the queue with a timeout to avoid blocking indefinitely
-                            item = result_queue.get(timeout=1)
-
-                            if item is StopIteration:
-                                # End of stream
-                                break
-                            elif isinstance(item, Exception):
-                                # Re-raise the exception
-                                raise item
-                            else:
-                                # Yield the content
-                                yield item
-                        except queue.Empty:
-                            # Check if the worker thread is done
-                            if future.done():
-                                # If the future is done and we get an empty queue, we're finished
-                                break
+                            # Parse the JSON data from the string
+                            json_data = json.loads(data_str)
+                        except json.JSONDecodeError:
+                            # Ignore lines that are not valid JSON
                             continue
-                finally:
-                    # Ensure the executor is shut down
-                    executor.shutdown(wait=False)
+
+                        # Extract the content from the delta
+                        if "choices" in json_data and len(json_data["choices"]) > 0:
+                            content = json_data["choices"][0]["delta"].get("content", "")
+                            if content:
+                                yield content
 
                 # Signal that the stream is finished
                 yield "[DONE]"
 
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 # Handle network errors
                 print(f"ERROR: API request failed: {e}")
                 yield AIChatService._get_fallback_response_static(user_message)
@@ -406,6 +346,13 @@ class AIChatService:
             # Yield a fallback response
             yield AIChatService._get_fallback_response_static(user_message)
 
+    @staticmethod
+    def _request_headers(api_key: str) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {api_key}".encode('ascii', errors='ignore').decode('ascii'),
+            "Content-Type": "application/json; charset=utf-8",
+        }
+
     @staticmethod
     def _build_system_message_static(context: Dict[str, Any]) -> str:
         """
@@ -456,7 +403,7 @@ class AIChatService:
         return system_prompt
 
     @staticmethod
-    def _format_orders_for_prompt_static(orders: List[Dict[str, Any]]) -> str:
+    def _format_orders_for_prompt_static(orders: List[OrderSummary]) -> str:
         """
         Static version of _format_orders_for_prompt that can be used without instance
         """
@@ -466,17 +413,17 @@ class AIChatService:
         formatted_orders = []
         for order in orders[:3]:  # Only include last 3 orders
             # Ensure proper encoding for all string values to handle Unicode characters
-            order_id = str(order.get('id', 'N/A') or 'N/A')
-            created_at = str(order.get('created_at', 'N/A') or 'N/A')
-            status = str(order.get('status', 'N/A') or 'N/A')
-            total = str(order.get('total', 'N/A') or 'N/A')
+            order_id = str(order.id or 'N/A')
+            created_at = order.created_at.isoformat() if order.created_at else 'N/A'
+            status = str(order.status or 'N/A')
+            total = str(order.total or 'N/A')
 
             formatted_orders.append(
                 f"- Order ID: {order_id}, "
                 f"Date: {created_at}, "
                 f"Status: {status}, "
                 f"Total: ${total}, "
-                f"Items: {len(order.get('items', []))} products"
+                f"Items: {len(order.items)} products"
             )
 
         return "\n".join(formatted_orders)
@@ -584,7 +531,7 @@ class AIChatService:
         
         return system_prompt
     
-    def _format_orders_for_prompt(self, orders: List[Dict[str, Any]]) -> str:
+    def _format_orders_for_prompt(self, orders: List[OrderSummary]) -> str:
         """
         Format order information for the AI prompt
         
@@ -600,11 +547,11 @@ class AIChatService:
         formatted_orders = []
         for order in orders[:3]:  # Only include last 3 orders
             formatted_orders.append(
-                f"- Order ID: {order.get('id', 'N/A')}, "
-                f"Date: {order.get('created_at', 'N/A')}, "
-                f"Status: {order.get('status', 'N/A')}, "
-                f"Total: ${order.get('total', 'N/A')}, "
-                f"Items: {len(order.get('items', []))} products"
+                f"- Order ID: {order.id}, "
+                f"Date: {order.created_at.isoformat() if order.created_at else 'N/A'}, "
+                f"Status: {order.status or 'N/A'}, "
+                f"Total: ${order.total}, "
+                f"Items: {len(order.items)} products"
             )
         
         return "\n".join(formatted_orders)
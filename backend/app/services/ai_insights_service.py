@@ -1,3 +1,31 @@
+"""
+AI Insights Service
+Sales forecast, alerts and recommendations for the admin dashboard
+"""
+import logging
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import desc, func
+from sqlalchemy.orm import Session
+
+from .sales_rollup import period_totals
+
+
+class AIInsightsService:
+    """
+    Service for generating business insights from orders, products and users
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.logger = logging.getLogger(__name__)
+
+    def get_insights(self) -> Dict[str, Any]:
+        """
+        Generate AI-powered business insights
+
         Returns:
             Dictionary containing forecast, alerts, and recommendations
         """
@@ -36,22 +64,16 @@
     
     def _get_current_month_sales(self) -> Dict[str, Any]:
         """
-        Get sales data for the current month
+        Get sales data for the current month (from the daily sales rollup)
         """
-        from ..models.order import Order
-        
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        
-        total_revenue = self.db.query(func.sum(Order.total)).filter(
-            extract('month', Order.created_at) == current_month,
-            extract('year', Order.created_at) == current_year
-        ).scalar() or 0
-        
-        total_orders = self.db.query(func.count(Order.id)).filter(
-            extract('month', Order.created_at) == current_month,
-            extract('year', Order.created_at) == current_year
-        ).scalar() or 0
+        # Rollup days are UTC dates
+        now = datetime.now(timezone.utc)
+        current_month = now.month
+        current_year = now.year
+
+        month_start = date(current_year, current_month, 1)
+        next_month = date(current_year + current_month // 12, current_month % 12 + 1, 1)
+        total_orders, total_revenue = period_totals(self.db, month_start, next_month)
         
         return {
             "revenue": float(total_revenue),
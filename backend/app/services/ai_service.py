@@ -16,29 +16,35 @@ class AIService:
         self.logger = logging.getLogger(__name__)
         self.deepseek = DeepSeekService()
     
-    def extract_search_filters(self, query: str) -> Dict[str, Any]:
+    async def extract_search_filters(self, query: str) -> Dict[str, Any]:
         """
         Extract search filters from natural language query
         """
-        return self.deepseek.extract_search_filters(query)
+        return await self.deepseek.extract_search_filters(query)
     
-    def generate_search_explanation(self, query: str, filters: Dict[str, Any], results_count: int) -> str:
+    async def generate_search_explanation(self, query: str, filters: Dict[str, Any], results_count: int) -> str:
         """
         Generate explanation for search results
         """
-        return self.deepseek.generate_search_explanation(query, filters, results_count)
+        return await self.deepseek.generate_search_explanation(query, filters, results_count)
     
-    def generate_related_searches(self, query: str) -> List[str]:
+    async def generate_related_searches(self, query: str) -> List[str]:
         """
         Generate related search suggestions
         """
-        return self.deepseek.generate_related_searches(query)
+        return await self.deepseek.generate_related_searches(query)
     
-    def analyze_product_relevance(self, query: str, product_title: str, product_description: str) -> Dict[str, Any]:
+    async def analyze_product_relevance(self, query: str, product_title: str, product_description: str) -> Dict[str, Any]:
         """
         Analyze how relevant a product is to a search query
         """
-        return self.deepseek.analyze_product_relevance(query, product_title, product_description)
+        return await self.deepseek.analyze_product_relevance(query, product_title, product_description)
+    
+    async def analyze_products_relevance(self, query: str, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze the relevance of several products to a search query in one call
+        """
+        return await self.deepseek.analyze_products_relevance(query, products)
     
     def process_multilingual_query(self, query: str) -> Dict[str, Any]:
         """
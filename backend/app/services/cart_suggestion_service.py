@@ -1,10 +1,12 @@
 from typing import Dict, List, Any, Optional
 import logging
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_
 from decimal import Decimal
 from ..models.product import Product as ProductModel
-from ..models.order import Order, OrderItem
+from .purchase_history import PurchaseHistoryRepository, PurchasedItem
+from .similarity_engine import get_similarity_engine
 
 
 class CartSuggestionService:
@@ -12,6 +14,15 @@ class CartSuggestionService:
     Service for providing smart cart suggestions
     """
     
+    # Categories that complement a product category
+    COMPLEMENTARY_CATEGORIES = {
+        'mobile': ['screen protector', 'case', 'charger', 'cable', 'wireless charger'],
+        'laptop': ['bag', 'mouse', 'keyboard', 'charger', 'cable', 'usb hub'],
+        'watch': ['watch band', 'charger'],
+        'tablet': ['case', 'screen protector', 'charger', 'pencil'],
+        'headphone': ['case', 'adapter', 'cable'],
+    }
+    
     def __init__(self, db: Session, user_id: Optional[int] = None):
         self.db = db
         self.user_id = user_id
@@ -216,33 +227,15 @@ class CartSuggestionService:
             self.logger.error(f"Error getting up-sell suggestions: {str(e)}", exc_info=True)
             return []
     
-    def _get_user_purchase_history(self) -> List[Dict[str, Any]]:
+    def _get_user_purchase_history(self) -> List[PurchasedItem]:
         """
-        Get the user's purchase history
+        Get the user's purchase history (last 10 purchased items, one query, cached per user)
         """
         try:
             if not self.user_id:
                 return []
             
-            # Get user's recent orders and items
-            orders = self.db.query(OrderItem).join(Order).filter(
-                Order.user_id == self.user_id
-            ).order_by(desc(Order.created_at)).limit(10).all()
-            
-            history = []
-            for order_item in orders:
-                product = self.db.query(ProductModel).filter(
-                    ProductModel.id == order_item.product_id
-                ).first()
-                if product:
-                    history.append({
-                        "product_id": product.id,
-                        "title": product.title,
-                        "category": product.category,
-                        "price": product.price
-                    })
-            
-            return history
+            return PurchaseHistoryRepository(self.db).recent_items(self.user_id, limit=10)
         except Exception as e:
             self.logger.error(f"Error getting user history: {str(e)}", exc_info=True)
             return []
@@ -277,27 +270,32 @@ class CartSuggestionService:
         Score and rank suggestion products
         """
         scored_products = []
+        if not products:
+            return scored_products
         
-        for product in products:
-            # Calculate score based on relevance to cart
-            score = 0.0
-            
-            # Check if product is complementary to items in cart
-            cart_products = context.get("cart_products", [])
-            for cart_product in cart_products:
-                # If product is in the same category as cart product, give lower score
-                if product.category == cart_product['category']:
-                    score += 0.3
-                # If product is a known complement to cart product
-                elif self._is_complementary(product, cart_product):
-                    score += 0.8
-            
-            # Check user history
-            user_history = context.get("user_history", [])
-            for history_item in user_history:
-                if product.category == history_item.get('category'):
-                    score += 0.2
-            
+        # Score all candidates against the whole cart with the shared catalog matrix:
+        # per cart product, +0.3 for the same category, otherwise +0.8 for a
+        # complementary one; +0.2 per purchase-history item in the same category
+        engine = get_similarity_engine(self.db)
+        cart_products = context.get("cart_products", [])
+        candidate_categories = np.stack([engine.category_vector([product.category]) for product in products])
+        scores = np.zeros(len(products))
+        if cart_products:
+            cart_categories = np.stack([engine.category_vector([cp.get('category')]) for cp in cart_products])
+            complement_categories = np.stack([
+                engine.category_vector(self.COMPLEMENTARY_CATEGORIES.get((cp.get('category') or '').lower(), []))
+                for cp in cart_products
+            ])
+            same = (candidate_categories @ cart_categories.T) > 0
+            complementary = (candidate_categories @ complement_categories.T) > 0
+            scores += np.where(same, 0.3, np.where(complementary, 0.8, 0.0)).sum(axis=1)
+        
+        user_history = context.get("user_history", [])
+        if user_history:
+            history_categories = engine.category_vector(item.category for item in user_history)
+            scores += 0.2 * (candidate_categories @ history_categories)
+        
+        for product, score in zip(products, scores.tolist()):
             scored_products.append({
                 "id": product.id,
                 "title": product.title,
@@ -325,20 +323,11 @@ class CartSuggestionService:
         """
         Check if a product is complementary to a cart product
         """
-        # Define common complementary relationships
-        complementary_pairs = {
-            'mobile': ['screen protector', 'case', 'charger', 'cable', 'wireless charger'],
-            'laptop': ['bag', 'mouse', 'keyboard', 'charger', 'cable', 'usb hub'],
-            'watch': ['watch band', 'charger'],
-            'tablet': ['case', 'screen protector', 'charger', 'pencil'],
-            'headphone': ['case', 'adapter', 'cable'],
-        }
-        
-        cart_category = cart_product.get('category', '').lower()
+        cart_category = (cart_product.get('category') or '').lower()
         product_category = product.category.lower() if product.category else ''
         
-        if cart_category in complementary_pairs:
-            return product_category in complementary_pairs[cart_category]
+        if cart_category in self.COMPLEMENTARY_CATEGORIES:
+            return product_category in self.COMPLEMENTARY_CATEGORIES[cart_category]
         
         return False
     
@@ -0,0 +1,326 @@
+"""
+Co-purchase matrix for recommendations
+Sparse item-item co-occurrence counts ("customers who bought A also bought B")
+
+- Built offline from ``order_items`` grouped by ``order_id`` into a CSR layout
+  (``indptr``/``indices``/``data`` NumPy arrays, one row per product)
+- Persisted as plain ``.npy`` files and opened with ``mmap_mode="r"``, so every
+  uvicorn worker shares one copy through the page cache
+- Kept current between rebuilds by an append-only delta log: ``create_order``
+  appends the new basket, and every worker tails the log on refresh (both
+  from ``app.services.mmap_store``)
+
+Rebuild with ``python -m app.services.copurchase_matrix`` (e.g. nightly); the
+first lookup builds the matrix if none has been written yet.
+"""
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.order import OrderItem
+from app.services.mmap_store import MappedIndex, VersionedArrayStore
+
+logger = logging.getLogger(__name__)
+
+ARRAYS = ("product_ids", "indptr", "indices", "data", "item_counts")
+
+
+class CoPurchaseMatrix:
+    """
+    Immutable CSR co-occurrence matrix
+
+    Row ``i`` belongs to ``product_ids[i]``; ``indices`` within a row are
+    sorted column (row) numbers and ``data`` holds the number of orders that
+    contained both products. ``item_counts[i]`` is the number of orders
+    containing ``product_ids[i]``.
+    """
+
+    def __init__(
+        self,
+        product_ids: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+        item_counts: np.ndarray,
+        max_order_id: int = 0,
+        version: int = 0,
+    ):
+        self.product_ids = product_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.item_counts = item_counts
+        self.max_order_id = max_order_id
+        self.version = version
+        self._rows: Dict[int, int] = {int(pid): row for row, pid in enumerate(product_ids.tolist())}
+
+    @classmethod
+    def empty(cls) -> "CoPurchaseMatrix":
+        return cls(
+            np.zeros(0, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_pairs(
+        cls,
+        order_ids: np.ndarray,
+        product_ids: np.ndarray,
+        max_basket_size: int = 50,
+    ) -> "CoPurchaseMatrix":
+        """
+        Build from parallel (order_id, product_id) arrays with one row per
+        distinct product in an order. Baskets larger than ``max_basket_size``
+        (bulk/wholesale orders) are skipped: they are noise and cost O(n^2).
+        """
+        if len(order_ids) == 0:
+            return cls.empty()
+
+        order_ids = np.asarray(order_ids, dtype=np.int64)
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        order = np.lexsort((product_ids, order_ids))
+        order_ids, product_ids = order_ids[order], product_ids[order]
+        unique = np.r_[True, (order_ids[1:] != order_ids[:-1]) | (product_ids[1:] != product_ids[:-1])]
+        order_ids, product_ids = order_ids[unique], product_ids[unique]
+        max_order_id = int(order_ids[-1])
+
+        starts = np.flatnonzero(np.r_[True, order_ids[1:] != order_ids[:-1]])
+        sizes = np.diff(np.r_[starts, len(order_ids)])
+        keep = sizes <= max_basket_size
+        product_ids = product_ids[np.repeat(keep, sizes)]
+        sizes = sizes[keep]
+        starts = np.cumsum(sizes) - sizes
+
+        keys, items = np.unique(product_ids, return_inverse=True)
+        n = len(keys)
+        item_counts = np.bincount(items, minlength=n).astype(np.int32)
+
+        # Pair every element with every element of its own basket, vectorized:
+        # element e of a basket of size s is repeated s times and matched with
+        # offsets 0..s-1 from the basket start.
+        elem_size = np.repeat(sizes, sizes)
+        elem_start = np.repeat(starts, sizes)
+        rows = np.repeat(items, elem_size)
+        block_starts = np.repeat(np.cumsum(elem_size) - elem_size, elem_size)
+        offsets = np.arange(len(rows)) - block_starts
+        cols = items[np.repeat(elem_start, elem_size) + offsets]
+        off_diagonal = rows != cols
+
+        pair_keys, counts = np.unique(
+            rows[off_diagonal].astype(np.int64) * n + cols[off_diagonal], return_counts=True
+        )
+        pair_rows = pair_keys // n
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_rows, minlength=n), out=indptr[1:])
+
+        return cls(
+            product_ids=keys,
+            indptr=indptr,
+            indices=(pair_keys % n).astype(np.int32),
+            data=counts.astype(np.int32),
+            item_counts=item_counts,
+            max_order_id=max_order_id,
+        )
+
+    @classmethod
+    def from_db(cls, db: Session, max_basket_size: int = 50) -> "CoPurchaseMatrix":
+        rows = db.execute(
+            select(OrderItem.order_id, OrderItem.product_id)
+            .distinct()
+            .where(OrderItem.order_id.isnot(None), OrderItem.product_id.isnot(None))
+            .order_by(OrderItem.order_id)
+        ).all()
+        if not rows:
+            return cls.empty()
+        pairs = np.array(rows, dtype=np.int64)
+        return cls.from_pairs(pairs[:, 0], pairs[:, 1], max_basket_size)
+
+    def co_counts(self, product_id: int, candidate_ids: Sequence[int]) -> np.ndarray:
+        """Co-occurrence counts of ``product_id`` with each candidate."""
+        result = np.zeros(len(candidate_ids), dtype=np.float64)
+        row = self._rows.get(product_id)
+        if row is None or not len(candidate_ids):
+            return result
+        start, end = int(self.indptr[row]), int(self.indptr[row + 1])
+        if start == end:
+            return result
+        cols = self.indices[start:end]
+        targets = np.fromiter((self._rows.get(c, -1) for c in candidate_ids), dtype=np.int64, count=len(candidate_ids))
+        pos = np.minimum(np.searchsorted(cols, targets), len(cols) - 1)
+        hit = (targets >= 0) & (cols[pos] == targets)
+        result[hit] = self.data[start:end][pos[hit]]
+        return result
+
+    def item_count(self, product_id: int) -> int:
+        row = self._rows.get(product_id)
+        return int(self.item_counts[row]) if row is not None else 0
+
+
+class CoPurchaseStore(VersionedArrayStore):
+    """
+    Co-purchase snapshots; ``delta.log`` holds baskets added since the
+    current version (``order_id:product_id,product_id`` per line)
+    """
+
+    ARRAYS = ARRAYS
+    LOG_NAME = "co-purchase"
+
+    @staticmethod
+    def format_entry(order_id: int, product_ids: Iterable[int]) -> str:
+        return f"{order_id}:{','.join(str(pid) for pid in product_ids)}\n"
+
+    @staticmethod
+    def parse_entry(line: str) -> Tuple[int, List[int]]:
+        order_part, _, items_part = line.partition(":")
+        return int(order_part), [int(pid) for pid in items_part.split(",") if pid]
+
+    def load(self) -> Optional[CoPurchaseMatrix]:
+        loaded = self.load_arrays()
+        if loaded is None:
+            return None
+        arrays, manifest = loaded
+        return CoPurchaseMatrix(**arrays, max_order_id=manifest["max_order_id"], version=manifest["version"])
+
+    def save(self, matrix: CoPurchaseMatrix) -> int:
+        """Write a new version, keeping only the logged baskets newer than its orders."""
+        return self.save_arrays(
+            {name: getattr(matrix, name) for name in ARRAYS},
+            keep=lambda entry: entry[0] > matrix.max_order_id,
+            max_order_id=matrix.max_order_id,
+            shape=len(matrix.product_ids),
+        )
+
+
+class CoPurchaseIndex(MappedIndex):
+    """
+    Memory-mapped base matrix plus an in-memory delta of baskets recorded
+    since it was built. Lookups are a dict hit for the product's row and a
+    binary search within that row; no database access.
+    """
+
+    def __init__(self, store: CoPurchaseStore, refresh_interval: float = 1.0, max_basket_size: int = 50):
+        super().__init__(store, refresh_interval)
+        self.max_basket_size = max_basket_size
+        self.matrix: Optional[CoPurchaseMatrix] = None
+        self._reset_delta()
+
+    def _reset_delta(self) -> None:
+        self._delta: Dict[int, Counter] = defaultdict(Counter)
+        self._delta_counts: Counter = Counter()
+        self._delta_orders: set = set()
+
+    def _load_base(self, matrix: Optional[CoPurchaseMatrix]) -> None:
+        self.matrix = matrix
+        self._reset_delta()
+
+    def _apply_delta(self, entries, base_changed: bool) -> None:
+        for order_id, product_ids in entries:
+            self._apply(order_id, product_ids)
+
+    def _apply(self, order_id: int, product_ids: Sequence[int]) -> None:
+        base_max = self.matrix.max_order_id if self.matrix is not None else 0
+        if order_id <= base_max or order_id in self._delta_orders:
+            return
+        basket = sorted(set(product_ids))
+        if len(basket) > self.max_basket_size:
+            return
+        self._delta_orders.add(order_id)
+        for product_id in basket:
+            self._delta_counts[product_id] += 1
+            for other in basket:
+                if other != product_id:
+                    self._delta[product_id][other] += 1
+
+    def ensure_built(self, db: Session) -> None:
+        self.refresh()
+        if self.matrix is None:
+            self.rebuild(db)
+
+    def rebuild(self, db: Session) -> CoPurchaseMatrix:
+        matrix = CoPurchaseMatrix.from_db(db, self.max_basket_size)
+        with self._lock:
+            matrix.version = self.store.save(matrix)
+        self.refresh(force=True)
+        logger.info(
+            f"Built co-purchase matrix: {len(matrix.product_ids)} products, "
+            f"{len(matrix.data)} pairs, orders up to #{matrix.max_order_id}"
+        )
+        return matrix
+
+    def record_order(self, order_id: int, product_ids: Sequence[int]) -> None:
+        """Add one committed order's basket (persisted for the other workers)."""
+        product_ids = sorted(set(pid for pid in product_ids if pid is not None))
+        if not product_ids:
+            return
+        self.store.append(order_id, product_ids)
+        with self._lock:
+            self._apply(order_id, product_ids)
+
+    def scores(self, product_id: int, candidate_ids: Sequence[int]) -> np.ndarray:
+        """
+        P(candidate in basket | product in basket) for every candidate, in
+        the order given; 0.0 for products never bought.
+        """
+        with self._lock:
+            matrix = self.matrix or CoPurchaseMatrix.empty()
+            co = matrix.co_counts(product_id, candidate_ids)
+            delta = self._delta.get(product_id)
+            if delta:
+                co += np.fromiter((delta.get(c, 0) for c in candidate_ids), dtype=np.float64, count=len(candidate_ids))
+            total = matrix.item_count(product_id) + self._delta_counts.get(product_id, 0)
+        if total == 0:
+            return np.zeros(len(candidate_ids), dtype=np.float64)
+        return co / total
+
+    def score(self, product_id: int, candidate_id: int) -> float:
+        return float(self.scores(product_id, [candidate_id])[0])
+
+
+_copurchase_index: Optional[CoPurchaseIndex] = None
+_copurchase_lock = threading.Lock()
+
+
+def get_copurchase_index() -> CoPurchaseIndex:
+    """
+    Return the process-wide co-purchase index, creating it on first use
+    """
+    global _copurchase_index
+    if _copurchase_index is None:
+        with _copurchase_lock:
+            if _copurchase_index is None:
+                _copurchase_index = CoPurchaseIndex(
+                    CoPurchaseStore(settings.COPURCHASE_MATRIX_DIR),
+                    max_basket_size=settings.COPURCHASE_MAX_BASKET_SIZE,
+                )
+    return _copurchase_index
+
+
+def record_order(order_id: int, product_ids: Sequence[int]) -> None:
+    """
+    Hook for order creation; never raises, a missed basket only weakens
+    recommendations until the next rebuild
+    """
+    try:
+        get_copurchase_index().record_order(order_id, product_ids)
+    except Exception as e:
+        logger.warning(f"Could not record order #{order_id} in co-purchase matrix: {e}")
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        get_copurchase_index().rebuild(session)
+    finally:
+        session.close()
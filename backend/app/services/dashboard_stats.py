@@ -0,0 +1,139 @@
+"""
+Admin Dashboard Statistics
+Aggregates for ``GET /admin/dashboard/stats`` with a short-lived cache
+
+All order totals, the 30-day revenue and the per-status counts come from a
+single pass over ``orders`` using conditional aggregation
+(``COUNT(...) FILTER (WHERE ...)``); the user and product counts ride along
+as scalar subqueries. The 7-day chart reads the ``daily_sales`` rollup, and
+the two lists (top products, latest orders) are one query each. The result
+is cached for ``ADMIN_STATS_CACHE_TTL`` seconds and dropped whenever an
+order changes (see ``app.services.order_events``).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.order import Order, OrderItem, OrderStatus
+from ..models.product import Product
+from ..models.user import User
+from .sales_rollup import revenue_chart
+
+CHART_DAYS = 7
+RECENT_REVENUE_DAYS = 30
+STATUSES = [status.value for status in OrderStatus]
+
+
+def _aggregate_orders(db: Session, now: datetime) -> Dict[str, Any]:
+    recent_start = now - timedelta(days=RECENT_REVENUE_DAYS)
+    row = db.execute(
+        select(
+            func.count(Order.id),
+            func.sum(Order.total),
+            func.sum(Order.total).filter(Order.created_at >= recent_start),
+            select(func.count(User.id)).scalar_subquery(),
+            select(func.count(Product.id)).scalar_subquery(),
+            *[func.count(Order.id).filter(Order.status == status) for status in STATUSES],
+        )
+    ).one()
+    total_orders, total_revenue, recent_revenue, total_users, total_products = row[:5]
+
+    status_counts = {status: count for status, count in zip(STATUSES, row[5:]) if count}
+    other = total_orders - sum(status_counts.values())
+    if other:
+        status_counts["unknown"] = other
+
+    return {
+        "total_revenue": float(total_revenue or 0.0),
+        "recent_revenue": float(recent_revenue or 0.0),
+        "total_orders": int(total_orders),
+        "total_users": int(total_users or 0),
+        "total_products": int(total_products or 0),
+        "orders_by_status": status_counts,
+    }
+
+
+def _top_products(db: Session, limit: int = 5) -> List[Dict[str, Any]]:
+    sold = (
+        select(OrderItem.product_id, func.sum(OrderItem.quantity).label("total_sold"))
+        .group_by(OrderItem.product_id)
+        .order_by(desc("total_sold"))
+        .limit(limit)
+        .subquery()
+    )
+    rows = db.execute(
+        select(Product.id, Product.title, Product.price, sold.c.total_sold)
+        .join(sold, sold.c.product_id == Product.id)
+        .order_by(desc(sold.c.total_sold), Product.id)
+    ).all()
+    return [
+        {"id": pid, "name": title or "Unknown Product", "price": float(price or 0.0), "total_sold": int(total or 0)}
+        for pid, title, price, total in rows
+    ]
+
+
+def _recent_orders(db: Session, now: datetime, limit: int = 10) -> List[Dict[str, Any]]:
+    rows = db.execute(
+        select(Order.id, Order.full_name, Order.total, Order.status, Order.created_at)
+        .order_by(desc(Order.created_at), desc(Order.id))
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "id": oid,
+            "customer_name": full_name or "Guest",
+            "total_amount": float(total or 0.0),
+            "status": status or "pending",
+            "created_at": (created_at or now).isoformat(),
+        }
+        for oid, full_name, total, status, created_at in rows
+    ]
+
+
+def compute_dashboard_stats(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Compute the dashboard payload from the database (four queries)."""
+    now = now or datetime.utcnow()
+    stats = _aggregate_orders(db, now)
+    stats["revenue_chart"] = revenue_chart(db, (now - timedelta(days=CHART_DAYS)).date())
+    stats["top_products"] = _top_products(db)
+    stats["recent_orders"] = _recent_orders(db, now)
+    return stats
+
+
+_cached: Optional[Tuple[float, Dict[str, Any]]] = None
+_generation = 0
+_lock = threading.Lock()
+
+
+def get_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """
+    Return the dashboard payload, computing it at most once per TTL
+    (per worker) unless orders changed in between
+    """
+    global _cached
+    cached = _cached
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    with _lock:
+        cached = _cached
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        generation = _generation
+    stats = compute_dashboard_stats(db)
+    with _lock:
+        # Don't store a result that an order change made stale while computing
+        if generation == _generation:
+            _cached = (time.monotonic() + settings.ADMIN_STATS_CACHE_TTL, stats)
+    return stats
+
+
+def invalidate_dashboard_stats() -> None:
+    global _cached, _generation
+    with _lock:
+        _cached = None
+        _generation += 1
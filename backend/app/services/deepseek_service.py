@@ -4,64 +4,15 @@ Handles communication with DeepSeek API for smart search functionality
 """
 import os
 import logging
-import time
 from typing import Dict, Any, Optional, List
-from openai import OpenAI
+from openai import AsyncOpenAI
 from app.config import settings
-from collections import deque
-import threading
+from app.services.http_client import get_http_client
+from app.services.llm_cache import get_llm_cache
+from app.services.rate_limiter import get_rate_limiter
 import json
 
 
-class RateLimiter:
-    """
-    Simple rate limiter to manage API calls to DeepSeek
-    """
-    def __init__(self, max_requests_per_minute: int = 30, daily_limit: int = 1000):
-        self.max_requests_per_minute = max_requests_per_minute
-        self.daily_limit = daily_limit
-        self.requests = deque()
-        self.daily_requests = 0
-        self.lock = threading.Lock()
-        self.daily_reset_time = time.time() + 86400  # Reset after 24 hours
-
-    def check_rate_limit(self) -> bool:
-        """
-        Check if we're within rate limits
-        """
-        with self.lock:
-            now = time.time()
-            
-            # Clean old requests (older than 60 seconds)
-            while self.requests and now - self.requests[0] > 60:
-                self.requests.popleft()
-                
-            # Check if we're within the minute limit
-            if len(self.requests) >= self.max_requests_per_minute:
-                return False
-                
-            # Check if we're within the daily limit
-            if self.daily_requests >= self.daily_limit:
-                # Check if it's time to reset the daily counter
-                if now > self.daily_reset_time:
-                    self.daily_requests = 0
-                    self.daily_reset_time = now + 86400  # Reset in 24 hours
-                else:
-                    return False
-                    
-            # Add the current request
-            self.requests.append(now)
-            self.daily_requests += 1
-            return True
-
-    def wait_if_needed(self):
-        """
-        Wait if rate limit is exceeded
-        """
-        while not self.check_rate_limit():
-            time.sleep(1)  # Wait 1 second before retrying
-
-
 class DeepSeekService:
     """
     Service for interacting with the DeepSeek API
@@ -78,9 +29,10 @@ class DeepSeekService:
         
         if self.enabled:
             try:
-                self.client = OpenAI(
+                self.client = AsyncOpenAI(
                     api_key=self.api_key,
-                    base_url=self.base_url
+                    base_url=self.base_url,
+                    http_client=get_http_client(),
                 )
                 
                 # Model to use for smart search
@@ -89,7 +41,7 @@ class DeepSeekService:
                 # Initialize rate limiter with configurable limits
                 max_requests_per_minute = int(os.getenv("DEEPSEEK_RATE_LIMIT_PER_MINUTE", "30"))
                 daily_limit = int(os.getenv("DEEPSEEK_DAILY_LIMIT", "1000"))
-                self.rate_limiter = RateLimiter(max_requests_per_minute, daily_limit)
+                self.rate_limiter = get_rate_limiter("deepseek", max_requests_per_minute, daily_limit)
                 
                 self.logger.info("DeepSeekService initialized with API key")
             except Exception as e:
@@ -103,9 +55,70 @@ class DeepSeekService:
             # Rate limiter is still initialized even if not used
             max_requests_per_minute = int(os.getenv("DEEPSEEK_RATE_LIMIT_PER_MINUTE", "30"))
             daily_limit = int(os.getenv("DEEPSEEK_DAILY_LIMIT", "1000"))
-            self.rate_limiter = RateLimiter(max_requests_per_minute, daily_limit)
+            self.rate_limiter = get_rate_limiter("deepseek", max_requests_per_minute, daily_limit)
     
-    def extract_search_filters(self, query: str) -> Dict[str, Any]:
+    async def _complete(
+        self,
+        method: str,
+        system_prompt: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False,
+    ) -> str:
+        """
+        Return the completion for a prompt, served from the LLM response cache
+        when an identical (method, model, normalized prompt) was answered before
+        """
+        async def request() -> str:
+            return await self._request(system_prompt, prompt, temperature, max_tokens, json_mode)
+
+        if not settings.LLM_CACHE_ENABLED:
+            return await request()
+        return await get_llm_cache().get_or_compute(method, self.model, prompt, request)
+
+    async def _request(
+        self,
+        system_prompt: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool = False,
+    ) -> str:
+        """
+        Send one chat completion to DeepSeek and return the message content
+
+        Raises:
+            RateLimitExceeded: if no request slot frees up within the queueing deadline
+        """
+        await self.rate_limiter.acquire()
+
+        kwargs = {}
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+
+        if response.choices and response.choices[0].message.content:
+            return response.choices[0].message.content
+        return ""
+
+    async def extract_search_filters(self, query: str) -> Dict[str, Any]:
         """
         Extract search filters from a natural language query using DeepSeek
         
@@ -119,8 +132,6 @@ class DeepSeekService:
             return self._fallback_extract_filters(query)
         
         try:
-            self.rate_limiter.wait_if_needed()
-            
             prompt = f"""
             Extract search filters from the following query. Identify the following if mentioned:
             - category: product category (e.g., mobile, laptop, tablet, etc.)
@@ -151,24 +162,15 @@ class DeepSeekService:
             If the query contains Persian text, handle it appropriately.
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert at parsing natural language search queries for an e-commerce platform. Extract relevant filters accurately. Return ONLY JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            content = await self._complete(
+                "extract_search_filters",
+                "You are an expert at parsing natural language search queries for an e-commerce platform. Extract relevant filters accurately. Return ONLY JSON.",
+                prompt,
                 temperature=0.1,
                 max_tokens=512,
-                response_format={"type": "json_object"}
+                json_mode=True
             )
             
-            content = response.choices[0].message.content
             if content:
                 filters = json.loads(content)
                 # Clean up the filters to remove None values
@@ -243,7 +245,7 @@ class DeepSeekService:
 
         return filters
     
-    def generate_search_explanation(self, query: str, filters: Dict[str, Any], results_count: int) -> str:
+    async def generate_search_explanation(self, query: str, filters: Dict[str, Any], results_count: int) -> str:
         """
         Generate a human-readable explanation of the search results using DeepSeek
         """
@@ -251,8 +253,6 @@ class DeepSeekService:
             return self._fallback_generate_explanation(query, filters, results_count)
         
         try:
-            self.rate_limiter.wait_if_needed()
-            
             prompt = f"""
             Given the following search query and filters, create a helpful explanation for the user about their search results.
             
@@ -271,23 +271,13 @@ class DeepSeekService:
             Keep the response natural and helpful, as if speaking to a customer.
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful customer service assistant for an e-commerce website. Provide clear, friendly explanations of search results."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            explanation = await self._complete(
+                "generate_search_explanation",
+                "You are a helpful customer service assistant for an e-commerce website. Provide clear, friendly explanations of search results.",
+                prompt,
                 temperature=0.3,
                 max_tokens=256
             )
-            
-            explanation = response.choices[0].message.content if response.choices and response.choices[0].message.content else ""
             return explanation.strip()
             
         except Exception as e:
@@ -317,7 +307,7 @@ class DeepSeekService:
         else:
             return f"جستجوی شما '{query}' هیچ نتیجه‌ای نداشت. لطفاً عبارت جستجوی خود را تغییر دهید."
     
-    def generate_related_searches(self, query: str) -> list:
+    async def generate_related_searches(self, query: str) -> list:
         """
         Generate related search suggestions using DeepSeek
         """
@@ -325,8 +315,6 @@ class DeepSeekService:
             return self._fallback_generate_related_searches(query)
         
         try:
-            self.rate_limiter.wait_if_needed()
-            
             prompt = f"""
             Based on the following search query, suggest 3-5 related search queries that the user might be interested in.
             Query: {query}
@@ -337,24 +325,15 @@ class DeepSeekService:
             Make sure the suggestions are in the same language as the original query.
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a search assistant that suggests related queries based on user input. Return ONLY JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            content = await self._complete(
+                "generate_related_searches",
+                "You are a search assistant that suggests related queries based on user input. Return ONLY JSON.",
+                prompt,
                 temperature=0.5,
                 max_tokens=256,
-                response_format={"type": "json_object"}
+                json_mode=True
             )
             
-            content = response.choices[0].message.content
             if content:
                 data = json.loads(content)
                 suggestions = data.get("suggestions", []) if isinstance(data, dict) else data
@@ -404,7 +383,7 @@ class DeepSeekService:
         # Take up to 5 suggestions
         return list(set(related_searches))[:5] if related_searches else []
     
-    def analyze_product_relevance(self, query: str, product_title: str, product_description: str) -> Dict[str, Any]:
+    async def analyze_product_relevance(self, query: str, product_title: str, product_description: str) -> Dict[str, Any]:
         """
         Analyze the relevance of a product to a search query using DeepSeek
         """
@@ -412,8 +391,6 @@ class DeepSeekService:
             return self._fallback_analyze_relevance(query, product_title, product_description)
         
         try:
-            self.rate_limiter.wait_if_needed()
-            
             prompt = f"""
             Analyze how relevant the following product is to the search query.
             
@@ -432,24 +409,15 @@ class DeepSeekService:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert at matching search queries to products. Rate relevance accurately and helpfully. Return ONLY JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            content = await self._complete(
+                "analyze_product_relevance",
+                "You are an expert at matching search queries to products. Rate relevance accurately and helpfully. Return ONLY JSON.",
+                prompt,
                 temperature=0.2,
                 max_tokens=256,
-                response_format={"type": "json_object"}
+                json_mode=True
             )
             
-            content = response.choices[0].message.content
             if content:
                 result = json.loads(content)
                 return result
@@ -459,6 +427,80 @@ class DeepSeekService:
             self.logger.error(f"Error analyzing product relevance: {str(e)}", exc_info=True)
             return self._fallback_analyze_relevance(query, product_title, product_description)
 
+    async def analyze_products_relevance(self, query: str, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Score the relevance of several products to a query with a single DeepSeek call
+
+        Args:
+            query: The search query
+            products: Dictionaries with at least "id", "title" and "description"
+
+        Returns:
+            One {"relevance_score", "explanation"} dict per product, in input order.
+            Products the model skipped or scored invalidly get the deterministic
+            fallback score.
+        """
+        if not products:
+            return []
+
+        scores: Dict[Any, Dict[str, Any]] = {}
+        if self.enabled:
+            try:
+                catalog = "\n".join(
+                    f"- id: {p['id']} | title: {p.get('title') or ''} | description: {(p.get('description') or '')[:200]}"
+                    for p in products
+                )
+                prompt = f"""
+                Analyze how relevant each of the following products is to the search query.
+
+                Query: {query}
+                Products:
+                {catalog}
+
+                Rate each product on a scale of 1-10 where:
+                1 = completely irrelevant
+                10 = extremely relevant
+
+                Respond in JSON format with one entry per product id:
+                {{
+                    "results": [
+                        {{"id": ..., "relevance_score": ..., "explanation": "..."}}
+                    ]
+                }}
+                """
+
+                content = await self._complete(
+                    "analyze_products_relevance",
+                    "You are an expert at matching search queries to products. Rate relevance accurately and helpfully. Return ONLY JSON.",
+                    prompt,
+                    temperature=0.2,
+                    max_tokens=min(2048, 64 + 48 * len(products)),
+                    json_mode=True
+                )
+
+                if content:
+                    data = json.loads(content)
+                    entries = data.get("results", []) if isinstance(data, dict) else data
+                    for entry in entries:
+                        if not isinstance(entry, dict) or "id" not in entry:
+                            continue
+                        try:
+                            score = float(entry.get("relevance_score"))
+                        except (TypeError, ValueError):
+                            continue
+                        scores[str(entry["id"])] = {
+                            "relevance_score": max(1, min(10, int(round(score)))),
+                            "explanation": entry.get("explanation") or "Relevance score calculated by AI"
+                        }
+
+            except Exception as e:
+                self.logger.error(f"Error analyzing batch product relevance: {str(e)}", exc_info=True)
+
+        return [
+            scores.get(str(p["id"])) or self._fallback_analyze_relevance(query, p.get("title") or "", p.get("description"))
+            for p in products
+        ]
+
     def _fallback_analyze_relevance(self, query: str, product_title: str, product_description: str) -> Dict[str, Any]:
         """
         Fallback method to analyze product relevance when DeepSeek is not available
@@ -0,0 +1,83 @@
+"""
+Shared outbound HTTP client
+One ``httpx.AsyncClient`` per worker for every LLM call (chat, streaming,
+smart search, recommendations, product descriptions)
+
+- Keep-alive pooling with a bounded number of connections, so TLS handshakes
+  happen once per connection instead of once per request
+- HTTP/2 when the ``h2`` package is installed (multiplexes concurrent calls
+  to the same host over one connection)
+- Separate connect/read/write/pool timeouts: a slow model may take a minute
+  to answer, but a dead host or an exhausted pool should fail fast
+
+The client is opened and closed by the FastAPI lifespan in ``app.main``;
+``get_http_client`` creates one lazily for scripts and tests that run
+outside the application.
+"""
+import logging
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (optional, installed by httpx[http2])
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a pooled client from the ``HTTP_CLIENT_*`` settings."""
+    http2 = settings.HTTP_CLIENT_HTTP2 and _http2_available()
+    if settings.HTTP_CLIENT_HTTP2 and not http2:
+        logger.warning("h2 package not installed, outbound HTTP client uses HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+            read=settings.HTTP_CLIENT_READ_TIMEOUT,
+            write=settings.HTTP_CLIENT_WRITE_TIMEOUT,
+            pool=settings.HTTP_CLIENT_POOL_TIMEOUT,
+        ),
+        headers={"User-Agent": f"{settings.PROJECT_NAME}/{settings.VERSION}"},
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Open the process-wide client (called from the application lifespan)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide client, creating it on first use when the
+    application lifespan has not opened one
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close pooled connections (called when the application shuts down)."""
+    global _http_client
+    client, _http_client = _http_client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
@@ -0,0 +1,318 @@
+"""
+Image Proxy Cache
+Two-tier cache for processed images served by ``/images/image``
+
+- Memory: LRU bounded by a byte budget and an entry count, with TTL
+- Disk: content-addressed files shared by every uvicorn worker on the host;
+  small hits are promoted to memory, large ones are returned as an open
+  file to stream from (still readable if another worker prunes the blob)
+
+Keys are hashed request parameters; values are the encoded image bytes, so
+two requests that produce identical output share one file on disk.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, NamedTuple, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write ``data`` to a temporary file and rename it to ``path``."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class CachedImage(NamedTuple):
+    content_type: str
+    digest: str  # sha256 of the image bytes, also used as the ETag
+    data: Optional[bytes] = None  # set for memory hits
+    file: Optional[BinaryIO] = None  # set for disk hits too large to keep in memory; the caller closes it
+
+
+class DiskImageStore:
+    """
+    Content-addressed files under ``root``:
+
+    - ``blobs/ab/<sha256>``: image bytes, written once per distinct content
+    - ``keys/cd/<key>``: JSON pointer ``{digest, content_type, size, expires_at}``
+
+    Files are written to a temporary name and renamed into place, so
+    concurrent workers only ever see complete files. When the blobs outgrow
+    ``max_bytes`` the least recently used ones are removed.
+    """
+
+    PRUNE_TO = 0.8  # fraction of max_bytes kept after a prune
+
+    def __init__(self, root: str, max_bytes: int, clock: Callable[[], float] = time.time):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None  # estimate, refreshed by every prune
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "keys"), exist_ok=True)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _key_path(self, key: str) -> str:
+        return os.path.join(self.root, "keys", key[:2], key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Metadata plus ``path`` of the cached image, or None."""
+        key_path = self._key_path(key)
+        try:
+            with open(key_path, "rb") as f:
+                meta = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if meta["expires_at"] <= self.clock():
+            try:
+                os.unlink(key_path)
+            except OSError:
+                pass
+            return None
+        path = self._blob_path(meta["digest"])
+        try:
+            os.utime(path)  # recency for LRU pruning across workers
+        except OSError:
+            return None  # blob pruned by another worker
+        meta["path"] = path
+        return meta
+
+    def put(self, key: str, digest: str, data: bytes, content_type: str, ttl: float) -> None:
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            write_atomic(path, data)
+            self._account(len(data))
+        meta = {"digest": digest, "content_type": content_type, "size": len(data), "expires_at": self.clock() + ttl}
+        write_atomic(self._key_path(key), json.dumps(meta).encode("utf-8"))
+
+    def _account(self, added: int) -> None:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan_bytes()
+            else:
+                self._bytes += added
+            if self._bytes > self.max_bytes:
+                self._bytes = self.prune()
+
+    def _blobs(self):
+        blobs_dir = os.path.join(self.root, "blobs")
+        for shard in os.scandir(blobs_dir):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and not entry.name.startswith(".tmp-"):
+                        yield entry
+
+    def _scan_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self._blobs())
+
+    def prune(self) -> int:
+        """Remove least recently used blobs until under the budget; returns bytes left."""
+        blobs = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._blobs()]
+        total = sum(size for _, size, _ in blobs)
+        target = self.max_bytes * self.PRUNE_TO
+        for _, size, path in sorted(blobs):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+        # Key files pointing at removed blobs are dropped lazily by get()
+        return total
+
+    def disk_bytes(self) -> int:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan_bytes()
+            return self._bytes
+
+
+class ImageCache:
+    """
+    Byte-budgeted LRU of processed images in front of an optional disk store
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entries: int = 2048,
+        ttl: float = 86400,
+        store: Optional[DiskImageStore] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_item_bytes = max_bytes // 8  # bigger images only live on disk
+        self.ttl = ttl
+        self.store = store
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (CachedImage, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "evictions": 0, "expirations": 0, "store_errors": 0,
+        }
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha256("\x00".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, image: CachedImage, expires_at: float) -> None:
+        """Insert into the memory tier (caller holds the lock)."""
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous[0].data)
+        self._entries[key] = (image, expires_at)
+        self._bytes += len(image.data)
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.data)
+            self._counters["evictions"] += 1
+
+    def get(self, key: str) -> Optional[CachedImage]:
+        """Memory-tier lookup (never blocks); counts only hits, see ``load``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            image, expires_at = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self._bytes -= len(image.data)
+                self._counters["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return image
+
+    def load(self, key: str) -> Optional[CachedImage]:
+        """
+        Memory, then disk lookup (blocking file I/O: call from a thread).
+        Disk hits small enough for memory are read and promoted.
+        """
+        image = self.get(key)
+        if image is not None:
+            return image
+        meta = None
+        if self.store is not None:
+            try:
+                meta = self.store.get(key)
+            except OSError as e:
+                with self._lock:
+                    self._counters["store_errors"] += 1
+                logger.warning(f"Image cache disk read failed: {e}")
+        if meta is not None:
+            try:
+                # Open now: the handle keeps the blob readable after a prune
+                f = open(meta["path"], "rb")
+            except OSError:
+                meta = None  # pruned by another worker since the lookup
+        if meta is None:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        image = CachedImage(meta["content_type"], meta["digest"], file=f)
+        if meta["size"] <= self.max_item_bytes:
+            with f:
+                data = f.read()
+            image = CachedImage(meta["content_type"], meta["digest"], data=data)
+            with self._lock:
+                self._remember(key, image, meta["expires_at"])
+        with self._lock:
+            self._counters["disk_hits"] += 1
+        return image
+
+    def put(self, key: str, data: bytes, content_type: str, ttl: Optional[float] = None) -> CachedImage:
+        """Cache ``data`` in both tiers (blocking file I/O: call from a thread)."""
+        ttl = self.ttl if ttl is None else ttl
+        digest = hashlib.sha256(data).hexdigest()
+        image = CachedImage(content_type, digest, data=data)
+        if len(data) <= self.max_item_bytes:
+            with self._lock:
+                self._remember(key, image, self.clock() + ttl)
+        if self.store is not None:
+            try:
+                self.store.put(key, digest, data, content_type, ttl)
+            except OSError as e:
+                with self._lock:
+                    self._counters["store_errors"] += 1
+                logger.warning(f"Image cache disk write failed: {e}")
+        return image
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            entries, resident = len(self._entries), self._bytes
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "bytes_resident": resident,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "disk_bytes": self.store.disk_bytes() if self.store is not None else None,
+            "disk_max_bytes": self.store.max_bytes if self.store is not None else None,
+        }
+
+
+_image_cache: Optional[ImageCache] = None
+
+
+def _create_store() -> Optional[DiskImageStore]:
+    if not settings.IMAGE_CACHE_DIR:
+        return None
+    try:
+        return DiskImageStore(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_DISK_MAX_BYTES)
+    except OSError as e:
+        logger.warning(f"Could not open image cache directory {settings.IMAGE_CACHE_DIR}: {e}")
+        return None
+
+
+def get_image_cache() -> ImageCache:
+    """
+    Return the process-wide image cache, creating it on first use
+    """
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImageCache(
+            max_bytes=settings.IMAGE_CACHE_MAX_BYTES,
+            max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+            ttl=settings.IMAGE_CACHE_TTL,
+            store=_create_store(),
+        )
+    return _image_cache
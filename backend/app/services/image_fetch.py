@@ -0,0 +1,103 @@
+"""
+Image Proxy Upstream
+One ``aiohttp.ClientSession`` per worker for fetching source images, plus
+request coalescing for the proxy
+
+- Keep-alive pooling with a per-host connection limit, so thumbnails from
+  images.unsplash.com or pexels reuse a few warm TLS connections instead of
+  handshaking once per request
+- DNS results cached for ``IMAGE_FETCH_DNS_TTL`` seconds
+- ``RequestCoalescer``: concurrent callers with the same key share one
+  in-flight task (one upstream fetch, one resize)
+
+The session is opened and closed by the FastAPI lifespan in ``app.main``;
+``get_image_session`` creates one lazily for tests and scripts that run
+outside the application.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import aiohttp
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_image_session: Optional[aiohttp.ClientSession] = None
+
+
+def create_image_session() -> aiohttp.ClientSession:
+    """Build a pooled session from the ``IMAGE_FETCH_*`` settings."""
+    connector = aiohttp.TCPConnector(
+        limit=settings.IMAGE_FETCH_MAX_CONNECTIONS,
+        limit_per_host=settings.IMAGE_FETCH_MAX_CONNECTIONS_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=settings.IMAGE_FETCH_DNS_TTL,
+        keepalive_timeout=settings.IMAGE_FETCH_KEEPALIVE_EXPIRY,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(
+            total=settings.IMAGE_FETCH_TIMEOUT,
+            sock_connect=settings.IMAGE_FETCH_CONNECT_TIMEOUT,
+        ),
+        headers={"User-Agent": "iShop Image Proxy 1.0"},
+    )
+
+
+async def init_image_session() -> aiohttp.ClientSession:
+    """Open the process-wide session (called from the application lifespan)."""
+    return get_image_session()
+
+
+def get_image_session() -> aiohttp.ClientSession:
+    """
+    Return the process-wide session, creating it on first use when the
+    application lifespan has not opened one (must be called from the loop)
+    """
+    global _image_session
+    if _image_session is None or _image_session.closed:
+        _image_session = create_image_session()
+    return _image_session
+
+
+async def close_image_session() -> None:
+    """Close pooled connections (called when the application shuts down)."""
+    global _image_session
+    session, _image_session = _image_session, None
+    if session is not None and not session.closed:
+        await session.close()
+
+
+class RequestCoalescer:
+    """
+    Share one in-flight task between concurrent callers with the same key
+
+    The work runs as its own task, so a caller that disconnects does not
+    cancel it for the others; results are never kept once the task is done.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._counters = {"started": 0, "coalesced": 0}
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller went away
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self._counters["started"] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._done(key, done))
+        else:
+            self._counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counters, "inflight": len(self._inflight)}
@@ -0,0 +1,110 @@
+"""
+Image Processing Pool
+Dedicated worker processes for Pillow decode/resize/encode
+
+Pillow holds the GIL for much of a resize and encode, so running
+``process_image`` on the default thread pool serializes concurrent requests.
+Jobs go to a ``ProcessPoolExecutor`` instead (``IMAGE_WORKERS`` processes,
+0 = threads in this process), and at most ``IMAGE_QUEUE_SIZE`` jobs may be
+queued or running per API worker; beyond that callers get ``ImageQueueFull``
+(HTTP 503) rather than an ever-growing backlog.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImageQueueFull(Exception):
+    """Raised when the image job queue is at capacity"""
+
+
+class ImageProcessingPool:
+    """
+    Bounded front for the image worker processes
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._counters = {"completed": 0, "failed": 0, "rejected": 0}
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                # spawn: workers import only what the job needs, and never
+                # inherit the event loop's threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                    thread_name_prefix="image")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run ``fn(*args)`` in the pool; raises ``ImageQueueFull`` when
+        ``max_pending`` jobs are already queued or running
+        """
+        if self._pending >= self.max_pending:
+            self._counters["rejected"] += 1
+            raise ImageQueueFull(f"{self._pending} image jobs pending")
+        self._pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+            self._counters["completed"] += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge image); start fresh next time
+            logger.error("Image worker pool broke, restarting it")
+            self._counters["failed"] += 1
+            self.shutdown(wait=False)
+            raise
+        except Exception:
+            self._counters["failed"] += 1
+            raise
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_image_pool: Optional[ImageProcessingPool] = None
+
+
+def get_image_pool() -> ImageProcessingPool:
+    """
+    Return this API worker's image pool (processes start on first job)
+    """
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ImageProcessingPool(settings.IMAGE_WORKERS, settings.IMAGE_QUEUE_SIZE)
+    return _image_pool
+
+
+def shutdown_image_pool() -> None:
+    global _image_pool
+    pool, _image_pool = _image_pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -1,39 +1,89 @@
+"""
+Image Search Service
+Find products that look like an uploaded photo
+
+The photo is fingerprinted locally (pHash, dHash and a colour histogram, see
+``app.utils.image_hashing``) and matched against the visual index of every
+product image (``app.services.visual_index``). No vision API is involved, so
+search works offline and costs a few milliseconds per query.
+"""
+import base64
+import binascii
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import UnidentifiedImageError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..models.product import Product
+from ..utils.image_hashing import HISTOGRAM_BINS, Fingerprint, fingerprint
+from .visual_index import get_visual_index
+
+# Colour names for the dominant histogram bin (centre of a 4x4x4 RGB bin)
+COLOR_NAMES = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "gray": (128, 128, 128),
+    "red": (200, 30, 30), "orange": (230, 130, 30), "yellow": (230, 210, 40),
+    "green": (40, 160, 60), "blue": (40, 80, 200), "purple": (130, 50, 160),
+    "pink": (230, 130, 180), "brown": (120, 80, 40),
+}
+
+
+def dominant_color(histogram: np.ndarray) -> str:
+    step = 256 // HISTOGRAM_BINS
+    index = int(np.argmax(histogram))
+    r, g, b = ((index // HISTOGRAM_BINS ** 2) * step + step // 2,
+               (index // HISTOGRAM_BINS % HISTOGRAM_BINS) * step + step // 2,
+               (index % HISTOGRAM_BINS) * step + step // 2)
+    return min(COLOR_NAMES, key=lambda name: sum((c - n) ** 2 for c, n in zip((r, g, b), COLOR_NAMES[name])))
+
+
+class ImageSearchService:
+    """
+    Service for searching products by image
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.logger = logging.getLogger(__name__)
+
+    async def search_by_image(self, image_data: str, limit: int = 20) -> Dict[str, Any]:
+        """
+        Search for products similar to an uploaded image
+
+        Args:
             image_data: Base64 encoded image string
-            
+
         Returns:
             Dictionary with search results and extracted attributes
         """
         try:
-            # Decode the base64 image data
+            # Accept data URLs as sent by the storefront's FileReader
+            if image_data.startswith("data:"):
+                image_data = image_data.partition(",")[2]
             image_bytes = base64.b64decode(image_data)
-            
-            # Validate image format
-            try:
-                img = Image.open(BytesIO(image_bytes))
-                img.verify()  # Verify that it's a valid image
-            except Exception as e:
-                self.logger.error(f"Invalid image format: {str(e)}")
-                return {
-                    "results": [],
-                    "extracted_attributes": {},
-                    "error": "Invalid image format"
-                }
-            
-            # Reopen image after verification
-            img = Image.open(BytesIO(image_bytes))
-            
-            # Send image to AI Vision API for analysis
-            extracted_attributes = await self._analyze_image_with_ai(image_data)
-            
-            # Search for similar products in the database
-            search_results = self._find_similar_products(extracted_attributes)
-            
+            query = await run_in_threadpool(fingerprint, image_bytes)
+        except (binascii.Error, ValueError, UnidentifiedImageError, OSError) as e:
+            self.logger.error(f"Invalid image format: {str(e)}")
+            return {
+                "results": [],
+                "extracted_attributes": {},
+                "error": "Invalid image format",
+                "total_results": 0
+            }
+
+        try:
+            extracted_attributes = self._extract_attributes(query)
+            search_results = await run_in_threadpool(self._find_similar_products, query, limit)
+
             return {
                 "results": search_results,
                 "extracted_attributes": extracted_attributes,
                 "total_results": len(search_results)
             }
-            
+
         except Exception as e:
             self.logger.error(f"Error in image search: {str(e)}", exc_info=True)
             return {
@@ -42,129 +92,55 @@
                 "error": "Error processing image",
                 "total_results": 0
             }
-    
-    async def _analyze_image_with_ai(self, image_data: str) -> Dict[str, Any]:
+
+    def _extract_attributes(self, query: Fingerprint) -> Dict[str, Any]:
+        """Attributes read straight off the fingerprint"""
+        return {
+            "color": dominant_color(query.histogram),
+            "phash": f"{query.phash:016x}",
+            "dhash": f"{query.dhash:016x}",
+        }
+
+    def _find_similar_products(self, query: Fingerprint, limit: int = 20) -> List[Dict[str, Any]]:
         """
-        Use AI to analyze the image and extract product attributes.
-        Since Groq doesn't have image analysis capabilities in this context,
-        this method demonstrates the approach that would be used with a vision API.
+        Top matches from the visual index, limited to active products
         """
-        try:
-            # In a real implementation with a vision API, this is where we would:
-            # 1. Send the image to the vision model
-            # 2. Extract product attributes like type, brand, color, etc.
-            # 3. Return structured data about the product
-            
-            # Since we can't use a vision API with Groq here, we'll return a response
-            # that will allow our search to work by matching broadly
-            return {
-                "type": "common_product",  # Generic type to match many products
-                "brand": "unknown",
-                "color": "multicolor",  # Generic color to match many products
-                "style": "modern",
-                "material": "unknown",
-                "gender": "unisex",
-                "size": "unknown"
-            }
-            
-        except Exception as e:
-            self.logger.error(f"Error analyzing image with AI: {str(e)}", exc_info=True)
-            return {
-                "type": "unknown",
-                "brand": "unknown",
-                "color": "unknown",
-                "style": "unknown",
-                "material": "unknown",
-                "gender": "unisex",
-                "size": "unknown"
-            }
-    
-    def _find_similar_products(self, extracted_attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """
-        Find products in the database similar to the extracted attributes
-        """
-        try:
-            from ..models.product import Product as ProductModel
-            
-            # Build query for all active products
-            query = self.db.query(ProductModel).filter(ProductModel.is_active == True)
-            
-            # Get products and calculate similarity scores
-            products = query.limit(50).all()  # Get more products for better matching
-            
-            results = []
-            for product in products:
-                # Calculate a basic similarity score based on attribute matches
-                score = 0.0
-                
-                # Get the extracted attributes
-                type_filter = extracted_attributes.get('type', '').lower()
-                brand_filter = extracted_attributes.get('brand', '').lower()
-                color_filter = extracted_attributes.get('color', '').lower()
-                
-                # Calculate similarity for each attribute
-                if type_filter != 'unknown' and type_filter != 'common_product':
-                    if type_filter in product.category.lower():
-                        score += 0.4
-                    elif type_filter in product.title.lower():
-                        score += 0.3
-                    elif type_filter in (product.description or '').lower():
-                        score += 0.2
-                elif type_filter == 'common_product':
-                    # If it's a common product, give some base score to relevant categories
-                    relevant_categories = ['mobile', 'laptop', 'watch', 'headphone', 'clothing', 'shoe', 'bag']
-                    if any(cat in product.category.lower() for cat in relevant_categories):
-                        score += 0.1
-                
-                if brand_filter != 'unknown' and brand_filter in product.title.lower():
-                    score += 0.3
-                elif brand_filter != 'unknown' and brand_filter in (product.description or '').lower():
-                    score += 0.2
-                
-                if color_filter != 'unknown' and color_filter != 'multicolor':
-                    if color_filter in (product.description or '').lower():
-                        score += 0.3
-                    elif color_filter in (product.tags or '').lower():
-                        score += 0.2
-                elif color_filter == 'multicolor':
-                    # If multicolor was detected, give higher score to products with color-related tags
-                    if 'color' in (product.tags or '').lower() or 'multicolor' in (product.description or '').lower():
-                        score += 0.2
-                
-                # Additional scoring factors
-                # Higher-rated products get a small boost
-                score += (product.rating / 10) * 0.1 if product.rating else 0
-                
-                # Featured products get a small boost
-                if product.is_featured:
-                    score += 0.05
-                
-                results.append({
-                    "id": product.id,
-                    "title": product.title,
-                    "description": product.description,
-                    "price": product.price,
-                    "discount_price": product.discount_price,
-                    "discount": product.discount,
-                    "stock": product.stock,
-                    "rating": product.rating,
-                    "is_active": product.is_active,
-                    "is_featured": product.is_featured,
-                    "image_url": product.image_url,
-                    "category": product.category,
-                    "tags": product.tags,
-                    "similarity_score": min(1.0, score)  # Normalize score to 0-1 range
-                })
-            
-            # Filter out products with very low similarity scores
-            results = [r for r in results if r['similarity_score'] > 0.05]
-            
-            # Sort by similarity score in descending order
-            results.sort(key=lambda x: x['similarity_score'], reverse=True)
-            
-            # Return top 20 results
-            return results[:20]
-            
-        except Exception as e:
-            self.logger.error(f"Error finding similar products: {str(e)}", exc_info=True)
-            return []
\ No newline at end of file
+        index = get_visual_index()
+        # Over-fetch a little: deleted or inactive products are dropped below
+        matches = [
+            (product_id, score) for product_id, score in index.search(query, k=limit * 2)
+            if score >= settings.VISUAL_SEARCH_MIN_SCORE
+        ]
+        if not matches:
+            return []
+
+        products = {
+            product.id: product
+            for product in self.db.query(Product).filter(
+                Product.id.in_([product_id for product_id, _ in matches]),
+                Product.is_active == True  # noqa: E712
+            )
+        }
+
+        results = []
+        for product_id, score in matches:
+            product = products.get(product_id)
+            if product is None:
+                continue
+            results.append({
+                "id": product.id,
+                "title": product.title,
+                "description": product.description,
+                "price": product.price,
+                "discount_price": product.discount_price,
+                "discount": product.discount,
+                "stock": product.stock,
+                "rating": product.rating,
+                "is_active": product.is_active,
+                "is_featured": product.is_featured,
+                "image_url": product.image_url,
+                "category": product.category,
+                "tags": product.tags,
+                "similarity_score": score
+            })
+        return results[:limit]
@@ -0,0 +1,132 @@
+"""
+Responsive Image Variants
+Eagerly generated, content-addressed renditions of uploaded images
+
+An upload is decoded once in the image worker pool, which encodes every
+configured width (``IMAGE_VARIANT_WIDTHS``) in every format
+(``IMAGE_VARIANT_FORMATS``) plus a tiny LQIP placeholder. Files are named
+by the sha256 of their bytes and never change, so they can be served with
+an immutable Cache-Control; the manifest of an upload is keyed by the
+sha256 of the original, so uploading the same file twice is free.
+
+Layout under ``IMAGE_UPLOAD_DIR``:
+
+- ``files/ab/<sha256>.<ext>``: originals and variants
+- ``manifests/cd/<sha256>.json``: one manifest per original
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.image_cache import write_atomic
+from app.services.image_fetch import RequestCoalescer
+from app.services.image_pool import get_image_pool
+from app.utils.image_processing import generate_variants
+
+EXTENSIONS = {"jpeg": "jpg", "png": "png", "webp": "webp", "gif": "gif"}
+FILE_NAME = re.compile(r"^[0-9a-f]{64}\.(jpg|png|webp|gif|bin)$")
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class VariantStore:
+    """
+    Content-addressed files and manifests under ``root``
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, "files"), exist_ok=True)
+        os.makedirs(os.path.join(root, "manifests"), exist_ok=True)
+
+    def file_path(self, name: str) -> str:
+        return os.path.join(self.root, "files", name[:2], name)
+
+    def _manifest_path(self, digest: str) -> str:
+        return os.path.join(self.root, "manifests", digest[:2], f"{digest}.json")
+
+    def put_file(self, data: bytes, ext: str) -> str:
+        """Store ``data`` once per distinct content; returns the file name."""
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = self.file_path(name)
+        if not os.path.exists(path):
+            write_atomic(path, data)
+        return name
+
+    def get_manifest(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path(digest), "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def put_manifest(self, digest: str, manifest: Dict[str, Any]) -> None:
+        write_atomic(self._manifest_path(digest), json.dumps(manifest).encode("utf-8"))
+
+    def save(self, digest: str, original: bytes, rendered: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the original, every variant and the manifest (blocking file I/O)."""
+        manifest = {
+            "id": digest,
+            "width": rendered["width"],
+            "height": rendered["height"],
+            "original": self.put_file(original, EXTENSIONS.get(rendered["format"], "bin")),
+            "placeholder": "data:image/jpeg;base64," + base64.b64encode(rendered["placeholder"]).decode("ascii"),
+            "variants": [
+                {
+                    "width": variant["width"],
+                    "height": variant["height"],
+                    "format": variant["format"],
+                    "file": self.put_file(variant["data"], EXTENSIONS[variant["format"]]),
+                    "bytes": len(variant["data"]),
+                }
+                for variant in rendered["variants"]
+            ],
+        }
+        self.put_manifest(digest, manifest)
+        return manifest
+
+
+_variant_store: Optional[VariantStore] = None
+_uploads = RequestCoalescer()
+
+
+def get_variant_store() -> VariantStore:
+    global _variant_store
+    if _variant_store is None:
+        _variant_store = VariantStore(settings.IMAGE_UPLOAD_DIR)
+    return _variant_store
+
+
+def _configured(value: str) -> list:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+async def create_variants(image_bytes: bytes, quality: int) -> Dict[str, Any]:
+    """
+    Return the manifest for an upload, generating and storing its variants
+    in the image worker pool first unless the same bytes were uploaded before
+
+    Concurrent uploads of the same file share one job, and a repeated upload
+    keeps its first manifest whatever ``quality`` it asks for. Raises
+    ``ImageQueueFull`` when the pool is saturated.
+    """
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    store = get_variant_store()
+
+    async def render() -> Dict[str, Any]:
+        manifest = await run_in_threadpool(store.get_manifest, digest)
+        if manifest is not None:
+            return manifest
+        widths = [int(width) for width in _configured(settings.IMAGE_VARIANT_WIDTHS)]
+        rendered = await get_image_pool().run(
+            generate_variants, image_bytes, widths, _configured(settings.IMAGE_VARIANT_FORMATS),
+            quality, settings.IMAGE_PLACEHOLDER_WIDTH,
+        )
+        return await run_in_threadpool(store.save, digest, image_bytes, rendered)
+
+    return await _uploads.run(digest, render)
@@ -0,0 +1,259 @@
+"""
+LLM Response Cache
+Two-tier cache for LLM completions keyed by (method, model, normalized prompt)
+
+- L1: in-process LRU with TTL, so popular queries never leave the worker
+- L2: persistent store shared by all workers (SQLite file or Redis)
+- Single-flight: concurrent identical requests in a worker share one upstream call
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils.text_normalization import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteResponseStore:
+    """
+    Persistent L2 tier backed by a local SQLite file (WAL mode, so several
+    uvicorn workers on the same host can share it)
+    """
+
+    PURGE_EVERY = 500  # writes between sweeps of expired rows
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisResponseStore:
+    """
+    Persistent L2 tier backed by Redis (shared across hosts)
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "llm:"):
+        import redis.asyncio as redis  # optional dependency
+
+        self.prefix = prefix
+        self._redis = redis.from_url(redis_url)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._redis.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self._redis.setex(self.prefix + key, ttl, value)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class LLMResponseCache:
+    """
+    Cache for LLM completions with an LRU L1, an optional persistent L2 and
+    per-key single-flight coalescing
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: int = 86400, store: Any = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._counters = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "coalesced": 0, "store_errors": 0}
+
+    @staticmethod
+    def make_key(method: str, model: str, prompt: str) -> str:
+        raw = "\x00".join((method, model, normalize_text(prompt)))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _l1_get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _l1_set(self, key: str, value: str, ttl: int) -> None:
+        self._entries[key] = (value, time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _store_get(self, key: str) -> Optional[str]:
+        if self.store is None:
+            return None
+        try:
+            return await self.store.get(key)
+        except Exception as e:
+            self._counters["store_errors"] += 1
+            logger.warning(f"LLM cache store read failed: {e}")
+            return None
+
+    async def _store_set(self, key: str, value: str, ttl: int) -> None:
+        if self.store is None:
+            return
+        try:
+            await self.store.set(key, value, ttl)
+        except Exception as e:
+            self._counters["store_errors"] += 1
+            logger.warning(f"LLM cache store write failed: {e}")
+
+    async def get_or_compute(
+        self,
+        method: str,
+        model: str,
+        prompt: str,
+        compute: Callable[[], Awaitable[str]],
+        ttl: Optional[int] = None,
+    ) -> str:
+        """
+        Return the cached completion for (method, model, prompt), calling
+        ``compute`` at most once per key at a time on a miss. Empty results
+        and exceptions are never cached.
+        """
+        ttl = ttl or self.ttl
+        key = self.make_key(method, model, prompt)
+
+        value = self._l1_get(key)
+        if value is not None:
+            self._counters["l1_hits"] += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._store_get(key)
+            if value is not None:
+                self._counters["l2_hits"] += 1
+            else:
+                self._counters["misses"] += 1
+                value = await compute()
+                if value:
+                    await self._store_set(key, value, ttl)
+            if value:
+                self._l1_set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["l1_hits"] + self._counters["l2_hits"] + self._counters["misses"]
+        hits = self._counters["l1_hits"] + self._counters["l2_hits"]
+        return {
+            **self._counters,
+            "l1_entries": len(self._entries),
+            "l1_max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "store": type(self.store).__name__ if self.store is not None else None,
+        }
+
+    async def close(self) -> None:
+        if self.store is not None:
+            await self.store.close()
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def _create_store() -> Any:
+    backend = settings.LLM_CACHE_BACKEND.lower()
+    if backend == "redis" and settings.REDIS_URL:
+        try:
+            return RedisResponseStore(settings.REDIS_URL)
+        except ImportError:
+            logger.warning("redis package not installed, using SQLite LLM cache store")
+            backend = "sqlite"
+    if backend == "sqlite":
+        try:
+            return SQLiteResponseStore(settings.LLM_CACHE_PATH)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not open LLM cache file {settings.LLM_CACHE_PATH}: {e}")
+    return None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Return the process-wide LLM response cache, creating it on first use
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            ttl=settings.LLM_CACHE_TTL,
+            store=_create_store(),
+        )
+    return _llm_cache
+
+
+async def close_llm_cache() -> None:
+    """Close the cache's store (Redis pool or SQLite connection) at shutdown."""
+    global _llm_cache
+    cache, _llm_cache = _llm_cache, None
+    if cache is not None:
+        await cache.close()
@@ -0,0 +1,240 @@
+"""
+Versioned memory-mapped arrays with an append-only delta log
+
+Shared storage for the precomputed indexes (co-purchase matrix, visual
+search index):
+
+- A snapshot is a set of ``<name>-<version>.npy`` files plus ``manifest.json``
+  pointing at the current version; the files are opened with
+  ``mmap_mode="r"``, so every uvicorn worker shares one copy through the
+  page cache
+- ``delta.log`` holds one line per change recorded since the snapshot;
+  workers tail it on refresh and fold the entries into their in-memory view
+- Saving a new snapshot writes the arrays first and then atomically replaces
+  the manifest, so a reader sees either the old or the new version
+- ``rebuild.lock`` serializes saves across processes (exclusive ``flock``);
+  appends take it shared, so the delta log is never compacted while an
+  entry is being written to it
+
+``VersionedArrayStore`` subclasses define the arrays and the log line format;
+``MappedIndex`` subclasses define how a snapshot and delta entries are merged.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LogPosition = Tuple[int, Optional[int]]
+
+
+class VersionedArrayStore:
+    """
+    On-disk layout: ``<name>-<version>.npy`` per array in ``ARRAYS``,
+    ``manifest.json`` pointing at the current version, and ``delta.log`` with
+    entries recorded since that version (``format_entry`` / ``parse_entry``)
+    """
+
+    ARRAYS: Tuple[str, ...] = ()
+    MANIFEST = "manifest.json"
+    DELTA_LOG = "delta.log"
+    LOCK_FILE = "rebuild.lock"
+    LOG_NAME = "delta"  # for log messages
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        """Hold ``rebuild.lock`` (``fcntl.LOCK_EX`` or ``fcntl.LOCK_SH``); released on close."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(self.LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+    @staticmethod
+    def format_entry(*entry: Any) -> str:
+        raise NotImplementedError
+
+    @staticmethod
+    def parse_entry(line: str) -> Tuple:
+        """Parse one log line; raises ValueError when it is malformed."""
+        raise NotImplementedError
+
+    def manifest_stamp(self) -> Optional[Tuple[int, int]]:
+        """Changes whenever a new manifest is moved into place."""
+        try:
+            stat = os.stat(self._path(self.MANIFEST))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def load_arrays(self) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+        """Memory-mapped arrays of the current version and its manifest; None before the first save."""
+        try:
+            with open(self._path(self.MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        version = manifest["version"]
+        arrays = {name: np.load(self._path(f"{name}-{version}.npy"), mmap_mode="r") for name in self.ARRAYS}
+        return arrays, manifest
+
+    def save_arrays(
+        self,
+        arrays: Dict[str, np.ndarray],
+        delta_position: LogPosition = (0, None),
+        keep: Optional[Callable[[Tuple], bool]] = None,
+        **manifest: Any,
+    ) -> int:
+        """
+        Write a new version, atomically point the manifest at it and compact
+        the delta log: entries before ``delta_position`` (from
+        ``delta_position()`` when the snapshot was started) are dropped, and
+        of the rest only those ``keep`` accepts are kept
+        """
+        with self._locked(fcntl.LOCK_EX):
+            version = time.time_ns()
+            for name in self.ARRAYS:
+                np.save(self._path(f"{name}-{version}.npy"), np.ascontiguousarray(arrays[name]))
+            tmp = self._path(f"{self.MANIFEST}.{version}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": version, **manifest}, f)
+            os.replace(tmp, self._path(self.MANIFEST))
+            self._compact_delta(delta_position, keep)
+            self._remove_old_versions()
+        return version
+
+    def delta_position(self) -> LogPosition:
+        """Current end of the delta log, as ``(offset, inode)``."""
+        try:
+            stat = os.stat(self._path(self.DELTA_LOG))
+        except FileNotFoundError:
+            return 0, None
+        return stat.st_size, stat.st_ino
+
+    def _compact_delta(self, position: LogPosition, keep: Optional[Callable[[Tuple], bool]]) -> None:
+        # Called with the exclusive lock held, so no append lands between the
+        # read and the replace
+        offset, inode = position
+        path = self._path(self.DELTA_LOG)
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_ino != inode:
+                    # Another save compacted the log since ``position`` was
+                    # taken; which of its entries the snapshot has is unknown
+                    offset = 0
+                f.seek(offset)
+                remaining = f.read()
+        except FileNotFoundError:
+            return
+        if keep is not None:
+            lines = [
+                line + "\n" for line, entry in self._parse_lines(remaining.decode("utf-8")) if keep(entry)
+            ]
+            remaining = "".join(lines).encode("utf-8")
+        tmp = self._path(f"{self.DELTA_LOG}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(remaining)
+        os.replace(tmp, path)
+
+    def _remove_old_versions(self) -> None:
+        # Only versions older than the one the manifest points to. Workers may
+        # still have them mapped; POSIX keeps unlinked files alive until they
+        # are unmapped.
+        with open(self._path(self.MANIFEST), encoding="utf-8") as f:
+            current = json.load(f)["version"]
+        for filename in os.listdir(self.directory):
+            stem, ext = os.path.splitext(filename)
+            _, _, version = stem.rpartition("-")
+            if ext == ".npy" and version.isdigit() and int(version) < current:
+                try:
+                    os.remove(self._path(filename))
+                except OSError:
+                    pass
+
+    def append(self, *entry: Any) -> None:
+        # One short write in O_APPEND mode, so lines from several workers never interleave
+        with self._locked(fcntl.LOCK_SH), open(self._path(self.DELTA_LOG), "a", encoding="utf-8") as f:
+            f.write(self.format_entry(*entry))
+
+    def _parse_lines(self, text: str) -> List[Tuple[str, Tuple]]:
+        parsed = []
+        for line in text.splitlines():
+            try:
+                parsed.append((line, self.parse_entry(line)))
+            except ValueError:
+                logger.warning(f"Skipping malformed {self.LOG_NAME} delta line: {line!r}")
+        return parsed
+
+    def read_delta(self, offset: int, inode: Optional[int]) -> Tuple[List[Tuple], LogPosition]:
+        """
+        Read complete lines appended after ``offset``. Starts over when the
+        log was replaced (different inode) or truncated.
+        """
+        path = self._path(self.DELTA_LOG)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return [], (0, None)
+        if stat.st_ino != inode or stat.st_size < offset:
+            offset = 0
+        if stat.st_size == offset:
+            return [], (offset, stat.st_ino)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read(stat.st_size - offset)
+        complete = chunk[: chunk.rfind(b"\n") + 1]
+        entries = [entry for _, entry in self._parse_lines(complete.decode("utf-8"))]
+        return entries, (offset + len(complete), stat.st_ino)
+
+
+class MappedIndex:
+    """
+    A memory-mapped snapshot from a ``VersionedArrayStore`` plus the delta
+    entries recorded since it was written, refreshed at most once per
+    ``refresh_interval`` seconds
+
+    Subclasses implement ``_load_base`` (a new snapshot replaces the current
+    one and its delta) and ``_apply_delta`` (fold in newly read entries).
+    """
+
+    def __init__(self, store: VersionedArrayStore, refresh_interval: float = 1.0):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._manifest_stamp: Optional[Tuple[int, int]] = None
+        self._log_position: LogPosition = (0, None)
+        self._checked_at = 0.0
+
+    def _load_base(self, base: Any) -> None:
+        raise NotImplementedError
+
+    def _apply_delta(self, entries: Sequence[Tuple], base_changed: bool) -> None:
+        raise NotImplementedError
+
+    def refresh(self, force: bool = False) -> None:
+        """Pick up a rebuilt snapshot and entries recorded by other workers."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            stamp = self.store.manifest_stamp()
+            changed = stamp != self._manifest_stamp
+            if changed:
+                self._load_base(self.store.load())
+                self._manifest_stamp = stamp
+                self._log_position = (0, None)
+            entries, self._log_position = self.store.read_delta(*self._log_position)
+            self._apply_delta(entries, changed)
@@ -0,0 +1,15 @@
+"""
+Order change hooks
+One place for everything derived from orders that must be refreshed after an
+order is created, re-statused or deleted (call after the commit)
+"""
+from typing import Optional
+
+from .dashboard_stats import invalidate_dashboard_stats
+from .purchase_history import invalidate_user_history
+
+
+def orders_changed(user_id: Optional[int]) -> None:
+    """Drop cached data derived from ``user_id``'s orders and the global order stats."""
+    invalidate_user_history(user_id)
+    invalidate_dashboard_stats()
@@ -0,0 +1,59 @@
+"""
+Product detail cache
+Serialized product responses in a ``TieredCache`` shared by all workers;
+every admin edit or delete broadcasts an invalidation (``product_changed``)
+"""
+import logging
+from typing import Optional
+
+from app.config import settings
+from app.utils.cache_utils import get_redis_cache
+from .tiered_cache import RedisInvalidationBroker, TieredCache
+
+logger = logging.getLogger(__name__)
+
+_product_cache: Optional[TieredCache] = None
+
+
+def _create_product_cache() -> TieredCache:
+    l2 = get_redis_cache()
+    broker = RedisInvalidationBroker(l2.client) if l2 is not None else None
+    return TieredCache(
+        "product",
+        ttl=settings.PRODUCT_CACHE_TTL,
+        l1_ttl=settings.PRODUCT_CACHE_L1_TTL,
+        l1_max_entries=settings.PRODUCT_CACHE_MAX_ENTRIES,
+        l2=l2,
+        broker=broker,
+    )
+
+
+def get_product_cache() -> TieredCache:
+    """
+    Return the process-wide product cache, creating it on first use
+    """
+    global _product_cache
+    if _product_cache is None:
+        _product_cache = _create_product_cache()
+    return _product_cache
+
+
+async def init_product_cache() -> TieredCache:
+    """Create the cache and subscribe to invalidations (application lifespan, after Redis)."""
+    cache = get_product_cache()
+    await cache.start()
+    return cache
+
+
+async def close_product_cache() -> None:
+    global _product_cache
+    cache, _product_cache = _product_cache, None
+    if cache is not None:
+        await cache.close()
+        if isinstance(cache.broker, RedisInvalidationBroker):
+            await cache.broker.close()
+
+
+def product_changed(product_id: int) -> None:
+    """Drop ``product_id`` from every worker's cache (sync endpoints, after the commit)."""
+    get_product_cache().invalidate_from_thread(str(product_id))
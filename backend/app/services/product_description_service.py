@@ -1,3 +1,41 @@
+"""
+Product Description Service
+Generates product titles, descriptions, highlights and SEO metadata with DeepSeek
+"""
+import logging
+from typing import Any, Dict, List
+
+from openai import AsyncOpenAI
+
+from ..config import settings
+from .http_client import get_http_client
+
+
+class ProductDescriptionService:
+    """
+    Service for generating AI-written product content in several tones
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.model = settings.DEEPSEEK_MODEL
+        api_key = settings.DEEPSEEK_API_KEY
+        if not api_key:
+            # Every generator catches the resulting error and returns its default
+            self.client = None
+            self.logger.warning("DEEPSEEK_API_KEY not set, product descriptions use defaults")
+        else:
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=settings.DEEPSEEK_BASE_URL,
+                http_client=get_http_client(),
+            )
+
+        self.prompt_templates = {
+            "professional": {
+                "system_prompt": "You are a professional e-commerce copywriter. Write clear, accurate, and authoritative product descriptions that emphasize specifications, quality, and performance. Use a formal, trustworthy tone.",
+                "title_instruction": "Create a clear, SEO-friendly product title that includes the brand, model, and key specification.",
+                "short_description_instruction": "Write a precise 1-2 sentence summary highlighting the product's main features and value.",
                 "full_description_instruction": "Write a detailed, multi-paragraph description covering the product's features, technical specifications, benefits, and use cases. Structure it professionally with clear paragraphs.",
                 "highlights_instruction": "Create 3-5 key selling points focusing on technical advantages, professional features, and performance benefits."
             },
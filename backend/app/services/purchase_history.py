@@ -0,0 +1,161 @@
+"""
+Purchase History Repository
+Recent orders and purchased items per user, loaded with one joined query
+
+Used for the chat assistant's order context (``ProductSearch.get_user_orders``)
+and the purchase-history signals of RecommendationService and
+CartSuggestionService. Results are compact immutable tuples cached per user
+for a short TTL; the order endpoints invalidate a user's entries whenever
+one of their orders is created, cancelled, re-statused or deleted.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.order import Order, OrderItem
+from ..models.product import Product
+
+
+class PurchasedItem(NamedTuple):
+    order_id: int
+    product_id: int
+    title: str
+    category: Optional[str]
+    price: Optional[float]  # current catalog price
+    quantity: int
+    price_at_time: float
+
+
+class OrderSummary(NamedTuple):
+    id: int
+    status: Optional[str]
+    total: float
+    created_at: Optional[datetime]
+    items: Tuple[PurchasedItem, ...]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON-friendly form (NamedTuples would be encoded as arrays)."""
+        return {**self._asdict(), "items": [item._asdict() for item in self.items]}
+
+
+class _UserCache:
+    """Small LRU with TTL whose entries can be dropped per user"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[int, Hashable]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Tuple[int, Hashable], value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = _UserCache(settings.PURCHASE_HISTORY_CACHE_SIZE, settings.PURCHASE_HISTORY_CACHE_TTL)
+
+
+def invalidate_user_history(user_id: Optional[int]) -> None:
+    """Drop cached history for ``user_id`` (call after changing their orders)."""
+    if user_id is not None:
+        _cache.invalidate(user_id)
+
+
+class PurchaseHistoryRepository:
+    """
+    Read-side access to a user's orders without per-order/per-item queries
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recent_orders(self, user_id: int, limit: int = 3) -> List[OrderSummary]:
+        """The user's ``limit`` most recent orders with their items, newest first."""
+        key = (user_id, ("orders", limit))
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+
+        recent = (
+            select(Order.id)
+            .where(Order.user_id == user_id)
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .limit(limit)
+            .subquery()
+        )
+        rows = self.db.execute(
+            select(
+                Order.id, Order.status, Order.total, Order.created_at,
+                OrderItem.product_id, OrderItem.quantity, OrderItem.price_at_time,
+                Product.title, Product.category, Product.price,
+            )
+            .join(recent, recent.c.id == Order.id)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .order_by(Order.created_at.desc(), Order.id.desc(), OrderItem.id)
+        ).all()
+
+        grouped: Dict[int, Tuple[Tuple, List[PurchasedItem]]] = {}
+        for order_id, status, total, created_at, product_id, quantity, price_at_time, title, category, price in rows:
+            header, items = grouped.setdefault(order_id, ((order_id, status, total, created_at), []))
+            if product_id is not None:
+                items.append(PurchasedItem(
+                    order_id, product_id, title or "Unknown Product", category, price, quantity, price_at_time
+                ))
+        orders = [OrderSummary(*header, tuple(items)) for header, items in grouped.values()]
+
+        _cache.set(key, orders)
+        return orders
+
+    def recent_items(self, user_id: int, limit: int = 10) -> List[PurchasedItem]:
+        """Items from the user's most recent orders (products still in the catalog)."""
+        key = (user_id, ("items", limit))
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+
+        rows = self.db.execute(
+            select(
+                OrderItem.order_id, OrderItem.product_id, Product.title, Product.category,
+                Product.price, OrderItem.quantity, OrderItem.price_at_time,
+            )
+            .join(Order, Order.id == OrderItem.order_id)
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(Order.user_id == user_id)
+            .order_by(Order.created_at.desc(), Order.id.desc(), OrderItem.id)
+            .limit(limit)
+        ).all()
+        items = [PurchasedItem(*row) for row in rows]
+
+        _cache.set(key, items)
+        return items
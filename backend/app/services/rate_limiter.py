@@ -0,0 +1,242 @@
+"""
+Async token-bucket rate limiter for outbound AI API calls
+
+A limiter holds several buckets (per-minute and daily budgets) that are
+checked and debited atomically: a call either takes a token from every
+bucket or from none. Buckets live either in-process or in Redis, where a Lua
+script applies the same algorithm so the budget holds across all uvicorn
+workers and hosts.
+
+Callers ``await limiter.acquire()``; waiting happens with ``asyncio.sleep``
+in FIFO order, and a request that could not be admitted before its deadline
+fails fast with ``RateLimitExceeded`` instead of stalling the event loop.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted before its deadline"""
+
+
+class Bucket(NamedTuple):
+    name: str
+    capacity: int
+    period: float  # seconds to refill from empty to full
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+class LocalBucketStore:
+    """
+    In-process bucket state (per worker)
+    """
+
+    def __init__(self):
+        self._state: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+
+    async def take(self, prefix: str, buckets: List[Bucket], tokens: int) -> float:
+        """Take ``tokens`` from every bucket, or return seconds until that is possible."""
+        now = time.monotonic()
+        levels = []
+        wait = 0.0
+        for bucket in buckets:
+            level, updated_at = self._state.get(f"{prefix}:{bucket.name}", (bucket.capacity, now))
+            level = min(bucket.capacity, level + (now - updated_at) * bucket.rate)
+            levels.append(level)
+            if level < tokens:
+                wait = max(wait, (tokens - level) / bucket.rate)
+        if wait <= 0:
+            levels = [level - tokens for level in levels]
+        for bucket, level in zip(buckets, levels):
+            self._state[f"{prefix}:{bucket.name}"] = (level, now)
+        return wait
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBucketStore:
+    """
+    Bucket state shared through Redis. Uses the Redis server clock so
+    workers with skewed clocks still agree.
+    """
+
+    # KEYS: one per bucket. ARGV: tokens, then (capacity, rate per ms) per bucket.
+    # Returns 0 when admitted, else milliseconds until all buckets can admit.
+    SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+    local requested = tonumber(ARGV[1])
+    local levels = {}
+    local wait = 0
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[i * 2])
+        local rate = tonumber(ARGV[i * 2 + 1])
+        local state = redis.call('HMGET', key, 'tokens', 'ts')
+        local level = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        level = math.min(capacity, level + math.max(0, now - ts) * rate)
+        levels[i] = level
+        if level < requested then
+            wait = math.max(wait, math.ceil((requested - level) / rate))
+        end
+    end
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[i * 2])
+        local rate = tonumber(ARGV[i * 2 + 1])
+        local level = levels[i]
+        if wait == 0 then
+            level = level - requested
+        end
+        redis.call('HSET', key, 'tokens', tostring(level), 'ts', now)
+        redis.call('PEXPIRE', key, math.ceil(capacity / rate) + 1000)
+    end
+    return wait
+    """
+
+    def __init__(self, redis_client):
+        self._redis = redis_client
+
+    @classmethod
+    def from_url(cls, redis_url: str) -> "RedisBucketStore":
+        import redis.asyncio as redis  # optional dependency
+
+        return cls(redis.from_url(redis_url))
+
+    async def take(self, prefix: str, buckets: List[Bucket], tokens: int) -> float:
+        keys = [f"ratelimit:{prefix}:{bucket.name}" for bucket in buckets]
+        args: List[float] = [tokens]
+        for bucket in buckets:
+            args.extend([bucket.capacity, bucket.rate / 1000.0])
+        wait_ms = await self._redis.eval(self.SCRIPT, len(keys), *keys, *args)
+        return int(wait_ms) / 1000.0
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class RateLimiter:
+    """
+    Per-minute and daily token buckets with an awaitable, deadline-bounded acquire
+    """
+
+    def __init__(
+        self,
+        max_requests_per_minute: int = 30,
+        daily_limit: int = 1000,
+        name: str = "default",
+        store=None,
+        max_wait: float = 5.0,
+    ):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.daily_limit = daily_limit
+        self.name = name
+        self.max_wait = max_wait
+        self.buckets = [
+            Bucket("minute", max_requests_per_minute, 60.0),
+            Bucket("day", daily_limit, 86400.0),
+        ]
+        self.store = store or LocalBucketStore()
+        self._fallback_store = LocalBucketStore()
+        # asyncio.Lock binds to the loop it first waits on; keep one per loop
+        self._queues: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = WeakKeyDictionary()
+
+    async def _take(self, tokens: int) -> float:
+        try:
+            return await self.store.take(self.name, self.buckets, tokens)
+        except Exception as e:
+            if self.store is self._fallback_store:
+                raise
+            logger.warning(f"Shared rate limit store unavailable, using local buckets: {e}")
+            return await self._fallback_store.take(self.name, self.buckets, tokens)
+
+    async def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> None:
+        """
+        Wait (without blocking the event loop) until ``tokens`` can be taken
+        from every bucket. Waiters are served in FIFO order.
+
+        Raises:
+            RateLimitExceeded: if admission would take longer than ``timeout``
+                (defaults to ``max_wait``) seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.max_wait if timeout is None else timeout)
+
+        queue = self._queues.get(loop)
+        if queue is None:
+            queue = self._queues[loop] = asyncio.Lock()
+
+        if queue.locked():
+            try:
+                await asyncio.wait_for(queue.acquire(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                raise RateLimitExceeded(f"Rate limit queue for '{self.name}' did not clear in time")
+        else:
+            await queue.acquire()
+
+        try:
+            while True:
+                wait = await self._take(tokens)
+                if wait <= 0:
+                    return
+                remaining = deadline - loop.time()
+                if wait > remaining:
+                    raise RateLimitExceeded(
+                        f"Rate limit for '{self.name}' exceeded, next slot in {math.ceil(wait)}s"
+                    )
+                await asyncio.sleep(wait)
+        finally:
+            queue.release()
+
+
+_limiters: Dict[Tuple[str, int, int], RateLimiter] = {}
+
+
+def _create_store():
+    if settings.RATE_LIMIT_BACKEND.lower() == "redis" and settings.REDIS_URL:
+        try:
+            return RedisBucketStore.from_url(settings.REDIS_URL)
+        except ImportError:
+            logger.warning("redis package not installed, rate limits are per worker")
+    return None
+
+
+def get_rate_limiter(name: str, max_requests_per_minute: int, daily_limit: int) -> RateLimiter:
+    """
+    Return the process-wide limiter for ``name`` so every service instance
+    (and, with Redis, every worker) draws from the same budget
+    """
+    key = (name, max_requests_per_minute, daily_limit)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = RateLimiter(
+            max_requests_per_minute,
+            daily_limit,
+            name=name,
+            store=_create_store(),
+            max_wait=settings.RATE_LIMIT_MAX_WAIT,
+        )
+        _limiters[key] = limiter
+    return limiter
+
+
+async def close_rate_limiters() -> None:
+    """Close the limiters' stores (one Redis pool each with the Redis backend) at shutdown."""
+    limiters = list(_limiters.values())
+    _limiters.clear()
+    for limiter in limiters:
+        try:
+            await limiter.store.close()
+        except Exception as e:
+            logger.warning(f"Closing rate limit store for '{limiter.name}' failed: {e}")
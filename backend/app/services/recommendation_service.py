@@ -8,10 +8,13 @@ from openai import AsyncOpenAI
 import os
 import math
 from ..models.product import Product as ProductModel
-from ..models.order import Order, OrderItem
 from ..models.user import User
-from ..schemas.product import Product
+from ..schemas.product import ProductResponse as Product
 from ..config import settings
+from .copurchase_matrix import get_copurchase_index
+from .http_client import get_http_client
+from .purchase_history import PurchaseHistoryRepository, PurchasedItem
+from .similarity_engine import get_similarity_engine
 
 
 class RecommendationService:
@@ -31,7 +34,7 @@ class RecommendationService:
             self.client = None
         else:
             try:
-                self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+                self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=get_http_client())
             except Exception:
                 self.client = None
                 self.logger.warning("DEEPSEEK_API_KEY is set but client initialization failed")
@@ -149,16 +152,15 @@ class RecommendationService:
         Get products related to the main product based on category and features
         """
         try:
-            # Find products in the same category
-            related_products = self.db.query(ProductModel).filter(
-                and_(
-                    ProductModel.id != main_product.id,
-                    ProductModel.category == main_product.category,
-                    ProductModel.is_active == True
-                )
-            ).order_by(desc(ProductModel.rating)).limit(limit).all()
-            
-            return related_products
+            # Most similar products in the same category (tags, price band), best rated first on ties
+            engine = get_similarity_engine(self.db)
+            ranked = engine.top_k(main_product.id, limit, mask=engine.category_mask([main_product.category]))
+            ranked_ids = [product_id for product_id, _ in ranked]
+            if not ranked_ids:
+                return []
+            products = self.db.query(ProductModel).filter(ProductModel.id.in_(ranked_ids)).all()
+            position = {product_id: i for i, product_id in enumerate(ranked_ids)}
+            return sorted(products, key=lambda product: position[product.id])
         except Exception as e:
             self.logger.error(f"Error getting related products: {str(e)}", exc_info=True)
             return []
@@ -250,33 +252,15 @@ class RecommendationService:
             self.logger.error(f"Error getting downsell products: {str(e)}", exc_info=True)
             return []
     
-    def _get_user_purchase_history(self) -> List[Dict[str, Any]]:
+    def _get_user_purchase_history(self) -> List[PurchasedItem]:
         """
-        Get the user's purchase history
+        Get the user's purchase history (last 10 purchased items, one query, cached per user)
         """
         try:
             if not self.user_id:
                 return []
             
-            # Get user's recent orders and items
-            orders = self.db.query(OrderItem).join(Order).filter(
-                Order.user_id == self.user_id
-            ).order_by(desc(Order.created_at)).limit(10).all()
-            
-            history = []
-            for order_item in orders:
-                product = self.db.query(ProductModel).filter(
-                    ProductModel.id == order_item.product_id
-                ).first()
-                if product:
-                    history.append({
-                        "product_id": product.id,
-                        "title": product.title,
-                        "category": product.category,
-                        "price": product.price
-                    })
-            
-            return history
+            return PurchaseHistoryRepository(self.db).recent_items(self.user_id, limit=10)
         except Exception as e:
             self.logger.error(f"Error getting user history: {str(e)}", exc_info=True)
             return []
@@ -309,30 +293,9 @@ class RecommendationService:
     def _calculate_similarity_score(self, product1: ProductModel, product2: ProductModel) -> float:
         """
         Calculate similarity score between two products based on features
+        (category, shared tags, price band)
         """
-        score = 0.0
-        
-        # Category match
-        if product1.category == product2.category:
-            score += 0.3
-            
-        # Price similarity (if in same order of magnitude)
-        if product1.price > 0 and product2.price > 0:
-            price_ratio = min(product1.price, product2.price) / max(product1.price, product2.price)
-            if price_ratio > 0.7:  # More than 70% price similarity
-                score += 0.2
-            elif price_ratio > 0.5:  # More than 50% price similarity
-                score += 0.1
-                
-        # Tag similarity
-        if product1.tags and product2.tags:
-            tags1 = set(product1.tags.lower().split(','))
-            tags2 = set(product2.tags.lower().split(','))
-            common_tags = tags1.intersection(tags2)
-            if common_tags:
-                score += min(0.5, len(common_tags) * 0.1)
-        
-        return min(1.0, score)
+        return float(get_similarity_engine(self.db).similarity(product1.id, [product2.id])[0])
     
     def _score_recommendations(self, products: List[ProductModel], context: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
@@ -340,16 +303,12 @@ class RecommendationService:
         """
         scored_products = []
         main_product = context["main_product"]
+        candidate_ids = [product.id for product in products]
+        # Similarity (40% weight) and co-purchase (30% weight) for all candidates at once
+        similarity_scores = get_similarity_engine(self.db).similarity(main_product["id"], candidate_ids).tolist()
+        copurchase_scores = self._get_copurchase_scores(main_product["id"], candidate_ids)
         
-        for product in products:
-            # Calculate similarity score (40% weight)
-            similarity_score = self._calculate_similarity_score(
-                self._dict_to_product(main_product), product
-            )
-            
-            # Calculate co-purchase score (30% weight) - simplified implementation
-            copurchase_score = self._get_copurchase_score(main_product["id"], product.id)
-            
+        for product, similarity_score, copurchase_score in zip(products, similarity_scores, copurchase_scores):
             # Calculate user preference score (20% weight) - simplified implementation
             user_pref_score = self._get_user_preference_score(product, context["user_history"])
             
@@ -387,19 +346,26 @@ class RecommendationService:
         
         return scored_products
     
-    def _get_copurchase_score(self, main_product_id: int, candidate_product_id: int) -> float:
+    def _get_copurchase_scores(self, main_product_id: int, candidate_product_ids: List[int]) -> List[float]:
         """
-        Get score based on co-purchase behavior
+        Get scores based on co-purchase behavior: the share of orders containing
+        the main product that also contained each candidate
         """
         try:
-            # Simplified implementation - in a real system, you would have more sophisticated logic
-            # For now, we'll return a base score
-            return 0.5
+            index = get_copurchase_index()
+            index.ensure_built(self.db)
+            return index.scores(main_product_id, candidate_product_ids).tolist()
         except Exception as e:
-            self.logger.error(f"Error getting co-purchase score: {str(e)}", exc_info=True)
-            return 0.0
+            self.logger.error(f"Error getting co-purchase scores: {str(e)}", exc_info=True)
+            return [0.0] * len(candidate_product_ids)
+
+    def _get_copurchase_score(self, main_product_id: int, candidate_product_id: int) -> float:
+        """
+        Get score based on co-purchase behavior
+        """
+        return self._get_copurchase_scores(main_product_id, [candidate_product_id])[0]
     
-    def _get_user_preference_score(self, product: ProductModel, user_history: List[Dict[str, Any]]) -> float:
+    def _get_user_preference_score(self, product: ProductModel, user_history: List[PurchasedItem]) -> float:
         """
         Get score based on user's purchase history
         """
@@ -409,10 +375,10 @@ class RecommendationService:
             
             score = 0.0
             for item in user_history:
-                if item.get("category") == product.category:
+                if item.category == product.category:
                     score += 0.3
                 # Add more sophisticated matching logic here
-                if item.get("product_id") == product.id:
+                if item.product_id == product.id:
                     score += 0.5  # Don't recommend already purchased product highly
             
             return min(1.0, score)
@@ -512,13 +478,3 @@ class RecommendationService:
             "created_at": product.created_at.isoformat() if product.created_at else None,
             "updated_at": product.updated_at.isoformat() if product.updated_at else None
         }
-    
-    def _dict_to_product(self, product_dict: Dict[str, Any]) -> ProductModel:
-        """
-        Convert a dictionary representation back to a ProductModel-like object
-        This is a simplified implementation for similarity calculations
-        """
-        product = ProductModel()
-        for key, value in product_dict.items():
-            setattr(product, key, value)
-        return product
\ No newline at end of file
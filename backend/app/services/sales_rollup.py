@@ -0,0 +1,204 @@
+"""
+Daily Sales Rollup
+Incremental per-day order totals for the revenue charts and AI insights
+
+``daily_sales`` holds one row per day (order count, revenue, current status
+mix) and ``daily_category_sales`` the item revenue per category and day.
+The order endpoints apply each change as an atomic
+``INSERT ... ON CONFLICT DO UPDATE`` increment before committing the order
+itself, so the rollup never disagrees with ``orders``. Reports then read a
+handful of rows instead of grouping the whole order history by
+``date(created_at)``, which no index can serve.
+
+Days are UTC dates of ``Order.created_at``. Rebuild from ``orders`` with::
+
+    python -m app.services.sales_rollup [--since YYYY-MM-DD]
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..models.daily_sales import DailyCategorySales, DailySales
+from ..models.order import Order, OrderItem, OrderStatus
+from ..models.product import Product
+
+logger = logging.getLogger(__name__)
+
+STATUS_COLUMNS = {status.value: f"{status.value}_count" for status in OrderStatus}
+
+
+def sales_date(created_at: Optional[datetime]) -> date:
+    """The rollup day of an order created at ``created_at``."""
+    if created_at is None:
+        created_at = datetime.utcnow()
+    elif created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def _upsert(db: Session, model, key: Dict[str, Any], deltas: Dict[str, Any]) -> None:
+    """Add ``deltas`` to the row at ``key``, creating it if needed."""
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(table).values(**key, **deltas)
+        increments = {column: table.c[column] + statement.excluded[column] for column in deltas}
+        if "updated_at" in table.c:
+            increments["updated_at"] = func.now()
+        db.execute(statement.on_conflict_do_update(index_elements=list(key), set_=increments))
+        return
+
+    # Other databases: update, then insert if the row did not exist yet
+    condition = [table.c[column] == value for column, value in key.items()]
+    result = db.execute(
+        update(table).where(*condition).values({column: table.c[column] + value for column, value in deltas.items()})
+    )
+    if result.rowcount == 0:
+        db.execute(insert(table).values(**key, **deltas))
+
+
+def _category_totals(db: Session, items: Iterable[OrderItem]) -> Dict[str, Tuple[float, int]]:
+    items = list(items)
+    if not items:
+        return {}
+    categories = dict(db.execute(
+        select(Product.id, Product.category).where(Product.id.in_({item.product_id for item in items}))
+    ).all())
+    totals: Dict[str, List] = defaultdict(lambda: [0.0, 0])
+    for item in items:
+        bucket = totals[categories.get(item.product_id) or ""]
+        bucket[0] += (item.price_at_time or 0.0) * (item.quantity or 0)
+        bucket[1] += item.quantity or 0
+    return {category: (revenue, quantity) for category, (revenue, quantity) in totals.items()}
+
+
+def _apply_order(db: Session, order: Order, sign: int) -> None:
+    db.flush()  # assigns created_at (server default) and the items' order_id
+    day = sales_date(order.created_at)
+    deltas = {"order_count": sign, "revenue": sign * (order.total or 0.0)}
+    status_column = STATUS_COLUMNS.get(order.status)
+    if status_column:
+        deltas[status_column] = sign
+    _upsert(db, DailySales, {"date": day}, deltas)
+    for category, (revenue, quantity) in _category_totals(db, order.items).items():
+        _upsert(db, DailyCategorySales, {"date": day, "category": category},
+                {"revenue": sign * revenue, "quantity": sign * quantity})
+
+
+def record_order_created(db: Session, order: Order) -> None:
+    """Add a new order and its items to the rollup (call before committing it)."""
+    _apply_order(db, order, 1)
+
+
+def record_order_deleted(db: Session, order: Order) -> None:
+    """Remove an order and its items from the rollup (call before deleting it)."""
+    _apply_order(db, order, -1)
+
+
+def record_status_change(db: Session, order: Order, old_status: Optional[str]) -> None:
+    """Move an order between status counts (call before committing the change)."""
+    if old_status == order.status:
+        return
+    deltas = {}
+    if STATUS_COLUMNS.get(old_status):
+        deltas[STATUS_COLUMNS[old_status]] = -1
+    if STATUS_COLUMNS.get(order.status):
+        deltas[STATUS_COLUMNS[order.status]] = 1
+    if deltas:
+        _upsert(db, DailySales, {"date": sales_date(order.created_at)}, deltas)
+
+
+def backfill(db: Session, since: Optional[date] = None, batch_size: int = 10000) -> int:
+    """
+    Recompute the rollup from ``orders`` for every day from ``since`` on
+    (all days by default). Run it while orders are not being written, e.g.
+    during a deploy; the caller commits. Returns the number of days written.
+    """
+    start = datetime.combine(since, datetime.min.time()) if since else None
+
+    columns = ("order_count", "revenue", *STATUS_COLUMNS.values())
+    days: Dict[date, Dict[str, Any]] = defaultdict(lambda: dict.fromkeys(columns, 0))
+    orders = select(Order.created_at, Order.status, Order.total)
+    if start is not None:
+        orders = orders.where(Order.created_at >= start)
+    for created_at, status, total in db.execute(orders.execution_options(yield_per=batch_size)):
+        row = days[sales_date(created_at)]
+        row["order_count"] += 1
+        row["revenue"] += total or 0.0
+        if STATUS_COLUMNS.get(status):
+            row[STATUS_COLUMNS[status]] += 1
+
+    categories: Dict[Tuple[date, str], List] = defaultdict(lambda: [0.0, 0])
+    items = (
+        select(Order.created_at, Product.category, OrderItem.quantity, OrderItem.price_at_time)
+        .join(Order, Order.id == OrderItem.order_id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+    )
+    if start is not None:
+        items = items.where(Order.created_at >= start)
+    for created_at, category, quantity, price in db.execute(items.execution_options(yield_per=batch_size)):
+        bucket = categories[(sales_date(created_at), category or "")]
+        bucket[0] += (price or 0.0) * (quantity or 0)
+        bucket[1] += quantity or 0
+
+    for model in (DailySales, DailyCategorySales):
+        statement = delete(model)
+        if since is not None:
+            statement = statement.where(model.date >= since)
+        db.execute(statement)
+    if days:
+        db.execute(insert(DailySales), [{"date": day, **row} for day, row in days.items()])
+    if categories:
+        db.execute(insert(DailyCategorySales), [
+            {"date": day, "category": category, "revenue": revenue, "quantity": quantity}
+            for (day, category), (revenue, quantity) in categories.items()
+        ])
+    return len(days)
+
+
+def revenue_chart(db: Session, since: date) -> List[Dict[str, Any]]:
+    """Revenue and order count per day with orders, from ``since`` on."""
+    rows = db.execute(
+        select(DailySales.date, DailySales.revenue, DailySales.order_count)
+        .where(DailySales.date >= since, DailySales.order_count > 0)
+        .order_by(DailySales.date)
+    ).all()
+    return [
+        {"date": day.isoformat(), "revenue": float(revenue or 0.0), "orders": int(orders)}
+        for day, revenue, orders in rows
+    ]
+
+
+def period_totals(db: Session, start: date, end: date) -> Tuple[int, float]:
+    """``(order count, revenue)`` for the days in ``[start, end)``."""
+    orders, revenue = db.execute(
+        select(func.sum(DailySales.order_count), func.sum(DailySales.revenue))
+        .where(DailySales.date >= start, DailySales.date < end)
+    ).one()
+    return int(orders or 0), float(revenue or 0.0)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollup from orders")
+    parser.add_argument("--since", type=date.fromisoformat, help="only rebuild days from this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        written = backfill(session, args.since)
+        session.commit()
+        logger.info(f"Rebuilt daily sales rollup for {written} days")
+    finally:
+        session.close()
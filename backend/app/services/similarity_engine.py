@@ -0,0 +1,216 @@
+"""
+Item Similarity Engine
+Catalog feature matrix shared by RecommendationService and CartSuggestionService
+
+The catalog is loaded once into NumPy arrays (one row per product):
+
+- ``categories``: one-hot category
+- ``tags``: multi-hot tags
+- ``log_price`` and ``rating``
+
+Scoring every candidate against a product is then a couple of matrix-vector
+products instead of a Python loop that re-splits tag strings per pair, and
+top-k selection uses ``argpartition``. The engine is rebuilt when products are
+inserted, updated or deleted (in this worker via mapper events, in other
+workers via a cheap catalog fingerprint query).
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from ..models.product import Product
+
+logger = logging.getLogger(__name__)
+
+# Weights of the rule-based similarity (same scale as the original per-pair scoring)
+CATEGORY_WEIGHT = 0.3
+TAG_WEIGHT = 0.1
+MAX_TAG_SCORE = 0.5
+PRICE_BANDS = ((0.7, 0.2), (0.5, 0.1))  # (min price ratio, score), best first
+RATING_TIEBREAK = 1e-4
+
+
+def split_tags(tags: Optional[str]) -> List[str]:
+    return [tag for tag in (t.strip().lower() for t in (tags or "").split(",")) if tag]
+
+
+def normalize_category(category: Optional[str]) -> str:
+    return (category or "").strip().lower()
+
+
+class ItemSimilarityEngine:
+    """
+    Immutable feature matrix for one catalog snapshot
+    """
+
+    def __init__(self, rows: Sequence[Tuple], fingerprint: Tuple = ()):
+        """
+        Args:
+            rows: ``(id, category, tags, price, rating, is_active)`` tuples
+            fingerprint: catalog state the rows were read at
+        """
+        self.fingerprint = fingerprint
+        self.product_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._rows: Dict[int, int] = {int(pid): i for i, pid in enumerate(self.product_ids.tolist())}
+
+        category_names = [normalize_category(row[1]) for row in rows]
+        self.category_index: Dict[str, int] = {
+            name: i for i, name in enumerate(sorted({name for name in category_names if name}))
+        }
+        self.categories = np.zeros((len(rows), len(self.category_index)), dtype=np.float32)
+        for i, name in enumerate(category_names):
+            if name:
+                self.categories[i, self.category_index[name]] = 1.0
+
+        tag_lists = [split_tags(row[2]) for row in rows]
+        self.tag_index: Dict[str, int] = {
+            tag: i for i, tag in enumerate(sorted({tag for tags in tag_lists for tag in tags}))
+        }
+        self.tags = np.zeros((len(rows), len(self.tag_index)), dtype=np.float32)
+        for i, tags in enumerate(tag_lists):
+            for tag in tags:
+                self.tags[i, self.tag_index[tag]] = 1.0
+
+        prices = np.array([row[3] or 0.0 for row in rows], dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            self.log_price = np.where(prices > 0, np.log(np.maximum(prices, 1e-12)), np.nan)
+        self.rating = np.array([row[4] or 0.0 for row in rows], dtype=np.float64)
+        self.active = np.array([bool(row[5]) if row[5] is not None else True for row in rows])
+
+    @classmethod
+    def from_db(cls, db: Session, fingerprint: Tuple = ()) -> "ItemSimilarityEngine":
+        rows = db.query(
+            Product.id, Product.category, Product.tags, Product.price, Product.rating, Product.is_active
+        ).order_by(Product.id).all()
+        return cls(rows, fingerprint)
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def rows_for(self, product_ids: Iterable[int]) -> np.ndarray:
+        """Row numbers for ``product_ids`` (-1 for products not in the snapshot)."""
+        return np.fromiter((self._rows.get(pid, -1) for pid in product_ids), dtype=np.int64)
+
+    def category_vector(self, categories: Iterable[Optional[str]]) -> np.ndarray:
+        """Multi-hot (counted) category vector, e.g. for a cart or purchase history."""
+        vector = np.zeros(len(self.category_index), dtype=np.float32)
+        for category in categories:
+            index = self.category_index.get(normalize_category(category))
+            if index is not None:
+                vector[index] += 1.0
+        return vector
+
+    def _scores_for_rows(self, row: int, candidates: np.ndarray) -> np.ndarray:
+        category_score = CATEGORY_WEIGHT * (self.categories[candidates] @ self.categories[row])
+        tag_score = np.minimum(MAX_TAG_SCORE, TAG_WEIGHT * (self.tags[candidates] @ self.tags[row]))
+
+        price_score = np.zeros(len(candidates), dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            ratio = np.exp(-np.abs(self.log_price[candidates] - self.log_price[row]))
+        for min_ratio, score in reversed(PRICE_BANDS):
+            price_score[ratio > min_ratio] = score  # NaN (no price) never matches
+
+        return np.minimum(1.0, category_score + tag_score + price_score)
+
+    def similarity(self, product_id: int, candidate_ids: Sequence[int]) -> np.ndarray:
+        """
+        Similarity of ``product_id`` to each candidate, in the order given
+        (0.0 for products missing from the snapshot)
+        """
+        row = self._rows.get(product_id)
+        candidates = self.rows_for(candidate_ids)
+        scores = np.zeros(len(candidates), dtype=np.float64)
+        known = candidates >= 0
+        if row is None or not known.any():
+            return scores
+        scores[known] = self._scores_for_rows(row, candidates[known])
+        return scores
+
+    def top_k(
+        self,
+        product_id: int,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        The ``k`` active products most similar to ``product_id`` as
+        ``(product_id, score)``, best first; ties go to the higher rating.
+        ``mask`` optionally restricts the candidates (boolean, one per row).
+        """
+        row = self._rows.get(product_id)
+        if row is None or k <= 0:
+            return []
+        allowed = self.active.copy()
+        allowed[row] = False
+        if mask is not None:
+            allowed &= mask
+        candidates = np.flatnonzero(allowed)
+        if not len(candidates):
+            return []
+        scores = self._scores_for_rows(row, candidates)
+        # Scores move in steps of 0.1 and ratings are 0-5, so a tiny rating
+        # term breaks ties without reordering different scores
+        rank = scores + RATING_TIEBREAK * self.rating[candidates]
+        if len(candidates) > k:
+            best = np.argpartition(-rank, k - 1)[:k]
+            candidates, scores, rank = candidates[best], scores[best], rank[best]
+        order = np.argsort(-rank, kind="stable")
+        return [(int(self.product_ids[c]), float(s)) for c, s in zip(candidates[order], scores[order])]
+
+    def category_mask(self, categories: Iterable[Optional[str]]) -> np.ndarray:
+        """Boolean row mask of products in any of ``categories``."""
+        vector = self.category_vector(categories)
+        return (self.categories @ vector) > 0
+
+
+_engine: Optional[ItemSimilarityEngine] = None
+_engine_lock = threading.Lock()
+_engine_dirty = False
+_checked_at = 0.0
+
+# How often other workers' catalog edits are looked for (seconds)
+FINGERPRINT_INTERVAL = 5.0
+
+
+def _catalog_fingerprint(db: Session) -> Tuple:
+    count, max_id, max_updated = db.query(
+        func.count(Product.id), func.max(Product.id), func.max(Product.updated_at)
+    ).one()
+    return count, max_id, str(max_updated)
+
+
+def mark_catalog_changed(*_args) -> None:
+    """Force a rebuild on the next ``get_similarity_engine`` call."""
+    global _engine_dirty
+    _engine_dirty = True
+
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(Product, _event, mark_catalog_changed)
+
+
+def get_similarity_engine(db: Session) -> ItemSimilarityEngine:
+    """
+    Return the process-wide engine, rebuilding it when the catalog changed
+    """
+    global _engine, _engine_dirty, _checked_at
+    now = time.monotonic()
+    if _engine is not None and not _engine_dirty and now - _checked_at < FINGERPRINT_INTERVAL:
+        return _engine
+    with _engine_lock:
+        fingerprint = _catalog_fingerprint(db)
+        _checked_at = now
+        if _engine is None or _engine_dirty or fingerprint != _engine.fingerprint:
+            _engine_dirty = False
+            started = time.perf_counter()
+            _engine = ItemSimilarityEngine.from_db(db, fingerprint)
+            logger.info(
+                f"Built similarity engine for {len(_engine)} products in "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+        return _engine
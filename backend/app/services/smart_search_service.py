@@ -1,11 +1,13 @@
+import asyncio
 import re
 from typing import Dict, Any, Optional, List
 import logging
 from decimal import Decimal
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
 from app.models.product import Product as ProductModel
 from app.services.ai_service import AIService
+from app.utils.search_index import get_search_backend
+from app.utils.text_normalization import normalize_text
 
 
 class SmartSearchService:
@@ -18,7 +20,7 @@ class SmartSearchService:
         self.ai_service = AIService()  # New AI service using Groq
         self.logger = logging.getLogger(__name__)
 
-    def extract_filters_from_query(self, query: str) -> Dict[str, Any]:
+    async def extract_filters_from_query(self, query: str) -> Dict[str, Any]:
         """
         Extract filters from a natural language query using AI
 
@@ -30,7 +32,7 @@ class SmartSearchService:
         """
         # Use the AI service to extract filters from the query
         try:
-            filters = self.ai_service.extract_search_filters(query)
+            filters = await self.ai_service.extract_search_filters(query)
             self.logger.info(f"Extracted filters using AI: {filters}")
             return filters
         except Exception as e:
@@ -44,8 +46,8 @@ class SmartSearchService:
         """
         filters = {}
 
-        # Normalize the query
-        query_lower = query.lower()
+        # Normalize the query (Arabic/Persian letter variants, ZWNJ, digits, case)
+        query_lower = normalize_text(query)
 
         # Extract price filters (in Persian and English)
         # Look for patterns like "تا 20 میلیون", "زیر 15 میلیون", "under 10 million", etc.
@@ -62,13 +64,13 @@ class SmartSearchService:
                 if isinstance(match, tuple):
                     # Between pattern
                     if len(match) == 2:
-                        min_val = float(match[0]) * (1000000 if 'میلیون' in query or 'million' in query else 1000000000)
-                        max_val = float(match[1]) * (1000000 if 'میلیون' in query or 'million' in query else 1000000000)
+                        min_val = float(match[0]) * (1000000 if 'میلیون' in query_lower or 'million' in query_lower else 1000000000)
+                        max_val = float(match[1]) * (1000000 if 'میلیون' in query_lower or 'million' in query_lower else 1000000000)
                         filters['min_price'] = min_val
                         filters['max_price'] = max_val
                 else:
                     # Single value pattern (up to/under)
-                    value = float(match) * (1000000 if 'میلیون' in query or 'million' in query else 1000000000)
+                    value = float(match) * (1000000 if 'میلیون' in query_lower or 'million' in query_lower else 1000000000)
                     filters['max_price'] = value
 
         # Extract brand information
@@ -157,15 +159,8 @@ class SmartSearchService:
 
         # Apply brand filter
         if 'brand' in filters:
-            # Extracting brand from title or description
-            brand = filters['brand']
-            query = query.filter(
-                or_(
-                    ProductModel.title.contains(brand),
-                    ProductModel.description.contains(brand),
-                    ProductModel.tags.contains(brand)
-                )
-            )
+            # One full-text lookup over the normalized title/description/tags document
+            query = get_search_backend(self.db).filter(query, filters['brand'])
 
         # Apply category filter
         if 'category' in filters:
@@ -198,7 +193,7 @@ class SmartSearchService:
         """
         try:
             # Extract filters from the query using AI
-            filters = self.extract_filters_from_query(query)
+            filters = await self.extract_filters_from_query(query)
             self.logger.info(f"Filters extracted: {filters}")
 
             # Build the SQL query
@@ -227,20 +222,17 @@ class SmartSearchService:
                     "created_at": product.created_at.isoformat() if product.created_at else None,
                     "updated_at": product.updated_at.isoformat() if product.updated_at else None
                 }
-                
-                # Analyze relevance using AI
-                relevance_analysis = self.ai_service.analyze_product_relevance(
-                    query, product.title, product.description
-                )
-                product_dict["ai_relevance"] = relevance_analysis
-                
                 product_results.append(product_dict)
 
-            # Generate explanation using AI
-            explanation = self.ai_service.generate_search_explanation(query, filters, len(product_results))
-            
-            # Generate related searches
-            related_searches = self.ai_service.generate_related_searches(query)
+            # Score all candidates in one batched AI call, and generate the
+            # explanation and related searches concurrently with it
+            relevance_analyses, explanation, related_searches = await asyncio.gather(
+                self.ai_service.analyze_products_relevance(query, product_results),
+                self.ai_service.generate_search_explanation(query, filters, len(product_results)),
+                self.ai_service.generate_related_searches(query),
+            )
+            for product_dict, relevance_analysis in zip(product_results, relevance_analyses):
+                product_dict["ai_relevance"] = relevance_analysis
 
             return {
                 "results": product_results,
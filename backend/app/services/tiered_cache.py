@@ -0,0 +1,342 @@
+"""
+Two-tier cache shared by all API workers
+
+- L1: the worker's own ``InMemoryCache`` (bounded LRU, short TTL)
+- L2: the shared ``RedisCache`` (optional; without it L1 is the only tier)
+- Invalidation: ``invalidate()`` drops the key from L2 and publishes it on a
+  pub/sub channel; every worker subscribed to the channel drops its L1 copy
+  as soon as the message arrives, so L1 can keep a useful TTL instead of
+  a few seconds. The L1 TTL still bounds staleness if a message is lost
+  (e.g. while a worker's pub/sub connection is reconnecting).
+- Receivers delete the keys from L2 again: a worker whose load read the
+  old row before the invalidation may have written it back to L2 before
+  the message reached it.
+
+``LocalInvalidationBroker`` delivers messages in-process, so tests can run
+several "workers" (caches) against one broker without Redis.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.utils.cache_utils import _MISSING, InMemoryCache, RedisCache
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[bytes], None]
+
+
+class LocalInvalidationBroker:
+    """
+    In-process pub/sub: every handler subscribed to a channel receives every
+    message published on it
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers[channel].append(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        if handler in self._handlers.get(channel, ()):
+            self._handlers[channel].remove(handler)
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        for handler in list(self._handlers.get(channel, ())):
+            handler(message)
+
+    async def close(self) -> None:
+        self._handlers.clear()
+
+
+class RedisInvalidationBroker:
+    """
+    Redis pub/sub with one subscriber connection and one listener task per
+    worker; redis-py resubscribes by itself after a reconnect
+    """
+
+    def __init__(self, client, retry_delay: float = 1.0):
+        self._client = client
+        self.retry_delay = retry_delay
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        if self._pubsub is None:
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._handlers[channel].append(handler)
+        await self._pubsub.subscribe(channel)
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        handlers = self._handlers.get(channel, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers and self._pubsub is not None:
+            self._handlers.pop(channel, None)
+            await self._pubsub.unsubscribe(channel)
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self._client.publish(channel, message)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            for handler in list(self._handlers.get(channel, ())):
+                try:
+                    handler(message["data"])
+                except Exception as e:
+                    logger.warning(f"Cache invalidation handler failed on {channel}: {e}")
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self._handlers.clear()
+
+
+class TieredCache:
+    """
+    L1 (per worker) in front of L2 (shared) with broadcast invalidation
+
+    Keys are namespaced: ``TieredCache("product")`` stores ``42`` as
+    ``product:42`` in Redis and listens on ``cache:invalidate:product``.
+    None is never cached.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int = 300,
+        l1_ttl: int = 60,
+        l1_max_entries: int = 10_000,
+        l2: Optional[RedisCache] = None,
+        broker: Any = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.l1_ttl = l1_ttl
+        self.l1 = InMemoryCache(default_ttl=l1_ttl, max_entries=l1_max_entries)
+        self.l2 = l2
+        self.broker = broker
+        self.channel = f"cache:invalidate:{namespace}"
+        self.origin = uuid.uuid4().hex  # lets a worker skip its own messages
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribed = False
+        # Bumped by every invalidation so an in-flight load that started
+        # before it does not put the old value back into L1
+        self._generation = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending: set = set()  # L2 deletes and invalidations scheduled on the loop
+        self._counters = {
+            "l1_hits": 0, "l2_hits": 0, "misses": 0, "coalesced": 0,
+            "invalidations_sent": 0, "invalidations_received": 0, "l2_errors": 0,
+        }
+
+    def _l2_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def start(self) -> None:
+        """Subscribe to invalidations (call once, from the worker's event loop)."""
+        self._loop = asyncio.get_running_loop()
+        if self.broker is not None and not self._subscribed:
+            await self.broker.subscribe(self.channel, self._on_message)
+            self._subscribed = True
+
+    async def close(self) -> None:
+        if self.broker is not None and self._subscribed:
+            await self.broker.unsubscribe(self.channel, self._on_message)
+            self._subscribed = False
+        self._loop = None
+
+    def _on_message(self, message: bytes) -> None:
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            logger.warning(f"Ignoring malformed invalidation on {self.channel}")
+            return
+        if payload.get("origin") == self.origin:
+            return
+        keys = payload.get("keys", [])
+        self._drop_local(keys)
+        self._counters["invalidations_received"] += 1
+        if self.l2 is not None and keys:
+            # Brokers call handlers on the worker's loop
+            task = asyncio.get_running_loop().create_task(self._l2_delete(keys))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    def _drop_local(self, keys) -> None:
+        self._generation += 1
+        for key in keys:
+            self.l1.delete(key)
+
+    async def _l2_get(self, key: str) -> Any:
+        if self.l2 is None:
+            return None
+        try:
+            return await self.l2.get(self._l2_key(key))
+        except Exception as e:
+            self._counters["l2_errors"] += 1
+            logger.warning(f"L2 cache read failed for {key}: {e}")
+            return None
+
+    async def _l2_set(self, key: str, value: Any, ttl: int) -> None:
+        if self.l2 is None:
+            return
+        try:
+            await self.l2.set(self._l2_key(key), value, ttl)
+        except Exception as e:
+            self._counters["l2_errors"] += 1
+            logger.warning(f"L2 cache write failed for {key}: {e}")
+
+    async def _l2_delete(self, keys: List[str]) -> None:
+        if self.l2 is None:
+            return
+        try:
+            await self.l2.delete(*(self._l2_key(key) for key in keys))
+        except Exception as e:
+            self._counters["l2_errors"] += 1
+            logger.warning(f"L2 cache delete failed for {keys}: {e}")
+
+    async def get(self, key: str) -> Any:
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            self._counters["l1_hits"] += 1
+            return value
+        generation = self._generation
+        value = await self._l2_get(key)
+        if value is None:
+            self._counters["misses"] += 1
+            return None
+        self._counters["l2_hits"] += 1
+        if generation == self._generation:
+            self.l1.set(key, value, self.l1_ttl)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl or self.ttl
+        await self._l2_set(key, value, ttl)
+        self.l1.set(key, value, min(ttl, self.l1_ttl))
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: Optional[int] = None) -> Any:
+        """
+        Cached value for ``key``, calling ``compute`` at most once per key at
+        a time in this worker when neither tier has it
+        """
+        value = self.l1.get(key, _MISSING)
+        if value is not _MISSING:
+            self._counters["l1_hits"] += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        ttl = ttl or self.ttl
+        try:
+            value = await self._l2_get(key)
+            if value is not None:
+                self._counters["l2_hits"] += 1
+            else:
+                self._counters["misses"] += 1
+                value = await compute()
+                if value is not None and generation == self._generation:
+                    await self._l2_set(key, value, ttl)
+            if value is not None and generation == self._generation:
+                self.l1.set(key, value, min(ttl, self.l1_ttl))
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def invalidate(self, *keys: str) -> None:
+        """Drop ``keys`` here, in L2 and (via the broker) in every other worker."""
+        keys = [str(key) for key in keys]
+        if not keys:
+            return
+        self._drop_local(keys)
+        await self._l2_delete(keys)
+        if self.broker is not None:
+            message = json.dumps({"origin": self.origin, "keys": keys}).encode()
+            try:
+                await self.broker.publish(self.channel, message)
+                self._counters["invalidations_sent"] += 1
+            except Exception as e:
+                logger.warning(f"Cache invalidation publish failed on {self.channel}: {e}")
+
+    def invalidate_from_thread(self, *keys: str, timeout: float = 2.0) -> None:
+        """
+        ``invalidate`` for sync code (threadpool endpoints): the local copy is
+        dropped immediately, L2 and the broadcast run on the worker's loop and
+        are waited for, so the caller's response never races the invalidation
+        """
+        keys = [str(key) for key in keys]
+        self._drop_local(keys)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # not started: no L2 or peers to tell
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            task = loop.create_task(self.invalidate(*keys))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.invalidate(*keys), loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Cache invalidation of {keys} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["l1_hits"] + self._counters["l2_hits"] + self._counters["misses"]
+        l1_misses = lookups - self._counters["l1_hits"]
+        hits = self._counters["l1_hits"] + self._counters["l2_hits"]
+        return {
+            **self._counters,
+            "l1_hit_ratio": round(self._counters["l1_hits"] / lookups, 4) if lookups else 0.0,
+            "l2_hit_ratio": round(self._counters["l2_hits"] / l1_misses, 4) if l1_misses else 0.0,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "inflight": len(self._inflight),
+            "l1": self.l1.stats(),
+            "l2": type(self.l2).__name__ if self.l2 is not None else None,
+            "broker": type(self.broker).__name__ if self.broker is not None else None,
+        }
@@ -3,105 +3,540 @@ Cache service module for the e-commerce application
 Provides various caching strategies including in-memory and Redis caching
 """
 import asyncio
+import heapq
+import logging
+import math
+import random
+import sys
+import threading
 import time
-from typing import Any, Optional, Dict
+import weakref
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from typing import Any, Callable, Optional, Dict, Iterable, List, Sequence, Tuple
 from functools import wraps
-from datetime import datetime, timedelta
-import redis.asyncio as redis
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from uuid import UUID
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+_MISSING = object()
+
+
+def approximate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Rough memory footprint of a cached value in bytes: ``sys.getsizeof``
+    plus the items of (nested) lists, tuples, sets and dicts up to three
+    levels deep
+    """
+    size = sys.getsizeof(value)
+    if _depth >= 3:
+        return size
+    if isinstance(value, dict):
+        size += sum(approximate_size(k, _depth + 1) + approximate_size(v, _depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, _depth + 1) for item in value)
+    return size
+
+
+class _Shard:
+    """
+    One lock-protected LRU segment of an ``InMemoryCache``
+
+    Entries live in an OrderedDict (least recently used first); a min-heap
+    of ``(expires_at, seq, key)`` finds expired keys without a full scan.
+    Heap items for keys that were overwritten or removed are skipped when
+    popped and compacted away when they outnumber the live entries.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int]):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at, size, seq)
+        self.heap: List[Tuple[float, int, str]] = []
+        self.bytes = 0
+        self.seq = 0
+        self.counters = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0}
+
+    def remove(self, key: str) -> None:
+        """Drop ``key`` (caller holds the lock)."""
+        _, _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def expire(self, now: float, limit: Optional[int] = None) -> int:
+        """Drop entries whose expiry has passed (caller holds the lock)."""
+        removed = 0
+        heap = self.heap
+        while heap and heap[0][0] <= now and (limit is None or removed < limit):
+            _, seq, key = heapq.heappop(heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry[3] == seq:
+                self.remove(key)
+                self.counters["expirations"] += 1
+                removed += 1
+        if len(heap) > 2 * len(self.entries) + 64:
+            self.heap = [(entry[1], entry[3], key) for key, entry in self.entries.items()]
+            heapq.heapify(self.heap)
+        return removed
+
 
 # In-memory cache implementation
 class InMemoryCache:
-    def __init__(self, default_ttl: int = 300):  # 5 minutes default
-        self._cache: Dict[str, tuple] = {}  # key -> (value, expiry_time)
+    """
+    Bounded, thread-safe LRU cache with per-entry TTL
+
+    - Capacity: at most ``max_entries`` entries and, when set, about
+      ``max_bytes`` of values (see ``approximate_size``); the least recently
+      used entries are evicted first
+    - Expiry: lazily on access, a few expired entries on every ``set``, and
+      periodically by a shared background sweeper (``sweep_interval``)
+    - Concurrency: keys are spread over ``shards`` independently locked
+      segments, so thread-pool endpoints rarely contend; limits are split
+      evenly between shards
+    """
+
+    def __init__(
+        self,
+        default_ttl: int = 300,  # 5 minutes default
+        max_entries: int = 10_000,
+        max_bytes: Optional[int] = None,
+        shards: int = 8,
+        sweep_interval: Optional[float] = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        shards = max(1, min(shards, max_entries))
+        self._shards = [
+            _Shard(
+                max(1, -(-max_entries // shards)),
+                -(-max_bytes // shards) if max_bytes is not None else None,
+            )
+            for _ in range(shards)
+        ]
+        if sweep_interval:
+            _sweeper.register(self, sweep_interval)
 
-    def get(self, key: str) -> Optional[Any]:
-        if key in self._cache:
-            value, expiry = self._cache[key]
-            if time.time() < expiry:
-                return value
-            else:
-                # Remove expired item
-                del self._cache[key]
-        return None
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: str, default: Any = None) -> Optional[Any]:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                shard.counters["misses"] += 1
+                return default
+            if entry[1] <= self.clock():
+                shard.remove(key)
+                shard.counters["expirations"] += 1
+                shard.counters["misses"] += 1
+                return default
+            shard.entries.move_to_end(key)
+            shard.counters["hits"] += 1
+            return entry[0]
 
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         ttl = ttl or self.default_ttl
-        expiry = time.time() + ttl
-        self._cache[key] = (value, expiry)
+        size = approximate_size(value) if self.max_bytes is not None else 0
+        shard = self._shard(key)
+        with shard.lock:
+            now = self.clock()
+            shard.expire(now, limit=4)
+            if key in shard.entries:
+                shard.remove(key)
+            if shard.max_bytes is not None and size > shard.max_bytes:
+                return  # would evict the whole shard
+            shard.seq += 1
+            expires_at = now + ttl
+            shard.entries[key] = (value, expires_at, size, shard.seq)
+            shard.bytes += size
+            heapq.heappush(shard.heap, (expires_at, shard.seq, key))
+            shard.counters["sets"] += 1
+            while len(shard.entries) > shard.max_entries or (
+                shard.max_bytes is not None and shard.bytes > shard.max_bytes
+            ):
+                oldest = next(iter(shard.entries))
+                shard.remove(oldest)
+                shard.counters["evictions"] += 1
 
     def delete(self, key: str) -> bool:
-        if key in self._cache:
-            del self._cache[key]
-            return True
+        shard = self._shard(key)
+        with shard.lock:
+            if key in shard.entries:
+                shard.remove(key)
+                return True
         return False
 
     def clear(self) -> None:
-        self._cache.clear()
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.heap.clear()
+                shard.bytes = 0
 
     def cleanup_expired(self) -> int:
         """Remove expired entries and return count of removed items"""
-        current_time = time.time()
-        expired_keys = [
-            key for key, (_, expiry) in self._cache.items()
-            if current_time >= expiry
-        ]
-        
-        for key in expired_keys:
-            del self._cache[key]
-        
-        return len(expired_keys)
+        now = self.clock()
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                removed += shard.expire(now)
+        return removed
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def stats(self) -> Dict[str, Any]:
+        totals = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0}
+        entries = size = 0
+        for shard in self._shards:
+            with shard.lock:
+                for name, count in shard.counters.items():
+                    totals[name] += count
+                entries += len(shard.entries)
+                size += shard.bytes
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            **totals,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "bytes": size if self.max_bytes is not None else None,
+            "max_bytes": self.max_bytes,
+            "shards": len(self._shards),
+            "hit_ratio": round(totals["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+class _Sweeper:
+    """
+    One daemon thread that calls ``cleanup_expired`` on every live
+    ``InMemoryCache`` (held weakly) at the shortest requested interval
+    """
+
+    def __init__(self):
+        self._caches: "weakref.WeakKeyDictionary[InMemoryCache, float]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+
+    def register(self, cache: InMemoryCache, interval: float) -> None:
+        with self._lock:
+            self._caches[cache] = interval
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="cache-sweeper", daemon=True)
+                self._thread.start()
+            else:
+                self._wakeup.set()  # pick up a shorter interval
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                interval = min(self._caches.values(), default=60.0)
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            self._sweep()
+
+    def _sweep(self) -> None:
+        # No strong references outlive a sweep, so unused caches can be collected
+        with self._lock:
+            caches = list(self._caches.keys())
+        for cache in caches:
+            try:
+                cache.cleanup_expired()
+            except Exception as e:
+                logger.warning(f"Cache sweep failed: {e}")
+
+
+_sweeper = _Sweeper()
+
+class BinarySerializer:
+    """
+    Compact binary encoding for cached values: msgpack, zlib-compressed
+    above ``compress_threshold`` bytes, behind a one-byte format marker
+
+    Besides msgpack's native types it round-trips datetime, date, Decimal,
+    UUID and sets; tuples come back as lists and pydantic models as dicts.
+    """
+
+    RAW = b"m"
+    COMPRESSED = b"z"
+    _DATETIME, _DATE, _DECIMAL, _UUID, _SET = 1, 2, 3, 4, 5
+
+    def __init__(self, compress_threshold: int = 1024):
+        import msgpack  # optional dependency, only needed for Redis
+
+        self._msgpack = msgpack
+        self.compress_threshold = compress_threshold
+
+    def _default(self, value: Any) -> Any:
+        ext = self._msgpack.ExtType
+        if isinstance(value, datetime):
+            return ext(self._DATETIME, value.isoformat().encode())
+        if isinstance(value, date):
+            return ext(self._DATE, value.isoformat().encode())
+        if isinstance(value, Decimal):
+            return ext(self._DECIMAL, str(value).encode())
+        if isinstance(value, UUID):
+            return ext(self._UUID, value.bytes)
+        if isinstance(value, (set, frozenset)):
+            return ext(self._SET, self.dumps(list(value)))
+        if hasattr(value, "model_dump"):
+            return value.model_dump()
+        raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == self._DATETIME:
+            return datetime.fromisoformat(data.decode())
+        if code == self._DATE:
+            return date.fromisoformat(data.decode())
+        if code == self._DECIMAL:
+            return Decimal(data.decode())
+        if code == self._UUID:
+            return UUID(bytes=data)
+        if code == self._SET:
+            return set(self.loads(data))
+        return self._msgpack.ExtType(code, data)
+
+    def dumps(self, value: Any) -> bytes:
+        payload = self._msgpack.packb(value, default=self._default, use_bin_type=True)
+        if len(payload) >= self.compress_threshold:
+            return self.COMPRESSED + zlib.compress(payload, 1)
+        return self.RAW + payload
+
+    def loads(self, data: bytes) -> Any:
+        marker, payload = data[:1], data[1:]
+        if marker == self.COMPRESSED:
+            payload = zlib.decompress(payload)
+        elif marker != self.RAW:
+            raise ValueError("Unknown cache payload format")
+        return self._msgpack.unpackb(payload, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
 
 # Redis cache implementation
 class RedisCache:
-    def __init__(self, redis_url: str, default_ttl: int = 300):
+    """
+    Redis-backed cache over one pooled connection per worker
+
+    - Values go through ``BinarySerializer``; keys are namespaced by ``prefix``
+    - ``get_many``/``set_many`` use MGET and a non-transactional pipeline, so
+      a batch is one round trip
+    - Tags: ``set(..., tags=["product:42"])`` also adds the key to a tag set,
+      and ``invalidate_tags("product:42")`` removes every tagged key at once
+    - ``clear_pattern`` walks the keyspace with SCAN and UNLINKs in batches
+      instead of blocking Redis with KEYS
+    """
+
+    TAG_PREFIX = "tag:"
+
+    def __init__(
+        self,
+        redis_url: str = "",
+        default_ttl: int = 300,
+        prefix: str = "cache:",
+        client=None,
+        serializer: Optional[BinarySerializer] = None,
+        max_connections: int = 50,
+    ):
         self.redis_url = redis_url
         self.default_ttl = default_ttl
-        self._redis = None
+        self.prefix = prefix
+        self.max_connections = max_connections
+        self.serializer = serializer or BinarySerializer()
+        self._redis = client
 
     async def connect(self):
-        self._redis = await redis.from_url(self.redis_url)
-    
+        if self._redis is None:
+            import redis.asyncio as redis  # optional dependency
+
+            self._redis = redis.from_url(self.redis_url, max_connections=self.max_connections)
+
     async def close(self):
         if self._redis:
             await self._redis.aclose()
+            self._redis = None
+
+    @property
+    def client(self):
+        """The underlying redis client (pub/sub, ad-hoc commands)"""
+        return self._redis
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def _tag_key(self, tag: str) -> str:
+        return self.prefix + self.TAG_PREFIX + tag
 
     async def get(self, key: str) -> Optional[Any]:
         if not self._redis:
             return None
-        
-        value = await self._redis.get(key)
-        if value is not None:
-            return value.decode('utf-8')
-        return None
+        value = await self._redis.get(self._key(key))
+        return self.serializer.loads(value) if value is not None else None
+
+    async def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Values of the keys that are cached, in one MGET."""
+        if not self._redis or not keys:
+            return {}
+        values = await self._redis.mget([self._key(key) for key in keys])
+        return {key: self.serializer.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def _queue_set(self, pipe, key: str, value: Any, ttl: int, tags: Iterable[str]) -> None:
+        pipe.set(self._key(key), self.serializer.dumps(value), ex=ttl)
+        for tag in tags:
+            tag_key = self._tag_key(tag)
+            pipe.sadd(tag_key, key)
+            # A tag set lives as long as its longest-lived key
+            pipe.expire(tag_key, ttl, nx=True)
+            pipe.expire(tag_key, ttl, gt=True)
 
-    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
         if not self._redis:
             return
-        
         ttl = ttl or self.default_ttl
-        await self._redis.setex(key, ttl, value)
+        tags = list(tags)
+        if not tags:
+            await self._redis.set(self._key(key), self.serializer.dumps(value), ex=ttl)
+            return
+        async with self._redis.pipeline(transaction=False) as pipe:
+            self._queue_set(pipe, key, value, ttl, tags)
+            await pipe.execute()
 
-    async def delete(self, key: str) -> bool:
-        if not self._redis:
-            return False
-        
-        result = await self._redis.delete(key)
-        return result > 0
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None, tags: Iterable[str] = ()) -> None:
+        """Store several values in one pipelined round trip."""
+        if not self._redis or not items:
+            return
+        ttl = ttl or self.default_ttl
+        tags = list(tags)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                self._queue_set(pipe, key, value, ttl, tags)
+            await pipe.execute()
+
+    async def delete(self, *keys: str) -> int:
+        if not self._redis or not keys:
+            return 0
+        return await self._redis.unlink(*(self._key(key) for key in keys))
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Remove every key carrying any of ``tags``; returns keys removed."""
+        if not self._redis or not tags:
+            return 0
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            members = await pipe.execute()
+        keys = {self._key(m.decode() if isinstance(m, bytes) else m) for group in members for m in group}
+        removed = await self._redis.unlink(*keys) if keys else 0
+        await self._redis.unlink(*tag_keys)
+        return removed
 
-    async def clear_pattern(self, pattern: str) -> int:
+    async def clear_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """Remove keys matching ``pattern`` (within the prefix) without KEYS."""
         if not self._redis:
             return 0
-        
-        keys = await self._redis.keys(pattern)
-        if keys:
-            result = await self._redis.delete(*keys)
-            return result
-        return 0
+        removed = 0
+        batch = []
+        async for key in self._redis.scan_iter(match=self._key(pattern), count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                removed += await self._redis.unlink(*batch)
+                batch = []
+        if batch:
+            removed += await self._redis.unlink(*batch)
+        return removed
+
+
+_redis_cache: Optional[RedisCache] = None
+
+
+async def init_redis_cache(redis_url: Optional[str] = None) -> Optional[RedisCache]:
+    """
+    Open the process-wide Redis cache (called from the application lifespan
+    when ``REDIS_URL`` is set)
+    """
+    global _redis_cache
+    redis_url = redis_url if redis_url is not None else settings.REDIS_URL
+    if _redis_cache is None and redis_url:
+        cache = RedisCache(redis_url)
+        await cache.connect()
+        _redis_cache = cache
+    return _redis_cache
+
+
+def get_redis_cache() -> Optional[RedisCache]:
+    return _redis_cache
+
+
+def set_redis_cache(cache: Optional[RedisCache]) -> None:
+    """Install a Redis cache built elsewhere (tests, scripts)."""
+    global _redis_cache
+    _redis_cache = cache
+
+
+async def close_redis_cache() -> None:
+    global _redis_cache
+    cache, _redis_cache = _redis_cache, None
+    if cache is not None:
+        await cache.close()
+
+
+class _KeyLocks:
+    """One lock per key while anybody holds or waits for it"""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[str, list] = {}  # key -> [lock, users]
+
+    @contextmanager
+    def hold(self, key: str):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_lock = threading.Lock()
+
+
+def _background_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    with _refresh_executor_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+        return _refresh_executor
 
 
 # Cache decorator factory
-def cached(ttl: int = 300, cache_key_func=None, cache_type: str = "memory"):
+def cached(
+    ttl: int = 300,
+    cache_key_func=None,
+    cache_type: str = "memory",
+    max_entries: int = 1024,
+    max_bytes: Optional[int] = None,
+    shards: int = 8,
+    stale_ttl: int = 0,
+    early_refresh_beta: float = 1.0,
+    tags=None,
+):
     """
     Cache decorator that caches function results
     
@@ -109,68 +544,192 @@ def cached(ttl: int = 300, cache_key_func=None, cache_type: str = "memory"):
         ttl: Time to live in seconds
         cache_key_func: Function to generate cache key from function arguments
         cache_type: Type of cache to use ("memory" or "redis")
+        max_entries: Most results kept; least recently used are evicted
+        max_bytes: Approximate memory budget for cached results (None: unbounded)
+        shards: Independently locked segments of the cache
+        stale_ttl: Seconds after ``ttl`` during which the old value is still
+            served while one background call refreshes it
+        early_refresh_beta: Probabilistic early refresh ("XFetch"): a hit may
+            trigger a background refresh shortly before expiry, more likely
+            the closer to expiry and the slower the function; 0 disables
+        tags: Redis only; tag list or ``callable(*args, **kwargs)`` returning
+            one, for ``RedisCache.invalidate_tags``
+    
+    Concurrent misses for one key run the function once (single flight: a
+    shared task for async functions, a per-key lock for sync ones); the
+    others wait for its result. ``cache_type="redis"`` needs an async
+    function and uses the pooled cache opened by ``init_redis_cache``,
+    computing uncached when Redis is not configured.
+    
+    The in-memory cache is exposed as ``wrapper.cache`` (None for Redis);
+    ``wrapper.invalidate(*args, **kwargs)`` drops one entry (a coroutine
+    for async functions).
     """
     def decorator(func):
-        # Create appropriate cache based on type
-        if cache_type == "memory":
-            cache = InMemoryCache(default_ttl=ttl)
-        else:
-            # Placeholder for Redis - in real implementation you'd configure the URL
-            cache = InMemoryCache(default_ttl=ttl)  # Fallback for now
+        is_async = asyncio.iscoroutinefunction(func)
+        use_redis = cache_type == "redis"
+        if use_redis and not is_async:
+            raise ValueError(f"cache_type='redis' needs an async function, {func.__name__} is sync")
+        memory = None if use_redis else InMemoryCache(
+            default_ttl=ttl + stale_ttl, max_entries=max_entries, max_bytes=max_bytes, shards=shards
+        )
+        hard_ttl = ttl + stale_ttl
+        inflight: Dict[str, asyncio.Task] = {}
+        refreshing: set = set()
+        refreshing_lock = threading.Lock()
+        key_locks = _KeyLocks()
 
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            # Generate cache key
+        def make_key(args, kwargs) -> str:
             if cache_key_func:
-                key = cache_key_func(*args, **kwargs)
-            else:
-                # Default key generation
-                key_parts = [func.__name__]
-                if args:
-                    key_parts.extend(str(arg) for arg in args)
-                if kwargs:
-                    key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
-                key = ":".join(key_parts)
+                return cache_key_func(*args, **kwargs)
+            # Default key generation
+            key_parts = [func.__name__]
+            if args:
+                key_parts.extend(str(arg) for arg in args)
+            if kwargs:
+                key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
+            return ":".join(key_parts)
 
-            # Try to get from cache
-            cached_result = cache.get(key)
-            if cached_result is not None:
-                return cached_result
+        def entry_tags(args, kwargs) -> List[str]:
+            if tags is None:
+                return []
+            return list(tags(*args, **kwargs) if callable(tags) else tags)
 
-            # Call function and cache result
+        def needs_refresh(entry, now: float) -> bool:
+            """True when a served entry should be refreshed in the background."""
+            _, fresh_until, delta = entry
+            if now >= fresh_until:
+                return True
+            if early_refresh_beta <= 0 or delta <= 0:
+                return False
+            return now - delta * early_refresh_beta * math.log(random.random() or 1e-12) >= fresh_until
+
+        def usable(entry, now: float) -> bool:
+            return entry is not None and now < entry[1] + stale_ttl
+
+        # -- async ---------------------------------------------------------
+
+        async def aget(key: str):
+            if memory is not None:
+                return memory.get(key)
+            redis_cache = get_redis_cache()
+            if redis_cache is None:
+                return None
+            try:
+                entry = await redis_cache.get(key)
+            except Exception as e:
+                logger.warning(f"Redis cache read failed for {key}: {e}")
+                return None
+            return tuple(entry) if entry is not None else None
+
+        async def aset(key: str, entry, args, kwargs) -> None:
+            if memory is not None:
+                memory.set(key, entry, hard_ttl)
+                return
+            redis_cache = get_redis_cache()
+            if redis_cache is None:
+                return
+            try:
+                await redis_cache.set(key, list(entry), hard_ttl, tags=entry_tags(args, kwargs))
+            except Exception as e:
+                logger.warning(f"Redis cache write failed for {key}: {e}")
+
+        async def compute(key: str, args, kwargs):
+            started = time.perf_counter()
             result = await func(*args, **kwargs)
-            cache.set(key, result, ttl)
+            delta = time.perf_counter() - started
+            await aset(key, (result, time.time() + ttl, delta), args, kwargs)
             return result
 
+        def flight(key: str, args, kwargs) -> asyncio.Task:
+            task = inflight.get(key)
+            if task is None or task.get_loop() is not asyncio.get_running_loop():
+                task = asyncio.ensure_future(compute(key, args, kwargs))
+                inflight[key] = task
+
+                def done(finished, key=key):
+                    if inflight.get(key) is finished:
+                        del inflight[key]
+                    if not finished.cancelled() and finished.exception() is not None:
+                        logger.warning(f"Cache refresh of {key} failed: {finished.exception()}")
+
+                task.add_done_callback(done)
+            return task
+
         @wraps(func)
-        def sync_wrapper(*args, **kwargs):
-            # Generate cache key
-            if cache_key_func:
-                key = cache_key_func(*args, **kwargs)
-            else:
-                # Default key generation
-                key_parts = [func.__name__]
-                if args:
-                    key_parts.extend(str(arg) for arg in args)
-                if kwargs:
-                    key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
-                key = ":".join(key_parts)
+        async def async_wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
 
             # Try to get from cache
-            cached_result = cache.get(key)
-            if cached_result is not None:
-                return cached_result
+            entry = await aget(key)
+            now = time.time()
+            if usable(entry, now):
+                if needs_refresh(entry, now):
+                    flight(key, args, kwargs)  # refresh in the background, serve what we have
+                return entry[0]
+
+            # Miss: one call per key, everybody else awaits its result
+            return await asyncio.shield(flight(key, args, kwargs))
 
-            # Call function and cache result
+        async def async_invalidate(*args, **kwargs) -> None:
+            key = make_key(args, kwargs)
+            if memory is not None:
+                memory.delete(key)
+            elif get_redis_cache() is not None:
+                await get_redis_cache().delete(key)
+
+        # -- sync ----------------------------------------------------------
+
+        def compute_sync(key: str, args, kwargs):
+            started = time.perf_counter()
             result = func(*args, **kwargs)
-            cache.set(key, result, ttl)
+            memory.set(key, (result, time.time() + ttl, time.perf_counter() - started), hard_ttl)
             return result
 
+        def refresh_sync(key: str, args, kwargs) -> None:
+            try:
+                with key_locks.hold(key):
+                    compute_sync(key, args, kwargs)
+            except Exception as e:
+                logger.warning(f"Cache refresh of {key} failed: {e}")
+            finally:
+                with refreshing_lock:
+                    refreshing.discard(key)
+
+        def refresh_in_background(key: str, args, kwargs) -> None:
+            with refreshing_lock:
+                if key in refreshing:
+                    return
+                refreshing.add(key)
+            _background_executor().submit(refresh_sync, key, args, kwargs)
+
+        @wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+
+            # Try to get from cache
+            entry = memory.get(key)
+            now = time.time()
+            if usable(entry, now):
+                if needs_refresh(entry, now):
+                    refresh_in_background(key, args, kwargs)
+                return entry[0]
+
+            # Miss: the first caller computes, the others wait on the key lock
+            with key_locks.hold(key):
+                entry = memory.get(key)
+                if entry is not None and time.time() < entry[1]:
+                    return entry[0]
+                return compute_sync(key, args, kwargs)
+
+        def sync_invalidate(*args, **kwargs) -> None:
+            memory.delete(make_key(args, kwargs))
+
         # Return appropriate wrapper based on function type
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        wrapper = async_wrapper if is_async else sync_wrapper
+        wrapper.cache = memory
+        wrapper.invalidate = async_invalidate if is_async else sync_invalidate
+        return wrapper
 
     return decorator
 
@@ -190,4 +749,60 @@ def check_etag_match(etag: str, request_headers: Dict[str, str]) -> bool:
     if_none_match = request_headers.get('if-none-match')
     if if_none_match and etag == if_none_match:
         return True
-    return False
\ No newline at end of file
+    return False
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an ``If-None-Match`` header value (lists, ``*``)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _opaque_tag(etag)
+    return any(_opaque_tag(candidate) == opaque for candidate in if_none_match.split(","))
+
+
+def version_etag(*parts: Any) -> str:
+    """Weak ETag built from identifiers and version numbers, not from the body"""
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; all timestamps here are UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    """ETag/Last-Modified headers; ``no-cache`` makes clients revalidate instead of guessing freshness"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_conditional(request_headers) -> bool:
+    return "if-none-match" in request_headers or "if-modified-since" in request_headers
+
+
+def is_not_modified(request_headers, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Evaluate If-None-Match (weak comparison, lists, ``*``) or, only when it
+    is absent, If-Modified-Since (RFC 9110, 13.2.2)
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return _as_utc(last_modified).replace(microsecond=0) <= since
@@ -0,0 +1,77 @@
+"""
+Perceptual fingerprints for visual product search
+
+- ``phash``: sign of the low-frequency 8x8 block of a 32x32 DCT (robust to
+  scaling, compression and small colour shifts)
+- ``dhash``: horizontal gradient signs of a 9x8 thumbnail (cheap, robust to
+  brightness changes)
+- ``histogram``: 4x4x4 RGB histogram scaled to sum to 255, so it fits in
+  64 bytes and the intersection of two histograms is a 0-255 integer
+
+Pure Pillow + NumPy, no network and no SciPy (the DCT is a matrix product).
+"""
+import io
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8  # 8x8 = 64-bit hashes
+PHASH_SIZE = 32
+HISTOGRAM_BINS = 4  # per channel
+HISTOGRAM_SCALE = 255
+
+
+class Fingerprint(NamedTuple):
+    phash: int
+    dhash: int
+    histogram: np.ndarray  # uint8[HISTOGRAM_BINS ** 3]
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(bool).ravel()).tobytes(), "big")
+
+
+def phash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(low > np.median(low))
+
+
+def dhash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def color_histogram(rgb: Image.Image) -> np.ndarray:
+    pixels = np.asarray(rgb.resize((64, 64), Image.BILINEAR), dtype=np.uint8).reshape(-1, 3)
+    bins = (pixels // (256 // HISTOGRAM_BINS)).astype(np.int64)
+    index = (bins[:, 0] * HISTOGRAM_BINS + bins[:, 1]) * HISTOGRAM_BINS + bins[:, 2]
+    counts = np.bincount(index, minlength=HISTOGRAM_BINS ** 3)
+    return np.round(counts * HISTOGRAM_SCALE / counts.sum()).astype(np.uint8)
+
+
+def fingerprint(image_bytes: bytes) -> Fingerprint:
+    """Fingerprint an encoded image; raises ``PIL.UnidentifiedImageError`` for non-images."""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("RGB", (2 * PHASH_SIZE, 2 * PHASH_SIZE))  # JPEGs decode at 1/8 scale when large
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P", "PA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    rgb = image.convert("RGB")
+    gray = rgb.convert("L")
+    return Fingerprint(phash(gray), dhash(gray), color_histogram(rgb))
@@ -0,0 +1,146 @@
+"""
+Image resizing and re-encoding for the image proxy and uploads
+
+Kept free of app imports so process-pool workers only load Pillow.
+"""
+import io
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+SUPPORTED_FORMATS = ("JPEG", "PNG", "WEBP")
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Decode JPEGs at no less than this multiple of the target size before the
+# final LANCZOS pass (the same trade-off as Pillow's thumbnail reducing_gap)
+DRAFT_REDUCING_GAP = 2.0
+
+
+def target_size(original: Tuple[int, int], width: Optional[int], height: Optional[int]) -> Tuple[int, int]:
+    """Output size for the requested width/height, keeping the aspect ratio if only one is given."""
+    original_width, original_height = original
+    if width and height:
+        return width, height
+    if width:
+        return width, max(1, int((width / original_width) * original_height))
+    return max(1, int((height / original_height) * original_width)), height
+
+
+def process_image(image_bytes: bytes, width: Optional[int], height: Optional[int],
+                  quality: int, target_format: Optional[str]) -> Tuple[bytes, str]:
+    """
+    Process an image: resize, change format, adjust quality
+
+    CPU-bound; the API runs it in the image process pool
+    (``app.services.image_pool``). Returns ``(bytes, format)``.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    source_format = image.format
+
+    size = target_size(image.size, width, height) if (width or height) else None
+    if size and source_format == "JPEG" and size[0] < image.size[0] and size[1] < image.size[1]:
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full size
+        image.draft(None, (int(size[0] * DRAFT_REDUCING_GAP), int(size[1] * DRAFT_REDUCING_GAP)))
+
+    # Convert RGBA to RGB if needed for JPEG
+    if image.mode in ("RGBA", "LA") and target_format in ("jpeg", "jpg"):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+
+    if size:
+        image = image.resize(size, Image.LANCZOS)
+
+    # Determine output format
+    output_format = (target_format or source_format or "JPEG").upper()
+    if output_format == "JPG":
+        output_format = "JPEG"
+    if output_format not in SUPPORTED_FORMATS:
+        output_format = "JPEG"  # Default to JPEG if format is not supported
+    if output_format == "JPEG" and image.mode not in ("RGB", "L", "CMYK"):
+        image = image.convert("RGB")
+
+    # Save to bytes with specified format and quality
+    output_bytes = io.BytesIO()
+    if output_format == "JPEG":
+        image.save(output_bytes, format="JPEG", quality=quality, optimize=True)
+    elif output_format == "PNG":
+        image.save(output_bytes, format="PNG", optimize=True)
+    else:
+        image.save(output_bytes, format="WEBP", quality=quality, method=4, optimize=True)
+
+    return output_bytes.getvalue(), output_format.lower()
+
+
+def _encode(image: Image.Image, output_format: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    if output_format == "JPEG":
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.mode or image.mode == "P" else "RGB")
+        image.save(out, format=output_format, quality=quality, method=4)
+    return out.getvalue()
+
+
+def generate_variants(image_bytes: bytes, widths: Iterable[int], formats: Iterable[str],
+                      quality: int, placeholder_width: int) -> Dict[str, Any]:
+    """
+    Decode an upload once and encode every responsive variant from it
+
+    Widths above the source are dropped (no upscaling); the source width is
+    added when it is below the largest configured width. Returns
+    ``{"format", "width", "height", "variants": [{"width", "height", "format",
+    "data"}], "placeholder"}`` where the placeholder is a tiny JPEG (LQIP).
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    source_format = (image.format or "").lower()
+    width, height = image.size
+    if image.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    widths = sorted(set(widths))
+    targets = [w for w in widths if w < width]
+    if not widths or width <= widths[-1]:
+        targets.append(width)
+
+    if image.format == "JPEG" and targets[-1] < width:
+        # Square box: the decoded size is right whichever way the photo is rotated
+        side = int(targets[-1] * DRAFT_REDUCING_GAP)
+        image.draft(None, (side, side))
+    image = ImageOps.exif_transpose(image)
+
+    variants = []
+    for target in targets:
+        size = (target, max(1, round(target * height / width)))
+        resized = image if size == image.size else image.resize(size, Image.LANCZOS)
+        for output_format in formats:
+            output_format = output_format.upper()
+            if output_format == "JPG":
+                output_format = "JPEG"
+            variants.append({
+                "width": size[0],
+                "height": size[1],
+                "format": output_format.lower(),
+                "data": _encode(resized, output_format, quality),
+            })
+
+    placeholder_width = min(placeholder_width, width)
+    placeholder_size = (placeholder_width, max(1, round(placeholder_width * height / width)))
+    placeholder = _encode(image.resize(placeholder_size, Image.BILINEAR), "JPEG", 40)
+    return {
+        "format": source_format,
+        "width": width,
+        "height": height,
+        "variants": variants,
+        "placeholder": placeholder,
+    }
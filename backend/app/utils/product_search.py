@@ -1,10 +1,10 @@
 from typing import List, Dict, Any, Optional
 import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
 from sqlalchemy.exc import SQLAlchemyError
 from ..models.product import Product
-from ..models.order import Order, OrderItem
+from ..services.purchase_history import OrderSummary, PurchaseHistoryRepository
+from .search_index import get_search_backend
 from datetime import datetime, timedelta
 
 
@@ -45,16 +45,8 @@ class ProductSearch:
                 Product.is_active == True
             )
             
-            # If query contains specific keywords, search by title/description
-            if normalized_query:
-                products_query = products_query.filter(
-                    or_(
-                        func.lower(Product.title).contains(normalized_query),
-                        func.lower(Product.description).contains(normalized_query),
-                        func.lower(Product.category).contains(normalized_query),
-                        func.lower(Product.tags).contains(normalized_query),
-                    )
-                )
+            # Rank matches on title/description/category/tags via the full-text index
+            products_query = get_search_backend(self.db).search(products_query, normalized_query)
             
             # Limit to 10 relevant results
             products = products_query.limit(10).all()
@@ -89,7 +81,7 @@ class ProductSearch:
             self.logger.error(f"Unexpected error searching products: {str(e)}", exc_info=True)
             return []
 
-    def get_user_orders(self, user_id: int) -> List[Dict[str, Any]]:
+    def get_user_orders(self, user_id: int) -> List[OrderSummary]:
         """
         Get recent orders for a specific user
         
@@ -97,62 +89,14 @@ class ProductSearch:
             user_id: The ID of the user
             
         Returns:
-            List of order dictionaries
+            List of OrderSummary tuples (newest first) with their items
         """
         try:
             if not user_id:
                 return []
                 
-            # Get the 3 most recent orders for the user
-            orders = self.db.query(Order).filter(
-                Order.user_id == user_id
-            ).order_by(Order.created_at.desc()).limit(3).all()
-            
-            order_dicts = []
-            for order in orders:
-                # Get items for each order
-                order_items = self.db.query(OrderItem).filter(
-                    OrderItem.order_id == order.id
-                ).all()
-                
-                items_list = []
-                for item in order_items:
-                    product = self.db.query(Product).filter(
-                        Product.id == item.product_id
-                    ).first()
-                    
-                    items_list.append({
-                        "product_id": item.product_id,
-                        "quantity": item.quantity,
-                        "price_at_time": item.price_at_time,
-                        "product_title": product.title if product else "Unknown Product"
-                    })
-                
-                order_dicts.append({
-                    "id": order.id,
-                    "user_id": order.user_id,
-                    "full_name": order.full_name,
-                    "email": order.email,
-                    "phone": order.phone,
-                    "address": order.address,
-                    "city": order.city,
-                    "state": order.state,
-                    "zip_code": order.zip_code,
-                    "country": order.country,
-                    "shipping_method": order.shipping_method,
-                    "payment_method": order.payment_method,
-                    "subtotal": order.subtotal,
-                    "shipping_cost": order.shipping_cost,
-                    "tax": order.tax,
-                    "discount": order.discount,
-                    "total": order.total,
-                    "status": order.status,
-                    "created_at": order.created_at.isoformat() if order.created_at else None,
-                    "updated_at": order.updated_at.isoformat() if order.updated_at else None,
-                    "items": items_list
-                })
-            
-            return order_dicts
+            # The 3 most recent orders, items and product titles in one query (cached per user)
+            return PurchaseHistoryRepository(self.db).recent_orders(user_id, limit=3)
             
         except SQLAlchemyError as e:
             self.logger.error(f"Database error getting user orders: {str(e)}", exc_info=True)
@@ -0,0 +1,234 @@
+"""
+Full-text search backends for the product catalog
+
+Both the storefront listing (``read_products``) and the chat assistant's
+``ProductSearch`` resolve free-text queries through one ``SearchBackend``:
+
+- SQLite: an FTS5 external-content table (``products_fts``) kept in sync with
+  ``products`` by triggers, ranked with BM25.
+- PostgreSQL: a GIN index over a ``to_tsvector`` expression, ranked with
+  ``ts_rank``.
+- Anything else: a plain ``ILIKE`` fallback so search keeps working.
+
+Every backend indexes ``Product.search_text``, the normalized concatenation of
+all multilingual text fields (see ``app.utils.text_normalization``), and
+queries are normalized the same way, so a single indexed lookup replaces the
+per-column/per-spelling ``OR`` scans.
+
+The SQL for the indexes lives in Alembic revisions 007/008; SQLite databases
+that predate them are upgraded lazily the first time the backend is requested.
+"""
+import logging
+import threading
+from typing import List, Optional
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Float, Integer, func, literal, literal_column, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session
+
+from ..models.product import Product, SEARCHABLE_FIELDS
+from .text_normalization import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Columns covered by the full-text index, in FTS column order.
+SEARCH_COLUMNS = ("search_text",)
+
+
+def tokenize_query(query: Optional[str]) -> List[str]:
+    """Split a raw user query into normalized word tokens."""
+    return tokenize(query)
+
+
+class SearchBackend:
+    """
+    Interface shared by all search backends
+
+    ``matches`` returns a subquery with ``product_id`` and ``rank`` columns
+    where a lower rank is a better match, so callers can either filter by it
+    or join and order by it without knowing the dialect.
+    """
+
+    name = "base"
+
+    def ensure_index(self, engine: Engine) -> None:
+        """Create any missing index structures. Must be idempotent."""
+
+    def matches(self, query: str):
+        raise NotImplementedError
+
+    def filter(self, query: Query, search: str) -> Query:
+        """Restrict ``query`` to products matching ``search``."""
+        if not tokenize_query(search):
+            return query
+        hits = self.matches(search)
+        return query.filter(Product.id.in_(select(hits.c.product_id)))
+
+    def search(self, query: Query, search: str) -> Query:
+        """Restrict ``query`` to matching products, best matches first."""
+        if not tokenize_query(search):
+            return query
+        hits = self.matches(search)
+        return query.join(hits, hits.c.product_id == Product.id).order_by(hits.c.rank, Product.id)
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed substring search, used when no full-text engine is available"""
+
+    name = "like"
+
+    def __init__(self, columns=SEARCH_COLUMNS):
+        self.columns = columns
+
+    def matches(self, query: str):
+        conditions = []
+        for token in tokenize_query(query):
+            pattern = f"%{token}%"
+            conditions.append(or_(*(getattr(Product, column).ilike(pattern) for column in self.columns)))
+        return (
+            select(Product.id.label("product_id"), literal(0.0).label("rank"))
+            .where(*conditions)
+            .subquery("search_hits")
+        )
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """FTS5 external-content index ranked by BM25"""
+
+    name = "sqlite_fts5"
+    table = "products_fts"
+
+    DDL = [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            {", ".join(SEARCH_COLUMNS)},
+            content='products', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, {", ".join(SEARCH_COLUMNS)})
+            VALUES (new.id, {", ".join("new." + c for c in SEARCH_COLUMNS)});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {", ".join(SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {", ".join("old." + c for c in SEARCH_COLUMNS)});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_au
+        AFTER UPDATE OF {", ".join(SEARCH_COLUMNS)} ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, {", ".join(SEARCH_COLUMNS)})
+            VALUES ('delete', old.id, {", ".join("old." + c for c in SEARCH_COLUMNS)});
+            INSERT INTO products_fts(rowid, {", ".join(SEARCH_COLUMNS)})
+            VALUES (new.id, {", ".join("new." + c for c in SEARCH_COLUMNS)});
+        END
+        """,
+    ]
+
+    def ensure_index(self, engine: Engine) -> None:
+        with engine.begin() as conn:
+            columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(products)")}
+            if not set(SEARCH_COLUMNS) <= columns:
+                raise OperationalError(
+                    "products.search_text is missing, run 'alembic upgrade head'", None, None
+                )
+            existing = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": self.table},
+            ).scalar()
+            if existing and all(column in existing for column in SEARCH_COLUMNS):
+                return
+            if existing:
+                # Index from an older column layout: drop it and rebuild
+                for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.exec_driver_sql(f"DROP TABLE {self.table}")
+            for statement in self.DDL:
+                conn.exec_driver_sql(statement)
+            # 'rebuild' re-reads the content table, so a concurrent first
+            # request doing the same thing cannot leave duplicate entries.
+            conn.exec_driver_sql("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+            logger.info("Created SQLite FTS5 product search index")
+
+    @staticmethod
+    def build_match(query: str) -> str:
+        # Quote every token so FTS5 operators in user input are inert, and
+        # prefix-match them to keep the "contains" feel of the old search.
+        return " ".join(f'"{token}"*' for token in tokenize_query(query))
+
+    def matches(self, query: str):
+        return (
+            text(
+                "SELECT rowid AS product_id, bm25(products_fts) AS rank "
+                "FROM products_fts WHERE products_fts MATCH :match"
+            )
+            .bindparams(match=self.build_match(query))
+            .columns(product_id=Integer, rank=Float)
+            .subquery("search_hits")
+        )
+
+
+class PostgresFullTextBackend(SearchBackend):
+    """tsvector expression index (GIN) ranked by ts_rank"""
+
+    name = "postgres_fts"
+
+    # Must match the indexed expression in migration 008 exactly (including
+    # the inline constants), otherwise PostgreSQL cannot use the GIN index.
+    DOCUMENT_SQL = "to_tsvector('simple'::regconfig, coalesce(products.search_text, ''))"
+
+    @classmethod
+    def document(cls):
+        return literal_column(cls.DOCUMENT_SQL)
+
+    @staticmethod
+    def build_tsquery(query: str) -> str:
+        return " & ".join(f"{token}:*" for token in tokenize_query(query))
+
+    def matches(self, query: str):
+        document = self.document()
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), self.build_tsquery(query))
+        return (
+            select(Product.id.label("product_id"), (-func.ts_rank(document, tsquery)).label("rank"))
+            .where(document.op("@@")(tsquery))
+            .subquery("search_hits")
+        )
+
+
+_backends: "WeakKeyDictionary[Engine, SearchBackend]" = WeakKeyDictionary()
+_backends_lock = threading.Lock()
+
+
+def _create_backend(engine: Engine) -> SearchBackend:
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        return PostgresFullTextBackend()
+    if dialect == "sqlite":
+        backend = SQLiteFTS5Backend()
+        try:
+            backend.ensure_index(engine)
+            return backend
+        except OperationalError as e:
+            logger.warning(f"SQLite FTS5 unavailable, falling back to LIKE search: {e}")
+            # search_text may not exist yet either, so scan the raw columns
+            return LikeSearchBackend(SEARCHABLE_FIELDS)
+    return LikeSearchBackend()
+
+
+def get_search_backend(db: Session) -> SearchBackend:
+    """Return the search backend for the session's engine, creating its index on first use."""
+    engine = db.get_bind()
+    backend = _backends.get(engine)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(engine)
+            if backend is None:
+                backend = _create_backend(engine)
+                _backends[engine] = backend
+    return backend
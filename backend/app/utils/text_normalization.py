@@ -0,0 +1,64 @@
+"""
+Text normalization and tokenization for Persian, Arabic and English search
+
+The same function is applied when products are indexed and when queries are
+parsed, so spelling variants that users type interchangeably collapse to one
+form:
+
+- Arabic yeh/alef maksura (ي ى) and kaf (ك) become Persian yeh/keheh (ی ک)
+- hamza-carrying and madda alef forms become a bare alef, teh marbuta becomes heh
+- ZWNJ/ZWJ, tatweel and harakat (diacritics) are removed
+- Persian (۰-۹) and Arabic-Indic (٠-٩) digits become ASCII digits
+- Latin text is case-folded and whitespace is collapsed
+"""
+import re
+from typing import Iterable, List, Optional
+
+_CHARACTER_MAP = {
+    # Letter variants
+    "ي": "ی",  # ARABIC LETTER YEH -> FARSI YEH
+    "ى": "ی",  # ARABIC LETTER ALEF MAKSURA -> FARSI YEH
+    "ئ": "ی",  # ARABIC LETTER YEH WITH HAMZA ABOVE -> FARSI YEH
+    "ك": "ک",  # ARABIC LETTER KAF -> KEHEH
+    "أ": "ا",  # ALEF WITH HAMZA ABOVE -> ALEF
+    "إ": "ا",  # ALEF WITH HAMZA BELOW -> ALEF
+    "آ": "ا",  # ALEF WITH MADDA ABOVE -> ALEF
+    "ٱ": "ا",  # ALEF WASLA -> ALEF
+    "ؤ": "و",  # WAW WITH HAMZA ABOVE -> WAW
+    "ة": "ه",  # TEH MARBUTA -> HEH
+    "ۀ": "ه",  # HEH WITH YEH ABOVE -> HEH
+    # Invisible joiners and elongation
+    "\u200c": None,  # ZERO WIDTH NON-JOINER
+    "\u200d": None,  # ZERO WIDTH JOINER
+    "ـ": None,  # TATWEEL
+    "\u00a0": " ",  # NO-BREAK SPACE
+}
+# Harakat, tanwin, shadda, sukun, superscript alef and Quranic marks
+_CHARACTER_MAP.update({chr(code): None for code in range(0x064B, 0x0660)})
+_CHARACTER_MAP[chr(0x0670)] = None
+# Persian and Arabic-Indic digits
+_CHARACTER_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})
+_CHARACTER_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})
+
+NORMALIZATION_TABLE = str.maketrans(_CHARACTER_MAP)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Return the canonical search form of ``value`` (empty string for None)."""
+    if not value:
+        return ""
+    normalized = value.translate(NORMALIZATION_TABLE).casefold()
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Normalize ``value`` and split it into word tokens."""
+    return _TOKEN_RE.findall(normalize_text(value))
+
+
+def build_search_document(parts: Iterable[Optional[str]]) -> str:
+    """Join and normalize several text fields into one indexable document."""
+    return normalize_text(" ".join(part for part in parts if part))
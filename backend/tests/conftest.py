@@ -0,0 +1,172 @@
+"""
+Shared pytest fixtures for the backend test suite
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.main import app
+from app.database import Base, get_db
+from app.services import (
+    copurchase_matrix,
+    dashboard_stats,
+    http_client,
+    image_cache,
+    image_fetch,
+    image_pool,
+    image_variants,
+    llm_cache,
+    product_cache,
+    purchase_history,
+    rate_limiter,
+    similarity_engine,
+    visual_index,
+)
+from app.utils import cache_utils
+from app import models  # noqa: F401  (register all tables on Base.metadata)
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite engine shared across threads for one test"""
+    test_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=test_engine)
+    yield test_engine
+    Base.metadata.drop_all(bind=test_engine)
+    test_engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(session_factory):
+    """TestClient whose get_db dependency uses the in-memory database"""
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_llm_cache(monkeypatch):
+    """Give every test its own in-memory LLM response cache"""
+    cache = llm_cache.LLMResponseCache(max_entries=256, ttl=60, store=None)
+    monkeypatch.setattr(llm_cache, "_llm_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiters(monkeypatch):
+    """Start every test with empty, process-local rate limit buckets"""
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    monkeypatch.setattr(rate_limiter.settings, "RATE_LIMIT_BACKEND", "local")
+
+
+@pytest.fixture(autouse=True)
+def fresh_http_client(monkeypatch):
+    """Never reuse a pooled client (and its connections) across event loops"""
+    monkeypatch.setattr(http_client, "_http_client", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_copurchase_index(monkeypatch, tmp_path):
+    """Keep co-purchase matrix files in a per-test directory"""
+    monkeypatch.setattr(copurchase_matrix.settings, "COPURCHASE_MATRIX_DIR", str(tmp_path / "copurchase"))
+    monkeypatch.setattr(copurchase_matrix, "_copurchase_index", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_similarity_engine(monkeypatch):
+    """Never serve one test's catalog snapshot to another"""
+    monkeypatch.setattr(similarity_engine, "_engine", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_purchase_history():
+    """Per-user history is cached by user id, which every test database reuses"""
+    purchase_history._cache.clear()
+    yield
+    purchase_history._cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def fresh_dashboard_stats():
+    """The dashboard payload is cached process-wide"""
+    dashboard_stats.invalidate_dashboard_stats()
+    yield
+    dashboard_stats.invalidate_dashboard_stats()
+
+
+@pytest.fixture(autouse=True)
+def fresh_image_cache(monkeypatch, tmp_path):
+    """Keep the image proxy's disk tier in a per-test directory"""
+    monkeypatch.setattr(image_cache.settings, "IMAGE_CACHE_DIR", str(tmp_path / "image-cache"))
+    monkeypatch.setattr(image_cache, "_image_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_upload_store(monkeypatch, tmp_path):
+    """Keep uploaded images and their variants in a per-test directory"""
+    monkeypatch.setattr(image_variants.settings, "IMAGE_UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(image_variants, "_variant_store", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_image_session(monkeypatch):
+    """An aiohttp session is bound to the event loop that created it"""
+    monkeypatch.setattr(image_fetch, "_image_session", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_image_pool(monkeypatch):
+    """Run image jobs on threads unless a test builds its own process pool"""
+    monkeypatch.setattr(image_pool.settings, "IMAGE_WORKERS", 0)
+    monkeypatch.setattr(image_pool, "_image_pool", None)
+    yield
+    image_pool.shutdown_image_pool()
+
+
+@pytest.fixture(autouse=True)
+def fresh_visual_index(monkeypatch, tmp_path):
+    """Keep the visual search index in a per-test directory, never fetch remote images"""
+    monkeypatch.setattr(visual_index.settings, "VISUAL_INDEX_DIR", str(tmp_path / "visual-index"))
+    monkeypatch.setattr(visual_index.settings, "VISUAL_INDEX_FETCH_REMOTE", False)
+    monkeypatch.setattr(visual_index, "_visual_index", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_redis_cache(monkeypatch):
+    """No shared Redis cache unless a test installs one"""
+    monkeypatch.setattr(cache_utils.settings, "REDIS_URL", "")
+    monkeypatch.setattr(cache_utils, "_redis_cache", None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_product_cache(monkeypatch):
+    """The product cache is process-wide; the client's lifespan opens its own"""
+    monkeypatch.setattr(product_cache, "_product_cache", None)
@@ -0,0 +1,95 @@
+"""
+Local OpenAI-compatible chat-completions stub for LLM tests and benchmarks
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMServer:
+    """
+    Serves POST /v1/chat/completions after a fixed delay, answering batched
+    relevance prompts with one score per product id and everything else with
+    a small JSON payload (as SSE chunks when ``stream`` is set). Counts
+    requests and client connections so tests can assert on fan-out and reuse.
+    """
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def reply_for(self, prompt: str) -> str:
+        ids = re.findall(r"- id: (\d+)", prompt)
+        if ids:
+            return json.dumps({"results": [
+                {"id": int(i), "relevance_score": 7, "explanation": "stub"} for i in ids
+            ]})
+        return json.dumps({"suggestions": ["stub one", "stub two"], "explanation": "stub"})
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.connections.add(self.client_address)
+                time.sleep(stub.delay)
+                if body.get("stream"):
+                    return self._stream(body)
+                payload = json.dumps({
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": stub.reply_for(body["messages"][-1]["content"])},
+                    }],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for word in ("stub ", "streamed ", "reply"):
+                    chunk = {"choices": [{"index": 0, "delta": {"content": word}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
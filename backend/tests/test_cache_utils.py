@@ -0,0 +1,251 @@
+"""
+Tests for the bounded, sharded InMemoryCache and the cached() decorator
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.cache_utils import InMemoryCache, approximate_size, cached
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entry_limit_evicts_least_recently_used():
+    cache = InMemoryCache(max_entries=3, shards=1, sweep_interval=None)
+    for key in "abc":
+        cache.set(key, key.upper())
+    assert cache.get("a") == "A"  # a becomes most recently used
+
+    cache.set("d", "D")
+
+    assert [cache.get(key) for key in "abcd"] == ["A", None, "C", "D"]
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (3, 1, 4, 1)
+
+
+def test_byte_budget_evicts_and_rejects_oversized_values():
+    item = "x" * 1000
+    cache = InMemoryCache(max_bytes=approximate_size(item) * 3, shards=1, sweep_interval=None)
+    for key in "abcd":
+        cache.set(key, item)
+    assert len(cache) == 3 and cache.get("a") is None
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+    cache.set("huge", "y" * 10_000)
+    assert cache.get("huge") is None and len(cache) == 3
+
+
+def test_lazy_and_periodic_expiry_without_full_scans():
+    clock = FakeClock()
+    cache = InMemoryCache(default_ttl=10, shards=2, sweep_interval=None, clock=clock)
+    for i in range(100):
+        cache.set(f"short{i}", i, ttl=5)
+    cache.set("long", "kept", ttl=60)
+
+    clock.now += 6
+    assert cache.get("short0") is None  # lazy
+    assert cache.cleanup_expired() == 99  # heap pops only the expired keys
+    assert cache.get("long") == "kept"
+    assert cache.stats()["expirations"] == 100
+
+    # Overwrites leave stale heap items behind; they must not expire the new value
+    cache.set("k", 1, ttl=5)
+    cache.set("k", 2, ttl=60)
+    clock.now += 10
+    assert cache.cleanup_expired() == 0
+    assert cache.get("k") == 2
+
+
+def test_background_sweeper_removes_expired_entries():
+    cache = InMemoryCache(default_ttl=1, sweep_interval=0.05)
+    cache.set("k", "v", ttl=0.01)
+    deadline = time.monotonic() + 2
+    while len(cache) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_concurrent_access_keeps_limits_and_counters_consistent():
+    cache = InMemoryCache(max_entries=64, shards=8, sweep_interval=None)
+
+    def worker(n):
+        for i in range(2000):
+            key = f"{(n * 7919 + i) % 200}"
+            if cache.get(key) is None:
+                cache.set(key, i)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(worker, range(8)))
+
+    stats = cache.stats()
+    assert stats["entries"] <= 64
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+    assert stats["sets"] - stats["evictions"] >= stats["entries"]  # racing sets may overwrite
+
+
+def test_cached_decorator_accepts_limits_and_exposes_its_cache():
+    calls = []
+
+    @cached(ttl=60, max_entries=2, shards=1)
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert [square(1), square(2), square(1), square(3), square(2)] == [1, 4, 1, 9, 4]
+    assert calls == [1, 2, 3, 2]  # 2 was evicted by 3
+    assert square.cache.stats()["evictions"] == 2
+
+    @cached(ttl=60, max_entries=10)
+    async def lookup(key):
+        calls.append(key)
+        return None
+
+    asyncio.run(lookup("missing"))
+    asyncio.run(lookup("missing"))
+    assert calls.count("missing") == 1  # None results are cached too
+
+
+def test_shard_locks_are_independent():
+    cache = InMemoryCache(shards=4, sweep_interval=None)
+    shard_locks = {id(shard.lock) for shard in cache._shards}
+    assert len(shard_locks) == 4
+    held = cache._shard("a").lock
+    with held:
+        other = next(key for key in map(str, range(100)) if cache._shard(key).lock is not held)
+        thread = threading.Thread(target=cache.set, args=(other, 1))
+        thread.start()
+        thread.join(timeout=1)
+        assert not thread.is_alive()
+
+
+def test_burst_of_concurrent_misses_calls_async_function_once():
+    calls = []
+
+    @cached(ttl=60)
+    async def product_page(product_id):
+        calls.append(product_id)
+        await asyncio.sleep(0.05)
+        return {"id": product_id}
+
+    async def burst():
+        return await asyncio.gather(*(product_page(7) for _ in range(500)))
+
+    results = asyncio.run(burst())
+    assert len(calls) == 1
+    assert all(result == {"id": 7} for result in results)
+
+
+def test_failed_call_is_shared_by_waiters_and_not_cached():
+    calls = []
+
+    @cached(ttl=60)
+    async def flaky():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def burst():
+        return await asyncio.gather(*(flaky() for _ in range(20)), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert len(calls) == 1 and all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        asyncio.run(flaky())
+    assert len(calls) == 2
+
+
+def test_concurrent_sync_misses_compute_once():
+    calls = []
+
+    @cached(ttl=60)
+    def report(day):
+        calls.append(day)
+        time.sleep(0.05)
+        return day * 2
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: report(3), range(64)))
+    assert results == [6] * 64 and calls == [3]
+
+
+def test_stale_value_is_served_while_one_call_refreshes_it(monkeypatch):
+    monkeypatch.setattr(time, "time", FakeClock())
+    calls = []
+
+    @cached(ttl=10, stale_ttl=30, early_refresh_beta=0)
+    async def price(product_id):
+        calls.append(product_id)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        assert await price(1) == 1
+        time.time.now += 15  # past ttl, inside the stale window
+        stale = await asyncio.gather(*(price(1) for _ in range(50)))
+        await asyncio.sleep(0.05)  # let the single background refresh finish
+        return stale, await price(1)
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale == [1] * 50
+    assert fresh == 2 and len(calls) == 2
+
+    time.time.now += 100  # past the stale window too: callers wait for a new value
+    assert asyncio.run(price(1)) == 3
+
+
+def test_sync_stale_refresh_runs_in_the_background(monkeypatch):
+    monkeypatch.setattr(time, "time", FakeClock())
+    refreshed = threading.Event()
+    calls = []
+
+    @cached(ttl=10, stale_ttl=30, early_refresh_beta=0)
+    def rates():
+        calls.append(1)
+        if len(calls) > 1:
+            refreshed.set()
+        return len(calls)
+
+    assert rates() == 1
+    time.time.now += 15
+    assert rates() == 1  # stale, refresh queued
+    assert refreshed.wait(2)
+    deadline = time.monotonic() + 2
+    while rates() != 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert rates() == 2 and len(calls) == 2
+
+
+def test_early_refresh_happens_just_before_expiry(monkeypatch):
+    monkeypatch.setattr(time, "time", FakeClock())
+    random.seed(0)
+    calls = []
+
+    @cached(ttl=10, early_refresh_beta=1.0)
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)  # ~50 ms to recompute
+        return len(calls)
+
+    async def scenario():
+        await slow()
+        for _ in range(100):  # far from expiry: XFetch practically never fires
+            await slow()
+        assert len(calls) == 1
+        time.time.now += 10 - 0.001  # a millisecond before expiry: it almost always does
+        served = await slow()
+        await asyncio.sleep(0.1)
+        return served
+
+    assert asyncio.run(scenario()) == 1  # the hit itself is not delayed
+    assert len(calls) == 2
@@ -0,0 +1,173 @@
+"""
+Tests for Brotli/gzip response compression
+"""
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.middleware import compression_middleware
+from app.middleware.compression_middleware import CompressionMiddleware, negotiate_encoding
+from app.middleware.etag_middleware import ETAGMiddleware
+from app.models.product import Product
+
+brotli = pytest.importorskip("brotlicffi")
+
+CATALOG = [{"id": i, "title": f"Product {i}", "description": "Wireless headphones " * 5} for i in range(200)]
+
+
+def decode(response, encoding: str) -> bytes:
+    # httpx decodes br/gzip itself; read the raw stream to see what went over the wire
+    raw = b"".join(response.iter_raw())
+    return brotli.decompress(raw) if encoding == "br" else gzip.decompress(raw)
+
+
+def make_app(etag: bool = True):
+    async def catalog(request):
+        return JSONResponse(CATALOG)
+
+    async def tiny(request):
+        return JSONResponse({"ok": True})
+
+    async def stream(request):
+        async def lines():
+            for item in CATALOG[:50]:
+                yield (json.dumps(item) + "\n").encode()
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    async def events(request):
+        async def chunks():
+            for i in range(3):
+                yield f"data: {'x' * 1000} {i}\n\n".encode()
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    async def png(request):
+        return Response(b"\x89PNG" + b"\x00" * 5000, media_type="image/png")
+
+    routes = [Route("/catalog", catalog), Route("/tiny", tiny), Route("/stream", stream),
+              Route("/events", events), Route("/png", png)]
+    app = Starlette(routes=routes)
+    if etag:
+        app.add_middleware(ETAGMiddleware)  # as in app.main
+    app.add_middleware(CompressionMiddleware)
+    return app
+
+
+@pytest.fixture
+def app_client():
+    return TestClient(make_app())
+
+
+def test_negotiation_honours_q_values_and_preference():
+    available = ("br", "gzip")
+    assert negotiate_encoding("gzip, deflate, br", available) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip", available) == "gzip"
+    assert negotiate_encoding("br;q=0, gzip;q=0", available) is None
+    assert negotiate_encoding("*", available) == "br"
+    assert negotiate_encoding("identity", available) is None
+    assert negotiate_encoding(None, available) is None
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+def test_large_json_is_compressed_with_the_negotiated_coding(app_client, encoding):
+    with app_client.stream("GET", "/catalog", headers={"Accept-Encoding": encoding}) as response:
+        body = decode(response, encoding)
+        assert response.headers["content-encoding"] == encoding
+        assert int(response.headers["content-length"]) < len(body) / 5
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.headers["etag"].startswith("W/")
+    assert json.loads(body) == CATALOG
+
+
+def test_compressed_variant_is_cached_and_reused(app_client, monkeypatch):
+    calls = []
+    original = CompressionMiddleware._compress
+
+    def counting(self, body, encoding):
+        calls.append(encoding)
+        return original(self, body, encoding)
+
+    monkeypatch.setattr(CompressionMiddleware, "_compress", counting)
+    for encoding in ["br"] * 5 + ["gzip"] * 2:
+        with app_client.stream("GET", "/catalog", headers={"Accept-Encoding": encoding}) as response:
+            assert json.loads(decode(response, encoding)) == CATALOG
+    assert calls == ["br", "gzip"]
+
+
+def test_conditional_request_still_matches_after_compression(app_client):
+    with app_client.stream("GET", "/catalog", headers={"Accept-Encoding": "br"}) as response:
+        etag = response.headers["etag"]
+    response = app_client.get("/catalog", headers={"Accept-Encoding": "br", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert "content-encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_small_binary_and_identity_responses_are_left_alone(app_client):
+    tiny = app_client.get("/tiny", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in tiny.headers and tiny.json() == {"ok": True}
+
+    png = app_client.get("/png", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in png.headers and len(png.content) == 5004
+
+    identity = app_client.get("/catalog", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert "Accept-Encoding" in identity.headers["vary"]
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+def test_streams_are_compressed_chunk_by_chunk(encoding):
+    # Driven over raw ASGI: the test client joins the body before handing it over
+    middleware = CompressionMiddleware(make_app(etag=False))
+    scope = {"type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream", "query_string": b"",
+             "root_path": "", "scheme": "http", "server": ("test", 80), "http_version": "1.1",
+             "headers": [(b"accept-encoding", encoding.encode())]}
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-encoding"] == encoding.encode() and b"content-length" not in headers
+    bodies = [m["body"] for m in messages[1:]]
+    assert len(bodies) > 10 and all(bodies[:-1])  # every chunk flushed as it arrived
+    raw = b"".join(bodies)
+    body = brotli.decompress(raw) if encoding == "br" else zlib.decompress(raw, 31)
+    assert [json.loads(line) for line in body.decode().splitlines()] == CATALOG[:50]
+
+
+def test_event_streams_pass_through(app_client):
+    with app_client.stream("GET", "/events", headers={"Accept-Encoding": "br, gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+        assert "content-encoding" not in response.headers
+    assert raw.count(b"data: ") == 3
+
+
+def test_gzip_only_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression_middleware, "brotli", None)
+    client = TestClient(make_app())
+    with client.stream("GET", "/catalog", headers={"Accept-Encoding": "br, gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert json.loads(decode(response, "gzip")) == CATALOG
+
+
+def test_api_compresses_product_listings(client, db):
+    db.add_all([Product(title=f"Product {i}", description="Desk lamp " * 20, price=10.0) for i in range(30)])
+    db.commit()
+    with client.stream("GET", "/api/v1/products/?limit=30", headers={"Accept-Encoding": "br"}) as response:
+        assert response.headers["content-encoding"] == "br"
+        assert len(json.loads(decode(response, "br"))) == 30
@@ -0,0 +1,162 @@
+"""
+Tests for the precomputed co-purchase matrix
+"""
+import os
+import threading
+from collections import Counter
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from app.core.auth import get_current_active_user
+from app.main import app
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+from app.services.copurchase_matrix import (
+    CoPurchaseIndex,
+    CoPurchaseMatrix,
+    CoPurchaseStore,
+    get_copurchase_index,
+)
+from app.services.recommendation_service import RecommendationService
+
+
+def brute_force(baskets):
+    pairs, items = Counter(), Counter()
+    for basket in baskets.values():
+        basket = set(basket)
+        items.update(basket)
+        pairs.update(permutations(basket, 2))
+    return pairs, items
+
+
+def test_from_pairs_matches_brute_force():
+    rng = np.random.default_rng(7)
+    order_ids = rng.integers(1, 300, size=2000)
+    product_ids = rng.integers(1, 60, size=2000)
+    baskets = {}
+    for order_id, product_id in zip(order_ids.tolist(), product_ids.tolist()):
+        baskets.setdefault(order_id, []).append(product_id)
+    pairs, items = brute_force(baskets)
+
+    matrix = CoPurchaseMatrix.from_pairs(order_ids, product_ids)
+
+    products = sorted(items)
+    for a in products:
+        assert matrix.item_count(a) == items[a]
+        np.testing.assert_array_equal(matrix.co_counts(a, products), [pairs[(a, b)] for b in products])
+    assert matrix.max_order_id == int(order_ids.max())
+
+
+def test_large_baskets_are_skipped():
+    order_ids = np.array([1, 1, 2, 2, 2])
+    product_ids = np.array([10, 11, 10, 11, 12])
+    matrix = CoPurchaseMatrix.from_pairs(order_ids, product_ids, max_basket_size=2)
+    assert matrix.co_counts(10, [11, 12]).tolist() == [1.0, 0.0]
+    assert matrix.item_count(12) == 0
+
+
+def test_store_round_trip_is_memory_mapped(tmp_path):
+    store = CoPurchaseStore(str(tmp_path))
+    store.save(CoPurchaseMatrix.from_pairs(np.array([1, 1, 2, 2]), np.array([5, 6, 5, 7])))
+
+    loaded = store.load()
+
+    assert isinstance(loaded.data, np.memmap)
+    assert loaded.co_counts(5, [6, 7, 8]).tolist() == [1.0, 1.0, 0.0]
+
+
+def test_recorded_orders_reach_other_workers(tmp_path):
+    store_dir = str(tmp_path)
+    CoPurchaseStore(store_dir).save(CoPurchaseMatrix.from_pairs(np.array([1, 1]), np.array([5, 6])))
+    writer = CoPurchaseIndex(CoPurchaseStore(store_dir))
+    reader = CoPurchaseIndex(CoPurchaseStore(store_dir))
+    writer.refresh(force=True)
+    reader.refresh(force=True)
+    assert reader.scores(5, [6, 7]).tolist() == [1.0, 0.0]
+
+    writer.record_order(2, [5, 7])
+    writer.record_order(2, [5, 7])  # replayed hook must not double count
+    reader.refresh(force=True)
+
+    assert writer.scores(5, [6, 7]).tolist() == [0.5, 0.5]
+    assert reader.scores(5, [6, 7]).tolist() == [0.5, 0.5]
+    assert reader.score(7, 5) == 1.0
+
+
+def test_rebuild_folds_delta_into_base(db, tmp_path):
+    db.add(Order(id=1, full_name="a", email="a@x", phone="1", address="a", city="c", state="s",
+                 zip_code="1", shipping_method="standard", payment_method="cod",
+                 subtotal=1, shipping_cost=0, tax=0, total=1))
+    db.add_all([OrderItem(order_id=1, product_id=pid, quantity=1, price_at_time=1) for pid in (5, 6)])
+    db.commit()
+    index = CoPurchaseIndex(CoPurchaseStore(str(tmp_path)))
+    index.record_order(1, [5, 6])  # already in the database snapshot
+    index.record_order(2, [5, 7])  # not yet in the snapshot
+
+    index.rebuild(db)
+
+    assert index.matrix.max_order_id == 1
+    assert index.scores(5, [6, 7]).tolist() == [0.5, 0.5]
+
+
+def test_concurrent_saves_keep_the_current_version_and_new_entries(tmp_path):
+    store_dir = str(tmp_path)
+    matrix = CoPurchaseMatrix.from_pairs(np.array([1, 1]), np.array([5, 6]))
+
+    def rebuild():
+        for _ in range(10):
+            CoPurchaseStore(store_dir).save(matrix)
+
+    def record():
+        for order_id in range(2, 302):
+            CoPurchaseStore(store_dir).append(order_id, [5, 7])
+
+    threads = [threading.Thread(target=rebuild) for _ in range(3)] + [threading.Thread(target=record)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = CoPurchaseStore(store_dir)
+    version = store.load().version
+    assert sorted(f for f in os.listdir(store_dir) if f.endswith(".npy")) == sorted(
+        f"{name}-{version}.npy" for name in CoPurchaseStore.ARRAYS
+    )
+    entries, _ = store.read_delta(0, None)
+    assert [order_id for order_id, _ in entries] == list(range(2, 302))
+
+
+@pytest.fixture
+def shopper(db):
+    user = User(email="shopper@example.com", username="shopper", hashed_password="x")
+    products = [Product(title=f"Product {i}", price=10.0 * i, category="mobile") for i in range(1, 4)]
+    db.add(user)
+    db.add_all(products)
+    db.commit()
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    yield user, [p.id for p in products]
+    app.dependency_overrides.pop(get_current_active_user, None)
+
+
+def test_create_order_updates_copurchase_scores(client, db, shopper):
+    _, (phone, case, charger) = shopper
+    order = {
+        "full_name": "Shopper", "email": "shopper@example.com", "phone": "1", "address": "a",
+        "city": "c", "state": "s", "zip_code": "1", "shipping_method": "standard",
+        "payment_method": "cod", "subtotal": 30, "shipping_cost": 0, "tax": 0, "total": 30,
+    }
+    for basket in ([phone, case], [phone, case], [phone, charger], [case]):
+        items = [{"product_id": pid, "quantity": 1, "price_at_time": 10} for pid in basket]
+        response = client.post("/api/v1/orders/", json={**order, "items": items})
+        assert response.status_code == 200, response.text
+
+    index = get_copurchase_index()
+    index.refresh(force=True)
+    assert index.scores(phone, [case, charger]).tolist() == pytest.approx([2 / 3, 1 / 3])
+
+    service = RecommendationService(db)
+    assert service._get_copurchase_score(phone, case) == pytest.approx(2 / 3)
+    assert service._get_copurchase_score(charger, case) == 0.0
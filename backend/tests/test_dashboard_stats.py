@@ -0,0 +1,216 @@
+"""
+Tests for the admin dashboard statistics (conditional aggregation + cache)
+
+The benchmark builds a file SQLite database with ``DASHBOARD_BENCH_ORDERS``
+orders (default 1,000,000); run it with
+``pytest tests/test_dashboard_stats.py -m slow -s`` to see timings.
+"""
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, desc, event, func, insert
+from sqlalchemy.orm import Session
+
+from app.core.auth import get_current_active_user, get_current_admin_user
+from app.database import Base
+from app.main import app
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+from app.services import dashboard_stats, sales_rollup
+
+NOW = datetime(2024, 6, 15, 12, 0, 0)
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def order_row(user_id, total, created_at, status="pending", name="Buyer"):
+    return dict(
+        user_id=user_id, full_name=name, email="b@example.com", phone="1", address="a", city="c",
+        state="s", zip_code="1", shipping_method="standard", payment_method="cod",
+        subtotal=total, shipping_cost=0, tax=0, total=total, status=status, created_at=created_at,
+    )
+
+
+@pytest.fixture
+def shop(db):
+    admin = User(email="admin@example.com", username="admin", hashed_password="x", role="admin")
+    buyer = User(email="buyer@example.com", username="buyer", hashed_password="x")
+    products = [Product(title=f"Item {i}", price=10.0 * (i + 1), category="mobile") for i in range(3)]
+    db.add_all([admin, buyer, *products])
+    db.commit()
+
+    orders = [
+        Order(**order_row(buyer.id, 100.0, NOW - timedelta(days=60), "delivered", "Old")),
+        Order(**order_row(buyer.id, 20.0, NOW - timedelta(days=10), "shipped")),
+        Order(**order_row(buyer.id, 30.0, NOW - timedelta(days=2, hours=1), "pending")),
+        Order(**order_row(buyer.id, 40.0, NOW - timedelta(days=2), "cancelled")),
+        Order(**order_row(buyer.id, 5.0, NOW - timedelta(hours=1), "pending", "Latest")),
+    ]
+    orders[0].items = [OrderItem(product_id=products[0].id, quantity=5, price_at_time=10)]
+    orders[1].items = [OrderItem(product_id=products[1].id, quantity=1, price_at_time=20)]
+    orders[2].items = [
+        OrderItem(product_id=products[1].id, quantity=1, price_at_time=20),
+        OrderItem(product_id=products[2].id, quantity=2, price_at_time=30),
+    ]
+    db.add_all(orders)
+    db.commit()
+    sales_rollup.backfill(db)
+    db.commit()
+    return admin, buyer, products, orders
+
+
+def test_stats_match_expected_values(db, shop):
+    _, _, products, orders = shop
+    stats = dashboard_stats.compute_dashboard_stats(db, now=NOW)
+
+    assert stats["total_revenue"] == 195.0
+    assert stats["recent_revenue"] == 95.0
+    assert (stats["total_orders"], stats["total_users"], stats["total_products"]) == (5, 2, 3)
+    assert stats["orders_by_status"] == {"pending": 2, "shipped": 1, "delivered": 1, "cancelled": 1}
+    day = (NOW - timedelta(days=2)).date().isoformat()
+    assert stats["revenue_chart"] == [
+        {"date": day, "revenue": 70.0, "orders": 2},
+        {"date": NOW.date().isoformat(), "revenue": 5.0, "orders": 1},
+    ]
+    assert [(p["id"], p["total_sold"]) for p in stats["top_products"]] == [
+        (products[0].id, 5), (products[1].id, 2), (products[2].id, 2),
+    ]
+    assert [o["id"] for o in stats["recent_orders"]] == [o.id for o in reversed(orders)]
+    assert stats["recent_orders"][0]["customer_name"] == "Latest"
+
+
+def test_order_aggregates_use_one_query(db, engine, shop):
+    with count_queries(engine) as statements:
+        dashboard_stats.compute_dashboard_stats(db, now=NOW)
+
+    # aggregates (with user/product counts as subqueries) + rollup chart + top products + recent orders
+    assert len(statements) == 4
+    assert statements[0].count("FROM orders") == 1
+    assert "GROUP BY" not in statements[0]
+
+
+def test_endpoint_caches_until_an_order_changes(client, db, engine, shop):
+    admin, buyer, products, _ = shop
+    app.dependency_overrides[get_current_admin_user] = lambda: admin
+    app.dependency_overrides[get_current_active_user] = lambda: buyer
+    try:
+        first = client.get("/api/v1/admin/dashboard/stats")
+        with count_queries(engine) as statements:
+            second = client.get("/api/v1/admin/dashboard/stats")
+        assert first.status_code == second.status_code == 200
+        assert second.json() == first.json()
+        assert statements == []
+
+        response = client.post("/api/v1/orders/", json={
+            "full_name": "Buyer", "email": "b@example.com", "phone": "1", "address": "a", "city": "c",
+            "state": "s", "zip_code": "1", "shipping_method": "standard", "payment_method": "cod",
+            "subtotal": 10, "shipping_cost": 0, "tax": 0, "total": 10,
+            "items": [{"product_id": products[0].id, "quantity": 1, "price_at_time": 10}],
+        })
+        assert response.status_code == 200
+
+        third = client.get("/api/v1/admin/dashboard/stats").json()["data"]
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+    assert third["total_orders"] == first.json()["data"]["total_orders"] + 1
+    assert third["recent_orders"][0]["id"] == response.json()["id"]
+
+
+def _multi_query_baseline(db: Session) -> None:
+    """The pre-aggregation query pattern of the dashboard endpoint."""
+    now = datetime.utcnow()
+    db.query(func.sum(Order.total)).scalar()
+    db.query(func.sum(Order.total)).filter(Order.created_at >= now - timedelta(days=30)).scalar()
+    db.query(func.count(Order.id)).scalar()
+    db.query(func.count(User.id)).scalar()
+    db.query(func.count(Product.id)).count()
+    db.query(
+        func.date(Order.created_at), func.sum(Order.total), func.count(Order.id)
+    ).filter(Order.created_at >= now - timedelta(days=7)).group_by(func.date(Order.created_at)).all()
+    db.query(Order.status, func.count(Order.id)).group_by(Order.status).all()
+    db.query(
+        Product.id, Product.title, Product.price, func.sum(OrderItem.quantity).label("total_sold")
+    ).join(OrderItem, OrderItem.product_id == Product.id).join(Order, Order.id == OrderItem.order_id).group_by(
+        Product.id, Product.title, Product.price
+    ).order_by(desc("total_sold")).limit(5).all()
+    db.query(Order).order_by(desc(Order.created_at)).limit(10).all()
+
+
+@pytest.fixture(scope="module")
+def large_shop(tmp_path_factory):
+    """File SQLite database with DASHBOARD_BENCH_ORDERS orders over the last year"""
+    count = int(os.getenv("DASHBOARD_BENCH_ORDERS", "1000000"))
+    bench_engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('dashboard') / 'bench.db'}")
+    Base.metadata.create_all(bind=bench_engine)
+
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    statuses = ["pending", "processing", "shipped", "delivered", "cancelled"]
+    with bench_engine.begin() as conn:
+        conn.execute(insert(User), [
+            dict(email=f"u{i}@example.com", username=f"u{i}", hashed_password="x") for i in range(1000)
+        ])
+        conn.execute(insert(Product), [dict(title=f"Item {i}", price=i + 1.0) for i in range(500)])
+        batch = 50_000
+        for offset in range(0, count, batch):
+            conn.execute(insert(Order), [
+                order_row(
+                    rng.randint(1, 1000), round(rng.uniform(5, 500), 2),
+                    now - timedelta(seconds=rng.randint(0, 365 * 86400)), rng.choice(statuses),
+                )
+                for _ in range(min(batch, count - offset))
+            ])
+        conn.execute(insert(OrderItem), [
+            dict(order_id=rng.randint(1, count), product_id=rng.randint(1, 500),
+                 quantity=rng.randint(1, 3), price_at_time=10.0)
+            for _ in range(min(count, 100_000))
+        ])
+    with Session(bench_engine) as db:
+        sales_rollup.backfill(db)
+        db.commit()
+    yield bench_engine, count
+    bench_engine.dispose()
+
+
+@pytest.mark.slow
+def test_aggregate_query_beats_multi_query_baseline(large_shop):
+    bench_engine, count = large_shop
+    with Session(bench_engine) as db:
+        start = time.perf_counter()
+        _multi_query_baseline(db)
+        baseline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats = dashboard_stats.get_dashboard_stats(db)
+        aggregated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        dashboard_stats.get_dashboard_stats(db)
+        cached = time.perf_counter() - start
+
+    print(f"\ndashboard stats over {count} orders: multi-query {baseline * 1000:.0f} ms, "
+          f"aggregated {aggregated * 1000:.0f} ms, cached {cached * 1000:.3f} ms")
+
+    assert stats["total_orders"] == count
+    assert sum(stats["orders_by_status"].values()) == count
+    assert aggregated < baseline
+    assert cached * 100 < aggregated
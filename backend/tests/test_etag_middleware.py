@@ -0,0 +1,110 @@
+"""
+Tests for the pure-ASGI ETag middleware
+"""
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.middleware.etag_middleware import ETAGMiddleware, calculate_etag, etag_matches
+from app.models.product import Product
+
+PAYLOAD = {"products": [{"id": i, "title": f"Product {i}"} for i in range(50)]}
+
+
+def chunks(count: int, size: int):
+    async def generate():
+        for i in range(count):
+            yield bytes([65 + i % 26]) * size
+    return generate
+
+
+def make_client(**options) -> TestClient:
+    async def catalog(request):
+        return JSONResponse(PAYLOAD, headers={"Cache-Control": "max-age=60", "Vary": "Accept-Language"})
+
+    async def streamed(request):
+        return StreamingResponse(chunks(4, 100)(), media_type="application/octet-stream")
+
+    async def large(request):
+        return StreamingResponse(chunks(10, 1000)(), media_type="application/octet-stream")
+
+    async def events(request):
+        return StreamingResponse(chunks(3, 10)(), media_type="text/event-stream")
+
+    async def versioned(request):
+        return JSONResponse({"id": 1}, headers={"ETag": 'W/"v7"'})
+
+    async def missing(request):
+        return JSONResponse({"detail": "Not found"}, status_code=404)
+
+    routes = [Route("/catalog", catalog), Route("/streamed", streamed), Route("/large", large),
+              Route("/events", events), Route("/versioned", versioned), Route("/missing", missing)]
+    app = Starlette(routes=routes)
+    app.add_middleware(ETAGMiddleware, **options)
+    return TestClient(app)
+
+
+def test_etag_is_a_content_hash_and_stable_across_processes():
+    client = make_client()
+    response = client.get("/catalog")
+    assert response.headers["etag"] == calculate_etag(response.content)
+    assert client.get("/catalog").headers["etag"] == response.headers["etag"]
+
+
+def test_matching_if_none_match_returns_bodiless_304():
+    client = make_client()
+    etag = client.get("/catalog").headers["etag"]
+
+    for header in (etag, f'"stale", {etag}', f"W/{etag}", "*"):
+        response = client.get("/catalog", headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert response.headers["cache-control"] == "max-age=60"
+        assert "content-type" not in response.headers and "content-length" not in response.headers
+
+    assert client.get("/catalog", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_streamed_body_is_hashed_incrementally():
+    client = make_client()
+    response = client.get("/streamed")
+    assert response.content == b"A" * 100 + b"B" * 100 + b"C" * 100 + b"D" * 100
+    assert response.headers["etag"] == calculate_etag(response.content)
+    assert client.get("/streamed", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("path", ["/large", "/events", "/missing"])
+def test_large_event_stream_and_error_responses_pass_through(path):
+    client = make_client(max_buffer_size=4096)
+    response = client.get(path, headers={"If-None-Match": "*"})
+    assert response.status_code != 304
+    assert "etag" not in response.headers
+    if path == "/large":
+        assert len(response.content) == 10_000
+
+
+def test_endpoint_etag_is_kept_and_compared_weakly():
+    client = make_client()
+    response = client.get("/versioned")
+    assert response.headers["etag"] == 'W/"v7"'
+
+    not_modified = client.get("/versioned", headers={"If-None-Match": '"v7"'})
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == 'W/"v7"'
+    assert client.head("/versioned", headers={"If-None-Match": 'W/"v7"'}).status_code == 304
+
+
+def test_etag_matches_parses_lists():
+    assert etag_matches('"a", W/"b" , "c"', '"b"')
+    assert not etag_matches('"a", "c"', '"b"')
+    assert not etag_matches(None, '"b"')
+
+
+def test_app_product_endpoint_supports_conditional_get(client, db):
+    db.add(Product(id=1, title="Lamp", price=20.0))
+    db.commit()
+    response = client.get("/api/v1/products/1")
+    assert "etag" in response.headers
+    assert client.get("/api/v1/products/1", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
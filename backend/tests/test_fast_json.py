@@ -0,0 +1,190 @@
+"""
+Tests for the fast JSON path of the list endpoints (column tuples + orjson,
+sampled response-model validation)
+
+The benchmark compares the old ORM + response_model listing with the fast
+one on 1000-product pages; run ``pytest tests/test_fast_json.py -m slow -s``
+to see requests/sec.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.exceptions import ResponseValidationError
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from app.api.v1 import products as products_api
+from app.api.v1.bot_integration.auth import get_bot_api_key
+from app.core.auth import get_current_admin_user
+from app.database import get_db
+from app.main import app
+from app.models.bot import BotApiKey
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+from app.schemas.product import ProductResponse
+from app.utils import fast_json
+from app.utils.fast_json import ORJSONResponse, validate_sample
+
+from .test_product_versions import count_queries
+
+
+def add_products(db, n, start=datetime(2025, 1, 15, 10, 0, 0, 123456)):
+    db.add_all([
+        Product(
+            id=i, title=f"Product {i}", title_fa=f"محصول {i}", description="Desk lamp " * 5,
+            price=9.99 + i, discount_price=8.5 if i % 3 == 0 else None, category="Lighting",
+            tags="lamp,desk", rating=4.5, image_url=f"/img/{i}.jpg",
+            created_at=start + timedelta(minutes=i),
+        )
+        for i in range(1, n + 1)
+    ])
+    db.commit()
+
+
+@pytest.fixture
+def as_admin(db):
+    admin = User(email="admin@example.com", username="admin", hashed_password="x", role="admin")
+    db.add(admin)
+    db.commit()
+    app.dependency_overrides[get_current_admin_user] = lambda: admin
+    yield admin
+    app.dependency_overrides.pop(get_current_admin_user, None)
+
+
+def test_orjson_response_encodes_what_the_stdlib_path_did():
+    body = ORJSONResponse({
+        "when": datetime(2025, 1, 15, 10, 0, tzinfo=timezone.utc),
+        "price": Decimal("12.50"),
+        "tags": {"lamp"},
+        1: "non-string key",
+    }).body
+    assert body == b'{"when":"2025-01-15T10:00:00Z","price":12.5,"tags":["lamp"],"1":"non-string key"}'
+
+
+def test_product_listing_matches_the_response_model(client, db):
+    add_products(db, 5)
+
+    response = client.get("/api/v1/products/?limit=5")
+
+    expected = [
+        ProductResponse.model_validate(product).model_dump(mode="json")
+        for product in db.query(Product).order_by(Product.id)
+    ]
+    assert response.status_code == 200
+    assert response.json() == expected
+    assert expected[0]["status"] is None and expected[0]["version"] == 1
+    assert "x-next-cursor" in response.headers and response.headers["etag"].startswith('W/"products-')
+
+    follow = client.get(f"/api/v1/products/?limit=5&cursor={response.headers['x-next-cursor']}")
+    assert follow.json() == []
+
+
+def test_validation_is_sampled_outside_development(monkeypatch, caplog):
+    adapter = TypeAdapter(List[ProductResponse])
+    bad = [{"id": 1, "title": "", "price": -1}]
+
+    monkeypatch.setattr(fast_json.settings, "ENVIRONMENT", "development")
+    with pytest.raises(ResponseValidationError):
+        validate_sample(adapter, bad, "read_products")
+
+    monkeypatch.setattr(fast_json.settings, "ENVIRONMENT", "production")
+    monkeypatch.setattr(fast_json.settings, "RESPONSE_VALIDATION_SAMPLE_RATE", 0.0)
+    validate_sample(adapter, bad, "read_products")
+    assert not caplog.records
+
+    monkeypatch.setattr(fast_json.settings, "RESPONSE_VALIDATION_SAMPLE_RATE", 1.0)
+    validate_sample(adapter, bad, "read_products")
+    assert "does not match its response model" in caplog.text
+
+
+def test_admin_orders_count_items_in_one_query(client, db, engine, as_admin):
+    add_products(db, 2)
+    for n in range(1, 4):
+        order = Order(
+            user_id=as_admin.id, full_name="Sara", email="sara@example.com", phone="1", address="a",
+            city="c", state="s", zip_code="z", shipping_method="standard", payment_method="card",
+            subtotal=10.0 * n, shipping_cost=0.0, tax=0.0, total=10.0 * n,
+            created_at=datetime(2025, 2, n),
+        )
+        order.items = [OrderItem(product_id=1 + i % 2, quantity=1, price_at_time=10.0) for i in range(n)]
+        db.add(order)
+    db.commit()
+
+    with count_queries(engine) as statements:
+        data = client.get("/api/v1/admin/orders?limit=10").json()
+
+    assert [(o["total"], o["items_count"]) for o in data["orders"]] == [(30.0, 3), (20.0, 2), (10.0, 1)]
+    assert data["orders"][0]["created_at"] == "2025-02-03T00:00:00"
+    assert data["total"] == 3
+    assert len(statements) == 2  # count + page
+
+
+def test_admin_and_bot_product_lists(client, db, as_admin):
+    add_products(db, 3)
+    db.query(Product).filter(Product.id == 2).update({"category": "Desks"})
+    db.commit()
+
+    admin = client.get("/api/v1/admin/products?limit=2").json()
+    assert admin["total"] == 3 and [p["id"] for p in admin["products"]] == [1, 2]
+    assert admin["products"][0]["title_fa"] == "محصول 1" and admin["products"][0]["stock"] == 100
+
+    app.dependency_overrides[get_bot_api_key] = lambda: BotApiKey(name="shop-bot", permissions="read:products")
+    try:
+        bot = client.get("/api/v1/bot/bot/products/?category=Desks").json()
+    finally:
+        app.dependency_overrides.pop(get_bot_api_key, None)
+    assert bot["total"] == 1 and bot["bot_name"] == "shop-bot"
+    assert bot["data"][0].pop("updated_at").startswith("20")
+    assert bot["data"] == [{
+        "id": 2, "title": "Product 2", "description": "Desk lamp " * 5, "price": 11.99,
+        "discount_price": None, "is_active": True, "is_featured": False, "category": "Desks",
+        "image_url": "/img/2.jpg", "created_at": "2025-01-15T10:02:00.123456",
+    }]
+
+
+@pytest.mark.slow
+def test_fast_listing_serves_more_requests_per_second(session_factory, db, monkeypatch):
+    add_products(db, 1000)
+    monkeypatch.setattr(fast_json.settings, "ENVIRONMENT", "production")
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    # Before: ORM instances validated into ProductResponse and re-serialized
+    legacy = FastAPI()
+
+    @legacy.get("/products/", response_model=List[ProductResponse])
+    def legacy_products(db=Depends(get_db)):
+        return (
+            db.query(Product).filter(Product.is_active == True, Product.is_featured == False)
+            .order_by(Product.id).limit(1000).all()
+        )
+
+    fast = FastAPI()
+    fast.include_router(products_api.router, prefix="/products")
+
+    def requests_per_second(api, n=30):
+        api.dependency_overrides[get_db] = override_get_db
+        with TestClient(api) as bench:
+            first = bench.get("/products/?limit=1000")
+            assert first.status_code == 200 and len(first.json()) == 1000
+            start = time.perf_counter()
+            for _ in range(n):
+                bench.get("/products/?limit=1000")
+            return n / (time.perf_counter() - start), first.json()
+
+    before, legacy_body = requests_per_second(legacy)
+    after, fast_body = requests_per_second(fast)
+
+    print(f"\n1000-product page: {before:.1f} req/s before, {after:.1f} req/s after ({after / before:.1f}x)")
+    assert fast_body == legacy_body
+    assert after > before
@@ -0,0 +1,81 @@
+"""
+Tests for the shared pooled outbound HTTP client
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import http_client
+from app.services.ai_chat_service import AIChatService
+from app.services.deepseek_service import DeepSeekService
+from tests.llm_stub import StubLLMServer
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    with StubLLMServer(delay=0.01) as server:
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+        monkeypatch.setenv("DEEPSEEK_BASE_URL", server.base_url)
+        # AIChatService appends /v1 itself
+        monkeypatch.setattr(http_client.settings, "DEEPSEEK_BASE_URL", server.base_url[: -len("/v1")])
+        yield server
+
+
+def test_client_uses_configured_limits_and_timeouts(monkeypatch):
+    monkeypatch.setattr(http_client.settings, "HTTP_CLIENT_CONNECT_TIMEOUT", 2.0)
+    monkeypatch.setattr(http_client.settings, "HTTP_CLIENT_READ_TIMEOUT", 45.0)
+    client = http_client.create_http_client()
+    try:
+        assert client.timeout.connect == 2.0
+        assert client.timeout.read == 45.0
+        assert client.timeout.pool == http_client.settings.HTTP_CLIENT_POOL_TIMEOUT
+    finally:
+        asyncio.run(client.aclose())
+
+
+def test_lifespan_opens_and_closes_client():
+    with TestClient(app):
+        client = http_client._http_client
+        assert isinstance(client, httpx.AsyncClient)
+        assert not client.is_closed
+        assert http_client.get_http_client() is client
+    assert client.is_closed
+    assert http_client._http_client is None
+
+
+def test_chat_calls_share_one_connection(stub_llm):
+    async def run():
+        service = AIChatService(db=None)
+        replies = [await service.get_chat_response("hello", {}) for _ in range(5)]
+        await http_client.close_http_client()
+        return replies
+
+    replies = asyncio.run(run())
+    assert all("stub" in reply for reply in replies)
+    assert stub_llm.requests == 5
+    assert len(stub_llm.connections) == 1
+
+
+def test_streaming_response_yields_chunks(stub_llm):
+    async def run():
+        chunks = [
+            chunk async for chunk in AIChatService.get_streaming_response(None, "hello", {})
+        ]
+        await http_client.close_http_client()
+        return chunks
+
+    assert asyncio.run(run()) == ["stub ", "streamed ", "reply", "[DONE]"]
+
+
+def test_deepseek_client_reuses_shared_pool(stub_llm):
+    async def run():
+        first, second = DeepSeekService(), DeepSeekService()
+        assert first.client._client is second.client._client is http_client.get_http_client()
+        await asyncio.gather(*(first.generate_related_searches(f"query {i}") for i in range(3)))
+        await http_client.close_http_client()
+
+    asyncio.run(run())
+    assert stub_llm.requests == 3
@@ -0,0 +1,150 @@
+"""
+Tests for the image proxy cache (byte-budgeted LRU + shared disk tier)
+"""
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import images
+from app.core.auth import get_current_user
+from app.services.image_cache import DiskImageStore, ImageCache, get_image_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_memory_tier_evicts_least_recently_used_past_byte_budget(clock):
+    cache = ImageCache(max_bytes=800, max_entries=100, ttl=60, clock=clock)
+    for key in "abcdefgh":
+        cache.put(key, key.encode() * 100, "image/jpeg")
+    assert cache.stats()["bytes_resident"] == 800
+    assert cache.get("a") is not None  # a is now the most recently used
+
+    cache.put("i", b"i" * 100, "image/jpeg")
+
+    stats = cache.stats()
+    assert (stats["bytes_resident"], stats["entries"], stats["evictions"]) == (800, 8, 1)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_entry_count_and_item_size_limits(clock):
+    cache = ImageCache(max_bytes=8000, max_entries=2, ttl=60, clock=clock)
+    cache.put("a", b"1", "image/png")
+    cache.put("b", b"2", "image/png")
+    cache.put("c", b"3", "image/png")
+    assert [cache.get(key) is not None for key in "abc"] == [False, True, True]
+
+    cache.put("big", b"x" * 2000, "image/png")  # above max_bytes / 8: disk only
+    assert cache.get("big") is None
+    assert cache.stats()["bytes_resident"] == 2
+
+
+def test_ttl_expires_both_tiers(tmp_path, clock):
+    store = DiskImageStore(str(tmp_path), max_bytes=10_000, clock=clock)
+    cache = ImageCache(max_bytes=1000, ttl=60, store=store, clock=clock)
+    cache.put("k", b"image", "image/webp")
+
+    clock.now += 59
+    assert cache.load("k").data == b"image"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.load("k") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["expirations"], stats["misses"]) == (1, 1, 1)
+
+
+def test_disk_tier_is_shared_and_content_addressed(tmp_path, clock):
+    # Two workers: separate memory tiers, one directory
+    first = ImageCache(max_bytes=1000, ttl=60, store=DiskImageStore(str(tmp_path), 10_000, clock), clock=clock)
+    second = ImageCache(max_bytes=1000, ttl=60, store=DiskImageStore(str(tmp_path), 10_000, clock), clock=clock)
+
+    stored = first.put("url-400", b"same bytes", "image/jpeg")
+    first.put("url-400-again", b"same bytes", "image/jpeg")
+
+    assert second.get("url-400") is None
+    loaded = second.load("url-400")
+    assert loaded.data == b"same bytes" and loaded.digest == stored.digest
+    assert second.get("url-400") is not None  # promoted to memory
+
+    blobs = [name for _, _, names in os.walk(tmp_path / "blobs") for name in names]
+    assert blobs == [stored.digest]
+    stats = second.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["hit_ratio"]) == (1, 1, 1.0)
+    assert stats["disk_bytes"] == len(b"same bytes")
+
+
+def test_large_disk_hits_are_served_from_the_file(tmp_path, clock):
+    cache = ImageCache(max_bytes=800, ttl=60, store=DiskImageStore(str(tmp_path), 10_000, clock), clock=clock)
+    cache.put("large", b"L" * 500, "image/jpeg")
+
+    hit = cache.load("large")
+    assert hit.data is None
+    with hit.file as f:
+        assert f.read() == b"L" * 500
+
+
+def test_large_hit_survives_a_prune_by_another_worker(tmp_path, clock):
+    store = DiskImageStore(str(tmp_path), 10_000, clock)
+    cache = ImageCache(max_bytes=800, ttl=60, store=store, clock=clock)
+    cache.put("large", b"L" * 500, "image/jpeg")
+    hit = cache.load("large")
+    os.unlink(store._blob_path(hit.digest))  # pruned before the response is sent
+
+    app = FastAPI()
+    app.get("/large")(lambda: images._cached_image_response(hit))
+    with TestClient(app) as client:
+        response = client.get("/large")
+
+    assert response.status_code == 200
+    assert response.content == b"L" * 500
+    assert response.headers["content-length"] == "500"
+    assert hit.file.closed
+    assert cache.load("large") is None
+
+
+def test_disk_tier_prunes_least_recently_used_blobs(tmp_path, clock):
+    store = DiskImageStore(str(tmp_path), max_bytes=1000, clock=clock)
+    cache = ImageCache(max_bytes=100, ttl=60, store=store, clock=clock)
+    for i in range(5):
+        stored = cache.put(f"k{i}", bytes([i]) * 300, "image/jpeg")
+        os.utime(store._blob_path(stored.digest), (i, i))  # older files first
+
+    assert store.disk_bytes() <= 1000
+    hit = cache.load("k4")
+    assert hit is not None
+    hit.file.close()
+    assert cache.load("k0") is None
+
+
+def test_proxy_serves_cached_images_with_content_etag():
+    app = FastAPI()
+    app.include_router(images.router, prefix="/images")
+    app.dependency_overrides[get_current_user] = lambda: None
+    url = "https://images.unsplash.com/photo-1"
+    cache = get_image_cache()
+    stored = cache.put(ImageCache.make_key(url, 400, None, 80, "webp"), b"RIFF-webp", "image/webp")
+
+    with TestClient(app) as client:
+        response = client.get("/images/image", params={"url": url, "width": 400, "format": "webp"})
+        health = client.get("/images/health").json()
+
+    assert response.status_code == 200
+    assert response.content == b"RIFF-webp"
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["etag"] == f'"{stored.digest}"'
+    assert response.headers["x-from-cache"] == "true"
+    assert health["cache"]["memory_hits"] == 1
+    assert health["cache_size"] == 1
@@ -0,0 +1,164 @@
+"""
+Tests for the image proxy upstream: pooled session and request coalescing
+
+A local aiohttp server stands in for the image CDN and counts the requests
+(and TCP connections) it receives.
+"""
+import asyncio
+import io
+
+import httpx
+import pytest
+from aiohttp import web
+from fastapi import FastAPI
+from PIL import Image
+
+from app.api.v1 import images
+from app.config import settings
+from app.core.auth import get_current_user
+from app.services import image_fetch
+from app.services.image_fetch import RequestCoalescer
+
+
+def make_jpeg(width: int = 1200, height: int = 800) -> bytes:
+    out = io.BytesIO()
+    Image.linear_gradient("L").resize((width, height)).convert("RGB").save(out, format="JPEG")
+    return out.getvalue()
+
+
+class Upstream:
+    """Counts hits per path and the client ports they arrived from"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.hits = {}
+        self.client_ports = set()
+        self.jpeg = make_jpeg()
+
+    async def handle(self, request):
+        self.hits[request.path] = self.hits.get(request.path, 0) + 1
+        self.client_ports.add(request.transport.get_extra_info("peername")[1])
+        await asyncio.sleep(self.delay)
+        if request.path.startswith("/missing"):
+            return web.Response(status=404)
+        return web.Response(body=self.jpeg, content_type="image/jpeg")
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    """Run ``scenario(client, upstream, base_url)`` against the proxy and a local upstream."""
+    monkeypatch.setattr(settings, "IMAGE_PROXY_ALLOWED_DOMAINS", "127.0.0.1")
+    app = FastAPI()
+    app.include_router(images.router, prefix="/images")
+    app.dependency_overrides[get_current_user] = lambda: None
+    upstream = Upstream()
+
+    async def run(scenario):
+        server = web.Application()
+        server.router.add_get("/{name}", upstream.handle)
+        runner = web.AppRunner(server)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client, upstream, f"http://127.0.0.1:{port}")
+        finally:
+            await image_fetch.close_image_session()
+            await runner.cleanup()
+
+    return lambda scenario: asyncio.run(run(scenario))
+
+
+def get_image(client, url, **params):
+    return client.get("/images/image", params={"url": url, **params})
+
+
+def test_concurrent_identical_requests_share_one_fetch_and_resize(proxy):
+    async def scenario(client, upstream, base):
+        responses = await asyncio.gather(*(get_image(client, f"{base}/a.jpg", width=300) for _ in range(20)))
+        health = (await client.get("/images/health")).json()
+        return responses, upstream, health
+
+    responses, upstream, health = proxy(scenario)
+
+    assert [r.status_code for r in responses] == [200] * 20
+    assert len({r.headers["etag"] for r in responses}) == 1
+    assert Image.open(io.BytesIO(responses[0].content)).size == (300, 200)
+    assert upstream.hits == {"/a.jpg": 1}
+    assert health["workers"]["completed"] == 1
+    assert health["upstream"]["renders"]["coalesced"] == 19
+    assert health["upstream"]["renders"]["inflight"] == 0
+
+
+def test_different_sizes_of_one_source_share_the_fetch(proxy):
+    async def scenario(client, upstream, base):
+        responses = await asyncio.gather(
+            get_image(client, f"{base}/b.jpg", width=200),
+            get_image(client, f"{base}/b.jpg", width=400),
+            get_image(client, f"{base}/b.jpg"),  # original, unprocessed
+        )
+        return responses, upstream
+
+    responses, upstream = proxy(scenario)
+
+    assert [Image.open(io.BytesIO(r.content)).width for r in responses] == [200, 400, 1200]
+    assert upstream.hits == {"/b.jpg": 1}
+
+
+def test_sequential_fetches_reuse_one_pooled_connection(proxy):
+    async def scenario(client, upstream, base):
+        for name in ("c", "d", "e", "f"):
+            response = await get_image(client, f"{base}/{name}.jpg", width=100)
+            assert response.status_code == 200
+        return upstream
+
+    upstream = proxy(scenario)
+
+    assert sum(upstream.hits.values()) == 4
+    assert len(upstream.client_ports) == 1
+
+
+def test_upstream_errors_are_shared_but_not_remembered(proxy):
+    async def scenario(client, upstream, base):
+        first = await asyncio.gather(*(get_image(client, f"{base}/missing.jpg", width=100) for _ in range(5)))
+        again = await get_image(client, f"{base}/missing.jpg", width=100)
+        return first, again, upstream
+
+    first, again, upstream = proxy(scenario)
+
+    assert [r.status_code for r in first] == [404] * 5
+    assert again.status_code == 404
+    assert upstream.hits == {"/missing.jpg": 2}
+
+
+def test_disallowed_hosts_are_rejected(proxy):
+    async def scenario(client, upstream, base):
+        return await get_image(client, "http://example.com/a.jpg", width=100), upstream
+
+    response, upstream = proxy(scenario)
+    assert response.status_code == 400
+    assert upstream.hits == {}
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_task():
+    coalescer = RequestCoalescer()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        first = asyncio.ensure_future(coalescer.run("k", work))
+        second = asyncio.ensure_future(coalescer.run("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ("done", True)
+    assert calls == [1]
+    assert coalescer.stats() == {"started": 1, "coalesced": 1, "inflight": 0}
@@ -0,0 +1,155 @@
+"""
+Tests for image processing: JPEG draft decoding and the bounded worker pool
+
+The throughput benchmark scales generated 4000px JPEGs to 400/800/1200px;
+run it with ``pytest tests/test_image_processing.py -m slow -s`` to see
+images/sec.
+"""
+import asyncio
+import io
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.api.v1 import images
+from app.core.auth import get_current_user
+from app.services import image_pool
+from app.services.image_pool import ImageProcessingPool, ImageQueueFull
+from app.utils.image_processing import process_image
+
+BENCH_WIDTHS = (400, 800, 1200)
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    # Gradient with a little noise so the encoder has real work to do
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def decoded_size(image_bytes: bytes, width: int) -> tuple:
+    """Size libjpeg decodes at when process_image asks for ``width``."""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft(None, (width * 2, width * 2 * image.height // image.width))
+    return image.size
+
+
+def full_decode_resize(image_bytes, width, height, quality, target_format):
+    """process_image as it was before draft decoding (the benchmark baseline)."""
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    size = (width, int(width / image.width * image.height))
+    out = io.BytesIO()
+    image.resize(size, Image.LANCZOS).save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue(), "jpeg"
+
+
+def test_jpeg_downscale_decodes_at_reduced_size():
+    source = make_jpeg(1600, 1200)
+
+    assert decoded_size(source, 200) == (400, 300)  # 1/4 scale instead of 1600x1200
+    output, fmt = process_image(source, 200, None, 80, None)
+
+    assert fmt == "jpeg"
+    assert Image.open(io.BytesIO(output)).size == (200, 150)
+
+
+def test_upscale_and_format_conversion_are_unchanged():
+    source = make_jpeg(64, 48)
+    output, fmt = process_image(source, 128, None, 80, "webp")
+    assert fmt == "webp"
+    assert Image.open(io.BytesIO(output)).size == (128, 96)
+
+    rgba = Image.new("RGBA", (40, 40), (255, 0, 0, 128))
+    buf = io.BytesIO()
+    rgba.save(buf, format="PNG")
+    output, fmt = process_image(buf.getvalue(), None, 20, 80, "jpeg")
+    assert fmt == "jpeg"
+    assert Image.open(io.BytesIO(output)).mode == "RGB"
+
+
+def test_pool_runs_jobs_in_worker_processes():
+    pool = ImageProcessingPool(workers=1, max_pending=4)
+    try:
+        output, fmt = asyncio.run(pool.run(process_image, make_jpeg(800, 600), 100, None, 80, "png"))
+        worker_pid = asyncio.run(pool.run(os.getpid))
+    finally:
+        pool.shutdown()
+
+    assert fmt == "png"
+    assert Image.open(io.BytesIO(output)).size == (100, 75)
+    assert worker_pid != os.getpid()
+    assert pool.stats()["completed"] == 2
+
+
+def test_pool_rejects_jobs_beyond_the_queue_bound():
+    pool = ImageProcessingPool(workers=0, max_pending=2)
+
+    async def burst():
+        return await asyncio.gather(*(pool.run(time.sleep, 0.05) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    pool.shutdown()
+
+    assert [isinstance(r, ImageQueueFull) for r in results] == [False, False, True]
+    assert (pool.stats()["completed"], pool.stats()["rejected"]) == (2, 1)
+
+
+def test_upload_returns_503_when_the_queue_is_full(monkeypatch):
+    app = FastAPI()
+    app.include_router(images.router, prefix="/images")
+    app.dependency_overrides[get_current_user] = lambda: None
+    pool = image_pool.get_image_pool()
+    monkeypatch.setattr(pool, "_pending", pool.max_pending)
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/images/upload",
+            files={"file": ("a.jpg", make_jpeg(40, 30), "image/jpeg")},
+        )
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert pool.stats()["rejected"] == 1
+
+
+@pytest.mark.slow
+def test_draft_decoding_pool_beats_full_decode_throughput():
+    sources = [make_jpeg(4000, 3000) for _ in range(2)]
+    jobs = [(source, width) for source in sources for width in BENCH_WIDTHS]
+
+    async def run_all(runner):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(runner(source, width) for source, width in jobs))
+        return len(results) / (time.perf_counter() - start), results
+
+    async def baseline(source, width):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, full_decode_resize, source, width, None, 80, "jpeg"
+        )
+
+    pool = ImageProcessingPool(workers=os.cpu_count() or 1, max_pending=len(jobs))
+
+    async def pooled(source, width):
+        return await pool.run(process_image, source, width, None, 80, "jpeg")
+
+    try:
+        asyncio.run(pool.run(os.getpid))  # start the workers outside the timing
+        old_rate, _ = asyncio.run(run_all(baseline))
+        new_rate, results = asyncio.run(run_all(pooled))
+    finally:
+        pool.shutdown()
+
+    print(f"\n4000px JPEG -> {'/'.join(map(str, BENCH_WIDTHS))}px: full decode {old_rate:.1f} images/s, "
+          f"draft + {pool.workers} worker process(es) {new_rate:.1f} images/s")
+
+    widths = [Image.open(io.BytesIO(output)).width for output, _ in results]
+    assert widths == [width for _, width in jobs]
+    assert new_rate > old_rate
@@ -0,0 +1,104 @@
+"""
+Tests for eager responsive variants on image upload
+"""
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.api.v1 import images
+from app.core.auth import get_current_user
+from app.services.image_pool import get_image_pool
+from app.utils.image_processing import generate_variants
+
+
+def encode(image: Image.Image, fmt: str = "JPEG", **params) -> bytes:
+    out = io.BytesIO()
+    image.save(out, format=fmt, **params)
+    return out.getvalue()
+
+
+def photo(width: int, height: int) -> Image.Image:
+    return Image.linear_gradient("L").resize((width, height)).convert("RGB")
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(images.router, prefix="/images")
+    app.dependency_overrides[get_current_user] = lambda: None
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def upload(client, data: bytes, content_type: str = "image/jpeg"):
+    return client.post("/images/upload", files={"file": ("photo", data, content_type)})
+
+
+def test_upload_returns_srcset_manifest_for_every_width_and_format(client):
+    response = upload(client, encode(photo(2000, 1000)))
+
+    assert response.status_code == 201
+    manifest = response.json()["data"]
+    assert (manifest["width"], manifest["height"]) == (2000, 1000)
+    assert [(v["width"], v["format"]) for v in manifest["variants"]] == [
+        (w, fmt) for w in (320, 640, 960, 1280, 1920) for fmt in ("webp", "jpeg")
+    ]
+    assert manifest["srcset"]["webp"].split(", ")[0] == f'{manifest["variants"][0]["url"]} 320w'
+    assert manifest["srcset"]["jpeg"].endswith(" 1920w")
+    assert manifest["src"] == manifest["variants"][-1]["url"]
+    assert manifest["placeholder"].startswith("data:image/jpeg;base64,")
+    assert len(manifest["placeholder"]) < 1500
+
+    variant = manifest["variants"][2]
+    served = client.get(variant["url"])
+    assert served.status_code == 200
+    assert served.headers["content-type"] == "image/webp"
+    assert "immutable" in served.headers["cache-control"]
+    assert Image.open(io.BytesIO(served.content)).size == (640, 320)
+
+    assert client.get(f'/images/manifests/{manifest["id"]}').json()["data"] == manifest
+    assert client.get(manifest["original"]).status_code == 200
+
+
+def test_small_uploads_are_not_upscaled(client):
+    manifest = upload(client, encode(photo(500, 400), "PNG"), "image/png").json()["data"]
+
+    assert sorted({v["width"] for v in manifest["variants"]}) == [320, 500]
+    assert manifest["original"].endswith(".png")
+
+
+def test_repeated_upload_reuses_the_stored_variants(client):
+    data = encode(photo(800, 600))
+    first = upload(client, data).json()["data"]
+    second = upload(client, data).json()["data"]
+
+    assert first == second
+    assert get_image_pool().stats()["completed"] == 1
+
+
+def test_exif_orientation_is_applied():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90 degrees when displayed
+    rendered = generate_variants(encode(photo(400, 200), exif=exif), [100], ["jpeg"], 80, 8)
+
+    assert (rendered["width"], rendered["height"]) == (200, 400)
+    variant = rendered["variants"][0]
+    assert (variant["width"], variant["height"]) == (100, 200)
+    assert Image.open(io.BytesIO(variant["data"])).size == (100, 200)
+
+
+def test_transparent_png_keeps_alpha_in_webp_only():
+    image = Image.new("RGBA", (400, 400), (255, 0, 0, 0))
+    rendered = generate_variants(encode(image, "PNG"), [200], ["webp", "jpeg"], 80, 8)
+
+    modes = {v["format"]: Image.open(io.BytesIO(v["data"])).mode for v in rendered["variants"]}
+    assert modes == {"webp": "RGBA", "jpeg": "RGB"}
+
+
+def test_unreadable_upload_is_rejected(client):
+    assert upload(client, b"not an image").status_code == 400
+    assert client.get("/images/uploads/../../etc/passwd").status_code == 404
+    assert client.get(f'/images/manifests/{"0" * 64}').status_code == 404
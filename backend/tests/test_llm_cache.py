@@ -0,0 +1,137 @@
+"""
+Tests for the LLM response cache (LRU, persistent tier, single-flight)
+"""
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import llm_cache
+from app.services.llm_cache import LLMResponseCache, SQLiteResponseStore
+from app.services.smart_search_service import SmartSearchService
+from tests.llm_stub import StubLLMServer
+
+
+def test_prompt_normalization_shares_entries():
+    cache = LLMResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return "answer"
+
+    async def run():
+        await cache.get_or_compute("m", "model", "گوشي  Samsung", compute)
+        await cache.get_or_compute("m", "model", "گوشی samsung", compute)
+        await cache.get_or_compute("other", "model", "گوشی samsung", compute)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert cache.stats()["l1_hits"] == 1
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = LLMResponseCache(max_entries=2, ttl=10)
+
+    async def fill(*prompts):
+        for prompt in prompts:
+            await cache.get_or_compute("m", "model", prompt, lambda p=prompt: asyncio.sleep(0, result=p))
+
+    asyncio.run(fill("a", "b", "a", "c"))  # "b" is least recently used
+    assert cache._l1_get(cache.make_key("m", "model", "b")) is None
+    assert cache._l1_get(cache.make_key("m", "model", "a")) == "a"
+
+    now = __import__("time").time()
+    monkeypatch.setattr("app.services.llm_cache.time.time", lambda: now + 11)
+    assert cache._l1_get(cache.make_key("m", "model", "c")) is None
+
+
+def test_persistent_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+
+    async def first():
+        cache = LLMResponseCache(store=SQLiteResponseStore(path))
+        await cache.get_or_compute("m", "model", "q", lambda: asyncio.sleep(0, result="stored"))
+        await cache.close()
+
+    async def second():
+        cache = LLMResponseCache(store=SQLiteResponseStore(path))
+
+        async def fail():
+            raise AssertionError("should be served from the persistent tier")
+
+        value = await cache.get_or_compute("m", "model", "q", fail)
+        await cache.close()
+        return value, cache.stats()
+
+    asyncio.run(first())
+    value, stats = asyncio.run(second())
+    assert value == "stored"
+    assert stats["l2_hits"] == 1 and stats["misses"] == 0
+
+
+def test_app_shutdown_closes_the_store(tmp_path, monkeypatch):
+    store = SQLiteResponseStore(str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(llm_cache, "_llm_cache", LLMResponseCache(store=store))
+
+    with TestClient(app):  # startup, then shutdown
+        pass
+
+    assert llm_cache._llm_cache is None
+    with pytest.raises(sqlite3.ProgrammingError):
+        store._conn.execute("SELECT 1")
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    cache = LLMResponseCache()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def burst():
+        return await asyncio.gather(*(cache.get_or_compute("m", "model", "q", slow) for _ in range(50)))
+
+    assert asyncio.run(burst()) == ["value"] * 50
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 49
+
+
+def test_errors_are_shared_but_not_cached():
+    cache = LLMResponseCache()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def burst():
+        return await asyncio.gather(
+            *(cache.get_or_compute("m", "model", "q", boom) for _ in range(3)), return_exceptions=True
+        )
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(burst()))
+    assert asyncio.run(cache.get_or_compute("m", "model", "q", lambda: asyncio.sleep(0, result="ok"))) == "ok"
+
+
+def test_repeated_smart_search_hits_cache(db, monkeypatch, fresh_llm_cache):
+    with StubLLMServer(delay=0) as server:
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+        monkeypatch.setenv("DEEPSEEK_BASE_URL", server.base_url)
+        service = SmartSearchService(db)
+
+        asyncio.run(service.smart_search("samsung phone"))
+        first = server.requests
+        asyncio.run(service.smart_search("Samsung  Phone"))
+
+    assert first == 3  # no products, so no relevance batch
+    assert server.requests == first
+    assert fresh_llm_cache.stats()["l1_hits"] == 3
+
+
+@pytest.mark.parametrize("path", ["/api/v1/admin/ai-cache/stats"])
+def test_stats_endpoint_requires_admin(client, path):
+    assert client.get(path).status_code == 401
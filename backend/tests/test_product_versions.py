@@ -0,0 +1,106 @@
+"""
+Tests for version-based product validators (ETag / Last-Modified) and the
+catalog version counter
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.core.auth import get_current_admin_user
+from app.main import app
+from app.models.catalog_version import PRODUCTS_CATALOG, read_catalog_version
+from app.models.product import Product
+from app.models.user import User
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def catalog_version(db):
+    return read_catalog_version(db.connection(), PRODUCTS_CATALOG)[0]
+
+
+def test_every_product_change_bumps_the_catalog_version(db):
+    lamp, desk = Product(title="Lamp", price=20.0), Product(title="Desk", price=90.0)
+    db.add_all([lamp, desk])
+    db.commit()
+    assert sorted([lamp.version, desk.version]) == [1, 2]
+    assert catalog_version(db) == 2
+
+    lamp.price = 25.0
+    db.commit()
+    assert lamp.version == 3 and catalog_version(db) == 3
+
+    desk_version = desk.version
+    desk.title = "Desk"  # loaded and unchanged: no UPDATE, no bump
+    db.commit()
+    assert desk.version == desk_version and catalog_version(db) == 3
+
+    db.delete(desk)
+    db.commit()
+    assert catalog_version(db) == 4
+
+
+def test_product_detail_answers_conditional_requests_from_the_version(client, db, engine):
+    db.add(Product(id=1, title="Lamp", price=20.0))
+    db.commit()
+
+    response = client.get("/api/v1/products/1")
+    etag = response.headers["etag"]
+    assert etag == 'W/"product-1-1"'
+    assert response.json()["version"] == 1
+    assert response.headers["cache-control"] == "no-cache" and "last-modified" in response.headers
+
+    with count_queries(engine) as statements:
+        not_modified = client.get("/api/v1/products/1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    assert len(statements) == 1 and "products.version" in statements[0]
+
+    since = client.get("/api/v1/products/1", headers={"If-Modified-Since": response.headers["last-modified"]})
+    assert since.status_code == 304
+
+    admin = User(email="admin@example.com", username="admin", hashed_password="x", role="admin")
+    db.add(admin)
+    db.commit()
+    app.dependency_overrides[get_current_admin_user] = lambda: admin
+    try:
+        client.put("/api/v1/admin/products/1", data={
+            "title": "Floor lamp", "description": "Tall", "price": "35", "category": "Home", "image_url": "/lamp.jpg",
+        })
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+    changed = client.get("/api/v1/products/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["title"] == "Floor lamp"
+    assert changed.headers["etag"] != etag
+
+
+def test_product_listing_etag_is_the_catalog_version(client, db, engine):
+    db.add_all([Product(title=f"Product {i}", price=10.0 + i) for i in range(5)])
+    db.commit()
+
+    response = client.get("/api/v1/products/?limit=3")
+    etag = response.headers["etag"]
+    assert etag == 'W/"products-5"' and len(response.json()) == 3
+
+    with count_queries(engine) as statements:
+        not_modified = client.get("/api/v1/products/?limit=3", headers={"If-None-Match": f'"x", {etag}'})
+    assert not_modified.status_code == 304
+    assert len(statements) == 1 and "catalog_versions" in statements[0]
+
+    db.add(Product(title="New", price=1.0))
+    db.commit()
+    refreshed = client.get("/api/v1/products/?limit=3", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200 and refreshed.headers["etag"] == 'W/"products-6"'
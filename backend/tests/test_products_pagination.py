@@ -0,0 +1,113 @@
+"""
+Tests for keyset (cursor) pagination on GET /api/v1/products
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.product import Product
+
+
+@pytest.fixture
+def catalog(db):
+    base = datetime(2025, 1, 1)
+    products = []
+    for i in range(25):
+        products.append(Product(
+            title=f"Product {i}",
+            description="Wireless gadget" if i % 2 else "Cotton shirt",
+            price=float(10 + (i % 7)),  # plenty of ties
+            rating=float(i % 5),
+            category="Electronics" if i % 3 else "Clothing",
+            is_active=True,
+            is_featured=False,
+            created_at=base + timedelta(hours=i % 4),
+        ))
+    db.add_all(products)
+    db.commit()
+    return products
+
+
+def _walk(client, params):
+    ids, cursor = [], None
+    while True:
+        page_params = dict(params)
+        if cursor:
+            page_params["cursor"] = cursor
+        response = client.get("/api/v1/products/", params=page_params)
+        assert response.status_code == 200, response.text
+        ids.extend(p["id"] for p in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+
+
+@pytest.mark.parametrize("sort_by", ["id", "price", "rating", "created_at"])
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_cursor_pages_match_offset_listing(client, catalog, sort_by, sort_order):
+    params = {"sort_by": sort_by, "sort_order": sort_order}
+    full = client.get("/api/v1/products/", params={**params, "limit": 1000}).json()
+
+    walked = _walk(client, {**params, "limit": 4})
+
+    assert walked == [p["id"] for p in full]
+    assert len(set(walked)) == 25
+
+
+def test_cursor_respects_filters(client, catalog):
+    params = {"category": "Electronics", "min_price": 11, "search": "wireless", "sort_by": "price", "limit": 2}
+    expected = client.get("/api/v1/products/", params={**params, "limit": 1000}).json()
+
+    walked = _walk(client, params)
+
+    assert walked == [p["id"] for p in expected]
+    assert all(p["category"] == "Electronics" and p["price"] >= 11 for p in expected)
+
+
+def test_cursor_rejects_mismatched_sort(client, catalog):
+    response = client.get("/api/v1/products/", params={"sort_by": "price", "limit": 2})
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/v1/products/", params={"sort_by": "rating", "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_invalid_cursor_and_skip_combination(client, catalog):
+    assert client.get("/api/v1/products/", params={"cursor": "not-a-cursor!"}).status_code == 400
+    response = client.get("/api/v1/products/", params={"limit": 2})
+    cursor = response.headers["X-Next-Cursor"]
+    assert client.get("/api/v1/products/", params={"cursor": cursor, "skip": 5}).status_code == 400
+
+
+@pytest.mark.parametrize("sort_order", ["asc", "desc"])
+def test_cursor_pages_past_null_sort_values(client, db, catalog, sort_order):
+    for product in catalog[::4]:
+        product.rating = None
+    db.commit()
+    params = {"sort_by": "rating", "sort_order": sort_order}
+    full = client.get("/api/v1/products/", params={**params, "limit": 1000}).json()
+
+    walked = _walk(client, {**params, "limit": 3})
+
+    assert walked == [p["id"] for p in full]
+    assert len(set(walked)) == 25
+    nulls = [p["id"] for p in full if p["rating"] is None]
+    assert len(nulls) == 7
+    assert (walked[:7] if sort_order == "asc" else walked[-7:]) == nulls  # NULLs sort lowest
+
+
+def _cursor(payload):
+    raw = json.dumps(payload).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("sort_by,value", [
+    ("rating", "high"), ("rating", True), ("price", None),
+    ("created_at", 12), ("created_at", "yesterday"), ("id", None), ("id", "7"),
+])
+def test_cursor_rejects_null_or_mistyped_values(client, catalog, sort_by, value):
+    cursor = _cursor({"s": sort_by, "o": "asc", "v": value, "id": 3})
+    response = client.get("/api/v1/products/", params={"sort_by": sort_by, "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,143 @@
+"""
+Tests for the shared purchase-history repository
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api.v1 import chat
+
+from app.core.auth import get_current_active_user, get_current_user
+from app.database import get_db
+from app.main import app
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+from app.services.ai_chat_service import AIChatService
+from app.services.cart_suggestion_service import CartSuggestionService
+from app.services.purchase_history import OrderSummary, PurchaseHistoryRepository
+from app.services.recommendation_service import RecommendationService
+from app.utils.product_search import ProductSearch
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def make_order(db, user, products, created_at, status="pending"):
+    order = Order(
+        user_id=user.id, full_name="Buyer", email="b@example.com", phone="1", address="a", city="c",
+        state="s", zip_code="1", shipping_method="standard", payment_method="cod",
+        subtotal=1, shipping_cost=0, tax=0, total=sum(p.price for p in products),
+        status=status, created_at=created_at,
+    )
+    order.items = [OrderItem(product_id=p.id, quantity=1, price_at_time=p.price) for p in products]
+    db.add(order)
+    return order
+
+
+@pytest.fixture
+def history(db):
+    user = User(email="buyer@example.com", username="buyer", hashed_password="x")
+    products = [Product(title=f"Item {i}", price=10.0 + i, category="mobile" if i % 2 else "case") for i in range(6)]
+    db.add(user)
+    db.add_all(products)
+    db.commit()
+    start = datetime(2024, 1, 1)
+    orders = [make_order(db, user, products[i:i + 3], start + timedelta(days=i)) for i in range(5)]
+    db.commit()
+    for obj in [user, *products, *orders]:
+        db.refresh(obj)  # load attributes now so tests only count the queries under test
+    return user, products, orders
+
+
+def test_recent_orders_use_one_query(db, engine, history):
+    user, products, orders = history
+
+    with count_queries(engine) as statements:
+        recent = ProductSearch(db).get_user_orders(user.id)
+
+    assert len(statements) == 1
+    assert [order.id for order in recent] == [orders[4].id, orders[3].id, orders[2].id]
+    assert isinstance(recent[0], OrderSummary)
+    assert [item.title for item in recent[0].items] == ["Item 4", "Item 5"]
+    assert recent[2].items[0].price_at_time == products[2].price
+
+
+def test_history_loaders_use_one_query_and_cache(db, engine, history):
+    user, _, _ = history
+
+    with count_queries(engine) as statements:
+        items = RecommendationService(db, user.id)._get_user_purchase_history()
+        again = CartSuggestionService(db, user.id)._get_user_purchase_history()
+
+    assert len(statements) == 1
+    assert again is items
+    assert len(items) == 10
+    assert items[0].order_id == history[2][4].id
+
+
+def test_chat_prompt_formats_order_summaries(db, history):
+    user, _, orders = history
+    prompt = AIChatService._format_orders_for_prompt_static(ProductSearch(db).get_user_orders(user.id))
+    assert f"Order ID: {orders[4].id}, Date: 2024-01-05T00:00:00, Status: pending" in prompt
+    assert "Items: 2 products" in prompt
+
+
+def test_chat_message_returns_recent_orders_as_objects(db, history, monkeypatch):
+    user, _, orders = history
+
+    async def answer(self, message, context):
+        return "Your latest order is pending."
+
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(AIChatService, "get_chat_response", answer)
+    chat_app = FastAPI()  # the chat router is not mounted in the main app
+    chat_app.include_router(chat.router, prefix="/chat")
+    chat_app.dependency_overrides[get_db] = lambda: db
+    chat_app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(chat_app) as chat_client:
+        response = chat_client.post("/chat/message", json={"message": "where is my order?"})
+
+    assert response.status_code == 200, response.text
+    recent = response.json()["context"]["recent_orders"]
+    assert [order["id"] for order in recent] == [orders[4].id, orders[3].id, orders[2].id]
+    assert set(recent[0]) == {"id", "status", "total", "created_at", "items"}
+    assert set(recent[0]["items"][0]) == {
+        "order_id", "product_id", "title", "category", "price", "quantity", "price_at_time",
+    }
+    assert recent[0]["created_at"] == "2024-01-05T00:00:00"
+
+
+def test_create_order_invalidates_cached_history(client, db, history):
+    user, products, _ = history
+    repository = PurchaseHistoryRepository(db)
+    assert len(repository.recent_orders(user.id)) == 3
+
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    try:
+        response = client.post("/api/v1/orders/", json={
+            "full_name": "Buyer", "email": "b@example.com", "phone": "1", "address": "a", "city": "c",
+            "state": "s", "zip_code": "1", "shipping_method": "standard", "payment_method": "cod",
+            "subtotal": 10, "shipping_cost": 0, "tax": 0, "total": 10,
+            "items": [{"product_id": products[0].id, "quantity": 1, "price_at_time": 10}],
+        })
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+    assert response.status_code == 200
+
+    assert response.json()["id"] in [order.id for order in repository.recent_orders(user.id)]
@@ -0,0 +1,129 @@
+"""
+Tests for the async token-bucket rate limiter
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import rate_limiter
+from app.services.rate_limiter import (
+    LocalBucketStore,
+    RateLimiter,
+    RateLimitExceeded,
+    RedisBucketStore,
+    get_rate_limiter,
+)
+
+
+def test_burst_up_to_capacity_then_deadline_fails_fast():
+    limiter = RateLimiter(max_requests_per_minute=5, daily_limit=100, max_wait=0.2)
+
+    async def run():
+        for _ in range(5):
+            await limiter.acquire()
+        start = time.perf_counter()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire()  # next token is 12s away, far beyond the deadline
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 0.1
+
+
+def test_waiters_sleep_without_blocking_the_loop():
+    # 600/minute refills one token every 100ms
+    limiter = RateLimiter(max_requests_per_minute=600, daily_limit=10000, max_wait=2)
+    limiter.buckets[0] = limiter.buckets[0]._replace(capacity=1, period=0.1)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.02)
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(ticker(), *(limiter.acquire() for _ in range(3)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.15 < elapsed < 0.6
+    assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.15
+
+
+def test_daily_budget_is_enforced():
+    limiter = RateLimiter(max_requests_per_minute=100, daily_limit=3, max_wait=0.5)
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire()
+
+    asyncio.run(run())
+
+
+def test_limiters_are_shared_per_process():
+    assert get_rate_limiter("deepseek", 30, 1000) is get_rate_limiter("deepseek", 30, 1000)
+
+
+def test_redis_budget_holds_across_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+
+    def worker():
+        return RateLimiter(10, 1000, name="deepseek", max_wait=0,
+                           store=RedisBucketStore(fakeredis.aioredis.FakeRedis(server=server)))
+
+    async def run():
+        workers = [worker() for _ in range(4)]
+        admitted = 0
+        for _ in range(5):
+            for limiter in workers:
+                try:
+                    await limiter.acquire()
+                    admitted += 1
+                except RateLimitExceeded:
+                    pass
+        return admitted
+
+    # Four workers together get the configured 10/minute, not 4 x 10
+    assert asyncio.run(run()) == 10
+
+
+def test_redis_failure_falls_back_to_local_buckets():
+    class BrokenStore:
+        async def take(self, *args):
+            raise ConnectionError("redis down")
+
+    limiter = RateLimiter(2, 100, store=BrokenStore(), max_wait=0)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.acquire()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire()
+
+    asyncio.run(run())
+    assert isinstance(limiter._fallback_store, LocalBucketStore)
+
+
+def test_app_shutdown_closes_the_redis_stores(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    closed = []
+
+    class ClosingStore(RedisBucketStore):
+        async def close(self):
+            await super().close()
+            closed.append(self)
+
+    monkeypatch.setattr(rate_limiter, "_create_store", lambda: ClosingStore(fakeredis.aioredis.FakeRedis()))
+    limiter = get_rate_limiter("deepseek", 30, 1000)
+
+    with TestClient(app):  # startup, then shutdown
+        pass
+
+    assert closed == [limiter.store]
+    assert get_rate_limiter("deepseek", 30, 1000) is not limiter
@@ -0,0 +1,133 @@
+"""
+Tests for the Redis cache backend (run against fakeredis)
+"""
+import asyncio
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from app.utils.cache_utils import BinarySerializer, RedisCache, cached, set_redis_cache
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("msgpack")
+
+
+def make_cache(**kwargs) -> RedisCache:
+    return RedisCache(client=fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer()), **kwargs)
+
+
+def test_serializer_round_trips_rich_types_and_compresses_large_values():
+    serializer = BinarySerializer(compress_threshold=1024)
+    value = {
+        "when": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "day": date(2024, 5, 1),
+        "price": Decimal("19.99"),
+        "id": uuid4(),
+        "tags": {"sale", "new"},
+        "ids": [1, 2, 3],
+        "missing": None,
+        7: "int keys",
+    }
+    assert serializer.loads(serializer.dumps(value)) == value
+
+    small = serializer.dumps({"a": 1})
+    large = serializer.dumps(["product description"] * 500)
+    assert small[:1] == BinarySerializer.RAW
+    assert large[:1] == BinarySerializer.COMPRESSED and len(large) < 1024
+    assert serializer.loads(large) == ["product description"] * 500
+
+    with pytest.raises(TypeError):
+        serializer.dumps(object())
+
+
+def test_batched_reads_and_writes():
+    async def scenario():
+        cache = make_cache()
+        await cache.set_many({"a": 1, "b": [2], "c": {"x": Decimal("3.5")}}, ttl=60)
+        found = await cache.get_many(["a", "b", "c", "absent"])
+        assert found == {"a": 1, "b": [2], "c": {"x": Decimal("3.5")}}
+        assert 0 < await cache._redis.ttl("cache:a") <= 60
+        assert await cache.delete("a", "b") == 2
+        assert await cache.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_tag_invalidation_removes_every_tagged_key():
+    async def scenario():
+        cache = make_cache()
+        await cache.set("product:1:en", "one", tags=["product:1"])
+        await cache.set("product:1:ar", "uno", tags=["product:1", "catalog"])
+        await cache.set("product:2:en", "two", tags=["product:2", "catalog"], ttl=600)
+        assert 300 < await cache._redis.ttl("cache:tag:catalog") <= 600  # longest member wins
+
+        assert await cache.invalidate_tags("product:1") == 2
+        assert await cache.get_many(["product:1:en", "product:1:ar", "product:2:en"]) == {"product:2:en": "two"}
+        assert not await cache._redis.exists("cache:tag:product:1")
+
+        assert await cache.invalidate_tags("catalog") == 1  # the already-removed key is not counted
+        assert await cache.get("product:2:en") is None
+
+    asyncio.run(scenario())
+
+
+def test_clear_pattern_scans_in_batches_and_stays_in_its_prefix():
+    async def scenario():
+        cache = make_cache()
+        await cache.set_many({f"search:{i}": i for i in range(1200)})
+        await cache.set("product:1", "kept")
+        await cache._redis.set("search:outside-prefix", "kept")
+
+        assert await cache.clear_pattern("search:*", batch_size=100) == 1200
+        assert await cache.get("product:1") == "kept"
+        assert await cache._redis.get("search:outside-prefix") == b"kept"
+
+    asyncio.run(scenario())
+
+
+def test_cached_redis_backend_shares_results_and_invalidates_by_tag():
+    cache = make_cache()
+    set_redis_cache(cache)
+    calls = []
+
+    @cached(ttl=60, cache_type="redis", tags=lambda product_id: [f"product:{product_id}"])
+    async def product_card(product_id):
+        calls.append(product_id)
+        await asyncio.sleep(0.01)
+        return {"id": product_id, "price": Decimal("9.50")}
+
+    async def scenario():
+        results = await asyncio.gather(*(product_card(1) for _ in range(100)))
+        assert results == [{"id": 1, "price": Decimal("9.50")}] * 100
+        assert await product_card(1) == results[0]
+        assert calls == [1]
+
+        await cache.invalidate_tags("product:1")
+        await product_card(1)
+        assert calls == [1, 1]
+
+        await product_card.invalidate(1)
+        assert await cache.get(product_card.__name__ + ":1") is None
+
+    asyncio.run(scenario())
+    assert product_card.cache is None
+
+
+def test_cached_redis_backend_requires_async_and_degrades_without_redis():
+    with pytest.raises(ValueError):
+        @cached(cache_type="redis")
+        def sync_lookup():
+            return 1
+
+    calls = []
+
+    @cached(cache_type="redis")
+    async def lookup():
+        calls.append(1)
+        return 1
+
+    asyncio.run(lookup())
+    asyncio.run(lookup())
+    assert len(calls) == 2  # no REDIS_URL: computed every time, never raises
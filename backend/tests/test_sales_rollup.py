@@ -0,0 +1,203 @@
+"""
+Tests for the incrementally maintained daily sales rollup
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.auth import get_current_active_user, get_current_admin_user
+from app.main import app
+from app.models.daily_sales import DailyCategorySales, DailySales
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.models.user import User
+from app.services import sales_rollup
+from app.services.ai_insights_service import AIInsightsService
+
+from .test_query_indexes import BACKEND_DIR
+
+
+def rollup_rows(db):
+    db.expire_all()
+    days = {
+        row.date: (row.order_count, round(row.revenue, 2), row.pending_count, row.processing_count,
+                   row.shipped_count, row.delivered_count, row.cancelled_count)
+        for row in db.scalars(select(DailySales))
+    }
+    categories = {
+        (row.date, row.category): (round(row.revenue, 2), row.quantity)
+        for row in db.scalars(select(DailyCategorySales))
+    }
+    return days, categories
+
+
+@pytest.fixture
+def shop(db):
+    admin = User(email="admin@example.com", username="admin", hashed_password="x", role="admin")
+    buyer = User(email="buyer@example.com", username="buyer", hashed_password="x")
+    phone = Product(title="Phone", price=100.0, category="mobile")
+    case = Product(title="Case", price=10.0, category="accessories")
+    db.add_all([admin, buyer, phone, case])
+    db.commit()
+    return admin, buyer, phone, case
+
+
+@pytest.fixture
+def api(client, shop):
+    admin, buyer, _, _ = shop
+    app.dependency_overrides[get_current_admin_user] = lambda: admin
+    app.dependency_overrides[get_current_active_user] = lambda: buyer
+    yield client
+    app.dependency_overrides.pop(get_current_admin_user, None)
+    app.dependency_overrides.pop(get_current_active_user, None)
+
+
+def place_order(api, items, total):
+    response = api.post("/api/v1/orders/", json={
+        "full_name": "Buyer", "email": "b@example.com", "phone": "1", "address": "a", "city": "c",
+        "state": "s", "zip_code": "1", "shipping_method": "standard", "payment_method": "cod",
+        "subtotal": total, "shipping_cost": 0, "tax": 0, "total": total,
+        "items": [{"product_id": p.id, "quantity": q, "price_at_time": p.price} for p, q in items],
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_order_endpoints_keep_rollup_in_step_with_backfill(api, db, shop):
+    _, _, phone, case = shop
+    first = place_order(api, [(phone, 1), (case, 2)], 120.0)
+    second = place_order(api, [(case, 1)], 10.0)
+    third = place_order(api, [(phone, 2)], 200.0)
+
+    assert api.put(f"/api/v1/orders/{first}/cancel").status_code == 200
+    assert api.put(f"/api/v1/admin/orders/{second}/status", data={"status": "shipped"}).status_code == 200
+    assert api.delete(f"/api/v1/admin/orders/{third}").status_code == 200
+
+    today = sales_rollup.sales_date(db.get(Order, first).created_at)
+    days, categories = rollup_rows(db)
+    assert days == {today: (2, 130.0, 0, 0, 1, 0, 1)}
+    assert categories == {
+        (today, "mobile"): (100.0, 1),
+        (today, "accessories"): (30.0, 3),
+    }
+
+    assert sales_rollup.backfill(db) == 1
+    db.commit()
+    assert rollup_rows(db) == (days, categories)
+
+
+def test_cancel_rejects_shipped_orders(api, db, shop):
+    _, _, phone, _ = shop
+    order_id = place_order(api, [(phone, 1)], 100.0)
+    assert api.put(f"/api/v1/admin/orders/{order_id}/status", data={"status": "shipped"}).status_code == 200
+
+    assert api.put(f"/api/v1/orders/{order_id}/cancel").status_code == 400
+    days, _ = rollup_rows(db)
+    assert list(days.values()) == [(1, 100.0, 0, 0, 1, 0, 0)]
+
+
+def test_reports_read_the_rollup(api, db, shop):
+    _, buyer, phone, _ = shop
+    now = datetime.utcnow()
+    for days_ago, total in [(40, 50.0), (3, 20.0), (3, 30.0), (0, 5.0)]:
+        order = Order(
+            user_id=buyer.id, full_name="Buyer", email="b@example.com", phone="1", address="a", city="c",
+            state="s", zip_code="1", shipping_method="standard", payment_method="cod",
+            subtotal=total, shipping_cost=0, tax=0, total=total, status="pending",
+            created_at=now - timedelta(days=days_ago),
+        )
+        order.items = [OrderItem(product_id=phone.id, quantity=1, price_at_time=total)]
+        db.add(order)
+    db.commit()
+    sales_rollup.backfill(db)
+    db.commit()
+
+    chart = api.get("/api/v1/admin/dashboard/revenue-chart", params={"days": 30}).json()
+    assert chart == [
+        {"date": (now - timedelta(days=3)).date().isoformat(), "revenue": 50.0, "orders": 2},
+        {"date": now.date().isoformat(), "revenue": 5.0, "orders": 1},
+    ]
+    stats = api.get("/api/v1/admin/dashboard/stats").json()["data"]
+    assert stats["revenue_chart"] == chart
+
+    # The rollup is the source: orders missing from it are not reported
+    db.execute(DailySales.__table__.delete())
+    db.commit()
+    assert api.get("/api/v1/admin/dashboard/revenue-chart").json() == []
+
+    sales_rollup.backfill(db)
+    db.commit()
+    month = AIInsightsService(db)._get_current_month_sales()
+    expected = [total for days_ago, total in [(40, 50.0), (3, 20.0), (3, 30.0), (0, 5.0)]
+                if (now - timedelta(days=days_ago)).month == now.month]
+    assert month["orders"] == len(expected)
+    assert month["revenue"] == sum(expected)
+
+
+def test_backfill_since_only_rebuilds_later_days(db, shop):
+    _, buyer, _, _ = shop
+    db.add_all([
+        DailySales(date=date(2024, 1, 1), order_count=7, revenue=70.0, pending_count=7, processing_count=0,
+                   shipped_count=0, delivered_count=0, cancelled_count=0),
+        Order(
+            user_id=buyer.id, full_name="Buyer", email="b@example.com", phone="1", address="a", city="c",
+            state="s", zip_code="1", shipping_method="standard", payment_method="cod",
+            subtotal=5, shipping_cost=0, tax=0, total=5, status="delivered", created_at=datetime(2024, 2, 1, 10),
+        ),
+    ])
+    db.commit()
+
+    assert sales_rollup.backfill(db, since=date(2024, 1, 15)) == 1
+    db.commit()
+    days, _ = rollup_rows(db)
+    assert days == {
+        date(2024, 1, 1): (7, 70.0, 7, 0, 0, 0, 0),
+        date(2024, 2, 1): (1, 5.0, 0, 0, 0, 1, 0),
+    }
+
+
+def test_migration_backfill_matches_the_service(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'rollup.db'}"
+    monkeypatch.setattr(settings, "DATABASE_URL", url)  # read by alembic/env.py
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    command.upgrade(config, "008")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO products (id, title, price, category, created_at)"
+            " VALUES (1, 'Phone', 100, 'mobile', '2024-01-01'), (2, 'Cable', 5, NULL, '2024-01-01')"
+        )
+        for order_id, created_at, status, total in [
+            (1, "2024-02-01 10:00:00", "delivered", 105.0),
+            (2, "2024-02-01 23:30:00", "pending", 10.0),
+            (3, "2024-02-02 00:10:00", "cancelled", 100.0),
+        ]:
+            conn.exec_driver_sql(
+                "INSERT INTO orders (id, full_name, email, phone, address, city, state, zip_code, shipping_method,"
+                " payment_method, subtotal, shipping_cost, tax, total, status, created_at)"
+                " VALUES (?, 'B', 'b@x', '1', 'a', 'c', 's', '1', 'standard', 'cod', ?, 0, 0, ?, ?, ?)",
+                (order_id, total, total, status, created_at),
+            )
+        conn.exec_driver_sql(
+            "INSERT INTO order_items (order_id, product_id, quantity, price_at_time)"
+            " VALUES (1, 1, 1, 100), (1, 2, 1, 5), (2, 2, 2, 5), (3, 1, 1, 100)"
+        )
+
+    command.upgrade(config, "head")
+
+    with Session(engine) as db:
+        migrated = rollup_rows(db)
+        assert migrated[0] == {
+            date(2024, 2, 1): (2, 115.0, 1, 0, 0, 1, 0),
+            date(2024, 2, 2): (1, 100.0, 0, 0, 0, 0, 1),
+        }
+        sales_rollup.backfill(db)
+        db.commit()
+        assert rollup_rows(db) == migrated
+    engine.dispose()
@@ -0,0 +1,68 @@
+"""
+Tests for the full-text product search backends
+"""
+import pytest
+
+from app.models.product import Product
+from app.utils.product_search import ProductSearch
+from app.utils.search_index import (
+    LikeSearchBackend,
+    SQLiteFTS5Backend,
+    get_search_backend,
+)
+
+
+@pytest.fixture
+def products(db):
+    items = [
+        Product(title="Samsung Galaxy S23", description="Android phone", price=900, category="Mobile", tags="samsung,phone"),
+        Product(title="Leather wallet", description="Fits a Samsung phone too", price=40, category="Accessories", tags="wallet"),
+        Product(title="Cotton shirt", description="Summer wear", price=25, category="Clothing", tags="cotton"),
+        Product(title="Old phone", description="Discontinued", price=10, category="Mobile", tags="phone", is_active=False),
+    ]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def test_sqlite_uses_fts5_backend(db):
+    assert isinstance(get_search_backend(db), SQLiteFTS5Backend)
+
+
+def test_search_ranks_title_matches_first(db, products):
+    results = ProductSearch(db).search_products("samsung")
+
+    assert [p["title"] for p in results] == ["Samsung Galaxy S23", "Leather wallet"]
+
+
+def test_index_follows_inserts_updates_and_deletes(db, products):
+    backend = get_search_backend(db)
+    shirt = products[2]
+
+    shirt.title = "Linen shirt"
+    db.add(Product(title="Linen trousers", price=50, category="Clothing"))
+    db.delete(products[1])
+    db.commit()
+
+    titles = [p.title for p in backend.search(db.query(Product), "linen").all()]
+    assert sorted(titles) == ["Linen shirt", "Linen trousers"]
+    assert backend.search(db.query(Product), "cotton").all() == [shirt]
+    assert backend.search(db.query(Product), "wallet").all() == []
+
+
+def test_query_operators_are_escaped(db, products):
+    backend = get_search_backend(db)
+    assert backend.search(db.query(Product), 'samsung" OR NOT "x').all() == []
+    assert backend.filter(db.query(Product), "*** ").count() == len(products)
+
+
+def test_like_backend_matches_every_token(db, products):
+    backend = LikeSearchBackend()
+    titles = [p.title for p in backend.search(db.query(Product), "samsung phone").all()]
+    assert sorted(titles) == ["Leather wallet", "Samsung Galaxy S23"]
+
+
+def test_read_products_search_uses_index(client, products):
+    response = client.get("/api/v1/products/", params={"search": "gala"})
+    assert response.status_code == 200
+    assert [p["title"] for p in response.json()] == ["Samsung Galaxy S23"]
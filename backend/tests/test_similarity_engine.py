@@ -0,0 +1,117 @@
+"""
+Tests for the vectorized item-similarity engine
+"""
+import random
+
+import numpy as np
+import pytest
+
+from app.models.product import Product
+from app.services import similarity_engine
+from app.services.cart_suggestion_service import CartSuggestionService
+from app.services.purchase_history import PurchasedItem
+from app.services.recommendation_service import RecommendationService
+from app.services.similarity_engine import ItemSimilarityEngine, get_similarity_engine
+
+CATEGORIES = ["mobile", "case", "charger", "laptop", None]
+TAGS = ["android", "ios", "5g", "leather", "usb-c", "gaming"]
+
+
+def pairwise_score(a, b):
+    """The original per-pair rule the engine replaces"""
+    score = 0.0
+    if a[1] and a[1] == b[1]:
+        score += 0.3
+    if a[3] > 0 and b[3] > 0:
+        ratio = min(a[3], b[3]) / max(a[3], b[3])
+        if ratio > 0.7:
+            score += 0.2
+        elif ratio > 0.5:
+            score += 0.1
+    if a[2] and b[2]:
+        common = set(a[2].lower().split(",")) & set(b[2].lower().split(","))
+        if common:
+            score += min(0.5, len(common) * 0.1)
+    return min(1.0, score)
+
+
+@pytest.fixture
+def catalog_rows():
+    rng = random.Random(3)
+    return [
+        (
+            i,
+            rng.choice(CATEGORIES),
+            ",".join(rng.sample(TAGS, rng.randint(0, 4))) or None,
+            rng.choice([0.0, rng.uniform(1, 500)]),
+            round(rng.uniform(0, 5), 1),
+            rng.random() > 0.1,
+        )
+        for i in range(1, 201)
+    ]
+
+
+def test_similarity_matches_pairwise_rule(catalog_rows):
+    engine = ItemSimilarityEngine(catalog_rows)
+    ids = [row[0] for row in catalog_rows]
+    for main in catalog_rows[:20]:
+        expected = [pairwise_score(main, other) for other in catalog_rows]
+        np.testing.assert_allclose(engine.similarity(main[0], ids), expected, atol=1e-6)
+
+
+def test_top_k_agrees_with_full_sort(catalog_rows):
+    engine = ItemSimilarityEngine(catalog_rows)
+    main = catalog_rows[0]
+    expected = sorted(
+        (row for row in catalog_rows[1:] if row[5]),
+        key=lambda row: (-round(pairwise_score(main, row), 6), -row[4]),
+    )[:10]
+
+    top = engine.top_k(main[0], 10)
+
+    assert [score for _, score in top] == pytest.approx([pairwise_score(main, row) for row in expected])
+    assert [engine.rating[engine._rows[pid]] for pid, _ in top] == [row[4] for row in expected]
+
+
+def test_unknown_products_score_zero(catalog_rows):
+    engine = ItemSimilarityEngine(catalog_rows)
+    assert engine.similarity(1, [999_999]).tolist() == [0.0]
+    assert engine.top_k(999_999, 5) == []
+
+
+def test_engine_rebuilds_when_catalog_changes(db, monkeypatch):
+    db.add(Product(title="Phone", price=100, category="mobile", tags="android"))
+    db.commit()
+    first = get_similarity_engine(db)
+    assert get_similarity_engine(db) is first
+
+    db.add(Product(title="Phone 2", price=110, category="mobile", tags="android"))
+    db.commit()
+    second = get_similarity_engine(db)
+
+    assert second is not first
+    assert len(second) == 2
+
+    # Edits made by another worker are found through the catalog fingerprint
+    monkeypatch.setattr(similarity_engine, "FINGERPRINT_INTERVAL", 0.0)
+    db.execute(Product.__table__.insert().values(title="Case", price=10, category="case", is_active=True))
+    db.commit()
+    assert len(get_similarity_engine(db)) == 3
+
+
+def test_services_share_engine_ranking(db):
+    phone = Product(title="Phone", price=300, category="mobile", tags="android,5g", rating=4.0)
+    twin = Product(title="Phone twin", price=310, category="mobile", tags="android,5g", rating=3.0)
+    other = Product(title="Old phone", price=90, category="mobile", tags="ios", rating=5.0)
+    case = Product(title="Case", price=15, category="case", tags="android", rating=4.5)
+    db.add_all([phone, twin, other, case])
+    db.commit()
+
+    related = RecommendationService(db)._get_related_products(phone, limit=2)
+    assert [p.id for p in related] == [twin.id, other.id]
+
+    service = CartSuggestionService(db)
+    history = [PurchasedItem(1, case.id, "Case", "case", 15, 1, 15)]
+    cart = {"cart_products": [service._product_to_dict(phone)], "user_history": history}
+    scored = service._score_suggestions([twin, case], cart)
+    assert [(item["id"], item["score"]) for item in scored] == [(case.id, pytest.approx(1.0)), (twin.id, pytest.approx(0.3))]
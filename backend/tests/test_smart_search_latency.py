@@ -0,0 +1,89 @@
+"""
+Benchmark: batched/concurrent LLM calls in SmartSearchService.smart_search
+
+Run with ``pytest tests/test_smart_search_latency.py -s`` to see timings.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.models.product import Product
+from app.services.smart_search_service import SmartSearchService
+from tests.llm_stub import StubLLMServer
+
+LLM_DELAY = 0.05
+QUERY = "samsung phone"
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    with StubLLMServer(delay=LLM_DELAY) as server:
+        monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+        monkeypatch.setenv("DEEPSEEK_BASE_URL", server.base_url)
+        monkeypatch.setenv("DEEPSEEK_RATE_LIMIT_PER_MINUTE", "10000")
+        yield server
+
+
+@pytest.fixture
+def phones(db):
+    db.add_all([
+        Product(title=f"Samsung phone {i}", description="Android smartphone", price=100 + i, category="mobile")
+        for i in range(25)
+    ])
+    db.commit()
+
+
+async def _sequential_baseline(service: SmartSearchService, query: str) -> None:
+    """The pre-batching call pattern: one awaited LLM round trip per step."""
+    ai = service.ai_service
+    filters = await ai.extract_search_filters(query)
+    products = service.build_sql_query(filters).limit(20).all()
+    for product in products:
+        await ai.analyze_product_relevance(query, product.title, product.description)
+    await ai.generate_search_explanation(query, filters, len(products))
+    await ai.generate_related_searches(query)
+
+
+@pytest.mark.slow
+def test_smart_search_batches_llm_calls(db, phones, stub_llm, fresh_llm_cache):
+    service = SmartSearchService(db)
+    assert service.ai_service.deepseek.enabled
+
+    start = time.perf_counter()
+    asyncio.run(_sequential_baseline(service, QUERY))
+    baseline = time.perf_counter() - start
+    baseline_requests = stub_llm.requests
+
+    fresh_llm_cache.clear()
+    stub_llm.requests = 0
+    start = time.perf_counter()
+    result = asyncio.run(service.smart_search(QUERY))
+    batched = time.perf_counter() - start
+
+    print(f"\nsmart_search with {LLM_DELAY * 1000:.0f} ms LLM latency: "
+          f"sequential {baseline * 1000:.0f} ms / {baseline_requests} calls, "
+          f"batched {batched * 1000:.0f} ms / {stub_llm.requests} calls")
+
+    assert result["total_results"] == 20
+    assert all(r["ai_relevance"]["relevance_score"] == 7 for r in result["results"])
+    assert stub_llm.requests == 4  # filters + one relevance batch + explanation + related
+    assert batched * 4 < baseline
+
+
+def test_batch_relevance_falls_back_per_product(db):
+    service = SmartSearchService(db)
+    deepseek = service.ai_service.deepseek
+    deepseek.enabled = False
+
+    products = [
+        {"id": 1, "title": "Samsung phone", "description": "Android"},
+        {"id": 2, "title": "Cotton shirt", "description": None},
+    ]
+    scores = asyncio.run(deepseek.analyze_products_relevance("samsung phone", products))
+
+    assert scores == [
+        deepseek._fallback_analyze_relevance("samsung phone", "Samsung phone", "Android"),
+        deepseek._fallback_analyze_relevance("samsung phone", "Cotton shirt", None),
+    ]
+    assert scores[0]["relevance_score"] > scores[1]["relevance_score"]
@@ -0,0 +1,52 @@
+"""
+Tests for Persian/Arabic-aware search normalization
+"""
+import pytest
+
+from app.models.product import Product
+from app.utils.search_index import get_search_backend
+from app.utils.text_normalization import normalize_text, tokenize
+
+
+@pytest.mark.parametrize("variant, canonical", [
+    ("گوشي", "گوشی"),            # Arabic yeh
+    ("كتاب", "کتاب"),            # Arabic kaf
+    ("هدفون‌ها", "هدفونها"),      # ZWNJ
+    ("مَدرَسة", "مدرسه"),          # diacritics + teh marbuta
+    ("ســلام", "سلام"),           # tatweel
+    ("۱۲۳ و ١٢٣", "123 و 123"),   # Persian / Arabic-Indic digits
+    ("  Galaxy S23 ", "galaxy s23"),
+])
+def test_normalize_text(variant, canonical):
+    assert normalize_text(variant) == canonical
+
+
+def test_tokenize_handles_empty_input():
+    assert tokenize(None) == []
+    assert tokenize("  ") == []
+    assert tokenize("لپ‌تاپ ايسوس") == ["لپتاپ", "ایسوس"]
+
+
+def test_search_text_covers_multilingual_fields(db):
+    product = Product(title="Phone", title_fa="گوشی سامسونگ", description_ar="هاتف ذكي", price=10)
+    db.add(product)
+    db.commit()
+
+    assert product.search_text == "phone گوشی سامسونگ هاتف ذکی"
+
+    product.title_ar = "جوال"
+    db.commit()
+    assert "جوال" in product.search_text
+
+
+def test_spelling_variants_hit_the_same_products(db):
+    db.add_all([
+        Product(title="Samsung", title_fa="گوشی سامسونگ", price=10),
+        Product(title="Book", title_fa="کتاب داستان", price=5),
+    ])
+    db.commit()
+    backend = get_search_backend(db)
+
+    for query in ("گوشی", "گوشي", "گوشـي"):
+        assert [p.title for p in backend.search(db.query(Product), query)] == ["Samsung"]
+    assert [p.title for p in backend.search(db.query(Product), "كتاب")] == ["Book"]
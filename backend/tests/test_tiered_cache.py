@@ -0,0 +1,184 @@
+"""
+Tests for the two-tier (L1 per worker + Redis L2) cache and its
+invalidation broadcast; several caches on one broker stand in for workers
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.auth import get_current_admin_user
+from app.main import app
+from app.models.product import Product
+from app.models.user import User
+from app.services import product_cache
+from app.services.tiered_cache import LocalInvalidationBroker, RedisInvalidationBroker, TieredCache
+from app.utils.cache_utils import RedisCache
+
+
+def fake_l2(server):
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCache(client=fakeredis.aioredis.FakeRedis(server=server))
+
+
+def test_workers_share_l2_and_drop_l1_on_broadcast():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    broker = LocalInvalidationBroker()
+    workers = [TieredCache("product", l2=fake_l2(server), broker=broker) for _ in range(3)]
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return {"title": f"v{len(calls)}"}
+
+    async def scenario():
+        for worker in workers:
+            await worker.start()
+        first = [await worker.get_or_compute("42", load) for worker in workers]
+        again = [await worker.get_or_compute("42", load) for worker in workers]
+        assert first == again == [{"title": "v1"}] * 3
+        assert len(calls) == 1  # workers 2 and 3 were served by L2
+
+        await workers[0].invalidate("42")
+        assert [worker.l1.get("42") for worker in workers] == [None] * 3
+        assert await workers[2].get_or_compute("42", load) == {"title": "v2"}
+        assert await workers[1].get("42") == {"title": "v2"}
+
+    asyncio.run(scenario())
+    first, second = workers[0].stats(), workers[1].stats()
+    assert (first["l1_hits"], first["l2_hits"], first["misses"]) == (1, 0, 1)
+    assert (second["l1_hits"], second["l2_hits"], second["misses"]) == (1, 2, 0)
+    assert second["l1_hit_ratio"] == round(1 / 3, 4) and second["l2_hit_ratio"] == 1.0
+    assert first["invalidations_sent"] == 1 and second["invalidations_received"] == 1
+    assert first["invalidations_received"] == 0  # its own message is skipped
+
+
+def test_load_racing_an_invalidation_does_not_repopulate_l1():
+    cache = TieredCache("product", broker=LocalInvalidationBroker())
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_load():
+        started.set()
+        await release.wait()
+        return "old"
+
+    async def scenario():
+        await cache.start()
+        loading = asyncio.create_task(cache.get_or_compute("7", slow_load))
+        await started.wait()
+        await cache.invalidate("7")  # the edit commits while the old row is in flight
+        release.set()
+        assert await loading == "old"
+        assert cache.l1.get("7") is None
+
+    asyncio.run(scenario())
+
+
+class DelayedBroker(LocalInvalidationBroker):
+    """Holds published messages until ``deliver()``, like a slow pub/sub link."""
+
+    def __init__(self):
+        super().__init__()
+        self.queued = []
+
+    async def publish(self, channel, message):
+        self.queued.append((channel, message))
+
+    async def deliver(self):
+        queued, self.queued = self.queued, []
+        for channel, message in queued:
+            await super().publish(channel, message)
+
+
+def test_stale_l2_write_from_another_worker_is_deleted_on_receipt():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    broker = DelayedBroker()
+    a, b = (TieredCache("product", l2=fake_l2(server), broker=broker) for _ in range(2))
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_load():
+        started.set()
+        await release.wait()
+        return "old"
+
+    async def scenario():
+        await a.start()
+        await b.start()
+        loading = asyncio.create_task(a.get_or_compute("7", slow_load))
+        await started.wait()
+        await b.invalidate("7")  # b's edit commits while a's old row is in flight
+        release.set()
+        assert await loading == "old"  # written to L2 before a hears about the edit
+
+        await broker.deliver()
+        await asyncio.gather(*a._pending)
+        assert a.l1.get("7") is None
+        assert await b.get("7") is None
+
+    asyncio.run(scenario())
+
+
+def test_redis_broker_delivers_invalidations_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+
+    def worker():
+        client = fakeredis.aioredis.FakeRedis(server=server)
+        return TieredCache("product", l2=RedisCache(client=client), broker=RedisInvalidationBroker(client))
+
+    async def scenario():
+        a, b = worker(), worker()
+        await a.start()
+        await b.start()
+        await a.set("1", "stale")
+        assert await b.get("1") == "stale"
+
+        started = time.perf_counter()
+        await a.invalidate("1")
+        while b.l1.get("1") is not None and time.perf_counter() - started < 2:
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - started
+        for cache in (a, b):
+            await cache.close()
+            await cache.broker.close()
+        return b, elapsed
+
+    b, elapsed = asyncio.run(scenario())
+    assert b.l1.get("1") is None and elapsed < 1
+    assert b.stats()["invalidations_received"] == 1
+
+
+def test_admin_update_invalidates_cached_product_in_every_worker(client, db):
+    admin = User(email="admin@example.com", username="admin", hashed_password="x", role="admin")
+    db.add_all([admin, Product(id=1, title="Lamp", description="Desk lamp", price=20.0, category="Home")])
+    db.commit()
+
+    # This worker's cache and a peer's, on one in-process broker
+    broker = LocalInvalidationBroker()
+    local, peer = TieredCache("product", broker=broker), TieredCache("product", broker=broker)
+    client.portal.call(local.start)
+    client.portal.call(peer.start)
+    product_cache._product_cache = local
+
+    assert client.get("/api/v1/products/1").json()["title"] == "Lamp"
+    assert client.get("/api/v1/products/1").json()["title"] == "Lamp"
+    assert local.stats()["l1_hits"] == 1
+    peer.l1.set("1", {"title": "Lamp"})
+
+    app.dependency_overrides[get_current_admin_user] = lambda: admin
+    try:
+        response = client.put("/api/v1/admin/products/1", data={
+            "title": "Floor lamp", "description": "Tall", "price": "35", "category": "Home", "image_url": "/lamp.jpg",
+        })
+        stats = client.get("/api/v1/admin/product-cache/stats").json()
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+    assert response.status_code == 200
+    assert peer.l1.get("1") is None
+    assert client.get("/api/v1/products/1").json()["title"] == "Floor lamp"
+    assert stats["invalidations_sent"] == 1 and stats["l1_hit_ratio"] == 0.5
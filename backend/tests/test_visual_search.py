@@ -0,0 +1,154 @@
+"""
+Tests for visual image search (perceptual hashes + colour histograms)
+
+The scale test builds a 100,000-product index from random fingerprints; run
+``pytest tests/test_visual_search.py -m slow -s`` to see query timings.
+"""
+import base64
+import io
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.core.auth import get_current_admin_user
+from app.main import app
+from app.models.product import Product
+from app.models.user import User
+from app.services import visual_index
+from app.services.image_variants import get_variant_store
+from app.services.visual_index import VisualIndex, VisualIndexStore, VisualSearchIndex, get_visual_index
+from app.utils.image_hashing import Fingerprint, fingerprint
+
+
+def pattern(seed: int, size: int = 256) -> Image.Image:
+    """A distinct blocky 'product photo' per seed."""
+    blocks = np.random.default_rng(seed).integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(blocks).resize((size, size), Image.NEAREST)
+
+
+def jpeg(image: Image.Image, quality: int = 90) -> bytes:
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def hamming(a: Fingerprint, b: Fingerprint) -> int:
+    return bin(a.phash ^ b.phash).count("1") + bin(a.dhash ^ b.dhash).count("1")
+
+
+def test_fingerprints_survive_resizing_and_recompression():
+    original = fingerprint(jpeg(pattern(1, 512)))
+    thumbnail = fingerprint(jpeg(pattern(1, 512).resize((160, 160), Image.LANCZOS), quality=60))
+    other = fingerprint(jpeg(pattern(2, 512)))
+
+    assert hamming(original, thumbnail) <= 12
+    assert hamming(original, other) >= 40
+    assert original.histogram.dtype == np.uint8 and original.histogram.shape == (64,)
+
+
+def test_index_ranks_the_matching_product_first():
+    entries = {pid: fingerprint(jpeg(pattern(pid))) for pid in range(1, 41)}
+    index = VisualIndex.from_fingerprints(entries)
+
+    query = fingerprint(jpeg(pattern(17).resize((120, 120)), quality=50))
+    results = index.search(query, k=5)
+
+    assert results[0][0] == 17
+    assert results[0][1] > 0.9
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_popcount_fallback_matches_numpy():
+    values = np.random.default_rng(0).integers(0, 2 ** 63, (1000, 2), dtype=np.uint64)
+    lut = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    expected = lut[values.view(np.uint8)].reshape(1000, 2, 8).sum(axis=-1)
+    assert np.array_equal(visual_index.popcount(values).astype(np.int64), expected)
+
+
+def test_delta_log_is_shared_and_compacted_by_rebuild(tmp_path, db):
+    first = VisualSearchIndex(VisualIndexStore(str(tmp_path)), refresh_interval=0)
+    second = VisualSearchIndex(VisualIndexStore(str(tmp_path)), refresh_interval=0)
+    fp = fingerprint(jpeg(pattern(5)))
+
+    first.record_product(5, fp)
+    second.refresh()
+    assert second.index.search(fp, k=1)[0][0] == 5
+
+    first.rebuild(db)  # no products in the database
+    second.refresh()
+    assert len(second.index) == 0
+    assert first.store.delta_position()[0] == 0
+
+
+def upload_product_image(seed: int) -> str:
+    name = get_variant_store().put_file(jpeg(pattern(seed)), "jpg")
+    return f"/api/v1/images/uploads/{name}"
+
+
+def test_search_by_image_endpoint(client, db):
+    products = [
+        Product(id=pid, title=f"Product {pid}", price=10.0, image_url=upload_product_image(pid), is_active=pid != 3)
+        for pid in range(1, 6)
+    ]
+    db.add_all(products + [Product(id=6, title="No image", price=1.0)])
+    db.commit()
+    get_visual_index().rebuild(db)
+
+    photo = base64.b64encode(jpeg(pattern(2).resize((200, 200)), quality=70)).decode()
+    response = client.post("/api/v1/products/search-by-image", json={"image": f"data:image/jpeg;base64,{photo}"})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["results"][0]["id"] == 2
+    assert data["results"][0]["similarity_score"] > 0.9
+    assert {"color", "phash", "dhash"} <= set(data["extracted_attributes"])
+
+    photo = base64.b64encode(jpeg(pattern(3))).decode()
+    inactive = client.post("/api/v1/products/search-by-image", json={"image": photo}).json()
+    assert 3 not in [r["id"] for r in inactive["results"]]
+
+    assert client.post("/api/v1/products/search-by-image", json={"image": "bm90IGFuIGltYWdl"}).status_code == 400
+    assert client.post("/api/v1/products/search-by-image", json={}).status_code == 400
+
+
+def test_created_product_image_is_indexed(client, db):
+    admin = User(email="admin@example.com", username="admin", hashed_password="x", role="admin")
+    db.add(admin)
+    db.commit()
+    app.dependency_overrides[get_current_admin_user] = lambda: admin
+    try:
+        response = client.post("/api/v1/products/", json={
+            "title": "Lamp", "price": 20.0, "image_url": upload_product_image(9),
+        })
+    finally:
+        app.dependency_overrides.pop(get_current_admin_user, None)
+
+    assert response.status_code == 201
+    results = get_visual_index().search(fingerprint(jpeg(pattern(9))), k=1)
+    assert results[0][0] == response.json()["id"]
+
+
+@pytest.mark.slow
+def test_query_over_100k_products_is_fast():
+    n = 100_000
+    rng = np.random.default_rng(42)
+    hashes = rng.integers(0, 2 ** 63, (n, 2), dtype=np.uint64) << np.uint64(1) | rng.integers(0, 2, (n, 2), dtype=np.uint64)
+    histograms = rng.dirichlet(np.ones(64), n) * 255
+    index = VisualIndex(np.arange(n, dtype=np.int64), hashes, histograms.astype(np.uint8))
+
+    planted = 31_337
+    query = Fingerprint(int(hashes[planted, 0]) ^ 0b101, int(hashes[planted, 1]) ^ 0b1, index.histograms[planted].copy())
+    index.search(query, k=20)  # warm up
+
+    timings = []
+    for _ in range(20):
+        start = time.perf_counter()
+        results = index.search(query, k=20)
+        timings.append(time.perf_counter() - start)
+    median = sorted(timings)[len(timings) // 2]
+
+    print(f"\nvisual search over {n} products: median {median * 1000:.2f} ms, max {max(timings) * 1000:.2f} ms")
+    assert results[0][0] == planted
+    assert median < 0.05